@@ -1,29 +1,33 @@
+import time
+rerun_started = time.perf_counter()
+
 import streamlit as st
-import streamlit.components.v1 as components
 import pandas as pd
-import ast
 from layout import department_sidebar
-import base64
+from planner_core import (
+    years, ms_slots, slots_per_year, prereq_met, find_duplicate_codes, normalize_plan, evaluate_pathway
+)
+from cte_clusters import cluster_progress, completed_clusters, nearest_clusters, courses_to_finish
 import html
-from datetime import datetime
-
-#Connect to Dept Codes in sidebar
-dept_code_to_name = {
-    "BUS": "Business",
-    "CSC": "Computer Science",
-    "CTE": "CTE",
-    "ENG": "English",
-    "MUS": ["Fine Arts", "Vocal Music"],
-    "MTH": "Mathematics",
-    "DRM": "Performing Arts",
-    "PED": "Physical Education",
-    "SCI": "Science",
-    "SOC": "Social Studies",
-    "ART": "Visual Arts",
-    "WLG": "World Languages"
-}
+import os
+from array import array
+from contextlib import closing
+import plan_store
+import capacity
+import metrics
+import shadow
+import analysis_pool
+import event_log
+from scenarios import PlanScenarios
+from school_context import school_registry, current_school, seat_cache, sequence_index
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
 st.set_page_config(page_title="Course Planner", layout="wide")
 
+metrics.start_server()
+if get_script_run_ctx() is not None:
+    metrics.touch_session(get_script_run_ctx().session_id)
+
 if "show_intro" not in st.session_state:
     st.session_state.show_intro = True
 
@@ -67,63 +71,175 @@ if st.session_state.show_intro:
 if st.button("📘 Show How-To Guide Again"):
     st.session_state.show_intro = True
 
-# Load and encode Banner.png
-with open("Banner.png", "rb") as f:
-    data = f.read()
-    encoded = base64.b64encode(data).decode()
+# --- Schools: each one is loaded once per server (see school_context.py) and shared by every session ---
+def reset_plan():
+    """A different school means different course codes, so the plan starts over."""
+    for key in list(st.session_state):
+        if key in ("plan", "grad_pathway", "registration_result", "scenarios", "active_scenario", "catalog_image") \
+                or key.startswith(tuple(years)) or key.startswith("ms_course_"):
+            del st.session_state[key]
+    st.session_state.plan_version = st.session_state.get("plan_version", 0) + 1
+
+registry = school_registry()
+if "school_id" not in st.session_state:
+    requested = st.query_params.get("school", registry["default"])
+    st.session_state.school_id = requested if requested in registry["schools"] else registry["default"]
+if len(registry["schools"]) > 1:
+    st.selectbox(
+        "School",
+        list(registry["schools"]),
+        format_func=lambda school_id: registry["schools"][school_id]["name"],
+        key="school_id",
+        on_change=reset_plan
+    )
+
+school = current_school(st.session_state.school_id)
+school_config = school["config"]
+snapshot = school["snapshot"]
+catalog_image = school["image"]
+credits_by_code = school["credits_by_code"]
+course_names_by_code = school["course_names_by_code"]
+course_departments_by_code = school["course_departments_by_code"]
+prereq_dict = school["prereq_dict"]
+eligible_ids = school["eligible_ids"]
+ranked_ids = school["ranked_ids"]
+course_codes = school["course_codes"]
+course_names = school["course_names"]
+course_notes = school["course_notes"]
+course_ids = school["course_ids"]
+ms_options = school["ms_options"]
+dept_code_to_name = snapshot["dept_code_to_name"]
+dept_name_to_code = snapshot["dept_name_to_code"]
+grade_requirements = snapshot["grade_requirements"]
+cte_cluster_index = snapshot["cluster_index"]
 
 # Insert base64 image into clickable <img> tag
-st.markdown(
-    f"""
-    <a href="https://www.watertown.k12.sd.us/o/high-school" target="_blank" title="Visit Watertown High School">
-        <img src="data:image/png;base64,{encoded}" alt="WHS Banner" style="width: 100%; height: auto;">
-    </a>
-    """,
-    unsafe_allow_html=True
-)
+if school["banner"]:
+    st.markdown(
+        f"""
+        <a href="{school_config.get('url', '#')}" target="_blank" title="Visit {html.escape(school_config['name'])}">
+            <img src="data:image/png;base64,{str(school["banner"], "ascii")}" alt="{html.escape(school_config['name'])} Banner" style="width: 100%; height: auto;">
+        </a>
+        """,
+        unsafe_allow_html=True
+    )
+else:
+    st.title(school_config["name"])
 
 st.markdown("---")
 
 # Two-column layout for student name and pathway selection
 name_col, path_col = st.columns(2)
 
+# Saved plans: callbacks run before the next rerun, so widget values can be replaced safely
+def load_saved_plan():
+    student_id = st.session_state.get("student_id", "").strip()
+    with closing(plan_store.connect()) as conn:
+        record = plan_store.load_plan(conn, student_id) if student_id else None
+        scenario_rows = plan_store.load_scenarios(conn, student_id) if record else []
+    if record is not None and record["school"] != st.session_state.school_id:
+        st.session_state.plan_store_msg = ("warning", f"Student ID '{student_id}' has a saved plan at another school.")
+        return
+    if record is None:
+        st.session_state.plan_store_msg = ("warning", f"No saved plan found for student ID '{student_id}'.")
+        return
+
+    st.session_state.student_name = record["student_name"]
+    st.session_state.student_grade = record["grade"]
+    apply_plan_record(record)
+    base = st.session_state.plan
+    st.session_state.scenarios = (
+        PlanScenarios.from_rows(base, scenario_rows, course_ids) if scenario_rows
+        else PlanScenarios(base, record["pathway"])
+    )
+    st.session_state.active_scenario = st.session_state.scenarios.base_name
+    st.session_state.plan_version = st.session_state.get("plan_version", 0) + 1
+    st.session_state.plan_store_msg = ("success", f"Loaded saved plan for {record['student_name'] or student_id}.")
+
+def apply_plan_record(record):
+    """Replaces the session's plan (and the widget state that mirrors it) with a plan of course codes."""
+    plan = new_plan()
+    for i, code in enumerate(record["ms_credits"][:ms_slots]):
+        plan[i] = course_ids.get(code, 0)
+    for year, start in year_offsets.items():
+        for i, code in enumerate(record["courses"][year][:slots_per_year]):
+            plan[start + i] = course_ids.get(code, 0)
+    apply_plan(plan, record["pathway"])
+
+def apply_plan(plan, pathway):
+    """Replaces the session's plan array and drops the widget state that mirrors it."""
+    st.session_state.grad_pathway = pathway
+    st.session_state.plan = plan
+    for i in range(ms_slots):
+        # Drop the selectbox state so it re-reads its index from the plan
+        st.session_state.pop(f"ms_course_{i}", None)
+    for year, start in year_offsets.items():
+        for i in range(slots_per_year):
+            st.session_state.pop(f"{year}_{i}", None)
+            if i >= 4:
+                department = course_departments_by_code.get(course_codes[plan[start + i]], "")
+                st.session_state[f"{year}_{i}_code"] = dept_name_to_code.get(department, "")
+
+def save_current_plan():
+    student_id = st.session_state.get("student_id", "").strip()
+    if not student_id:
+        st.session_state.plan_store_msg = ("warning", "Enter a student ID before saving.")
+        return
+    # The plans row holds the base scenario; the other scenarios are saved as their differences
+    scenarios = sync_scenario()
+    record = {
+        "student_id": student_id,
+        "school": st.session_state.school_id,
+        "student_name": st.session_state.get("student_name", ""),
+        "grade": st.session_state.get("student_grade"),  # None keeps the stored grade
+        "pathway": scenarios.pathway(scenarios.base_name),
+        **plan_record(scenarios.plan(scenarios.base_name)),
+    }
+    with closing(plan_store.connect()) as conn:
+        plan_store.save_plan(conn, record)
+        plan_store.save_scenarios(conn, student_id, scenarios.to_rows(course_codes))
+    st.session_state.plan_store_msg = ("success", f"Saved plan for student ID '{student_id}'.")
+
+def apply_client_plan():
+    """Save pressed in the in-browser planner: adopt its plan, and store it if a student ID is set."""
+    value = st.session_state.get("client_plan")
+    if not value:
+        return
+    apply_plan_record(dict(value["plan"], pathway=value["pathway"]))
+    if st.session_state.get("student_id", "").strip():
+        save_current_plan()
+
 with name_col:
     st.markdown("### Course plan created for:")
     student_name = st.text_input("Enter student name", key="student_name")
+    id_col, grade_col, load_col, save_col = st.columns([2, 1, 1, 1])
+    with id_col:
+        st.text_input("Student ID", key="student_id")
+    with grade_col:
+        # Saved with the plan; feasibility.py forecasts plans by the student's current grade
+        st.selectbox("Current grade", [None, 9, 10, 11, 12], key="student_grade",
+                     format_func=lambda grade: "—" if grade is None else str(grade))
+    with load_col:
+        st.button("📂 Load Plan", on_click=load_saved_plan)
+    with save_col:
+        st.button("💾 Save Plan", on_click=save_current_plan)
+    if "plan_store_msg" in st.session_state:
+        level, message = st.session_state.pop("plan_store_msg")
+        getattr(st, level)(message)
 
 with path_col:
     st.markdown("### Please select graduation pathway")
     st.radio(
         label="",
-        options=["University", "Career & Technical", "Honors/Scholarship Opportunity"],
+        options=snapshot["pathways"],
         key="grad_pathway"
     )
 
 
-# Load course catalog
-def load_course_catalog():
-    df = pd.read_csv("WHS_course_catalog.csv")
-    df["Grade Levels"] = df["Grade Levels"].apply(lambda x: ast.literal_eval(str(x)))
-    df["Prerequisites"] = df["Prerequisites"].fillna("None")
-    df["Tags"] = df["Tags"].fillna("")
-    df["Notes"] = df["Notes"].fillna("")
-    return df
-
-course_catalog = load_course_catalog()
-
 # Set up grade levels and labels
-years = ["9th Grade", "10th Grade", "11th Grade", "12th Grade"]
 row_labels_fall = ["English", "Mathematics", "Science", "Social Studies"]
 row_labels_spring = ["Course 5", "Course 6", "Course 7", "Course 8"]
 
-# Grade-level guidance messages for hover tooltips
-grade_requirements = {
-    "9th Grade": "English 9, Algebra I, Speech or Debate, World Geography, Biology, PE/Health [6 credits min]",
-    "10th Grade": "English 10, Geometry, World History, Physical Science or Chemistry [6 credits min]",
-    "11th Grade": "English 11, Algebra II, US History, Science, Personal Finance(BUS) or Economics(SOC) [6 credits min]",
-    "12th Grade": "English 12, US Government, Personal Finance(BUS) or Economics(SOC) [6 credits min]"
-}
-
 def hover_year_msg(year):
     msg = grade_requirements.get(year, "No specific requirements listed.")
     return f"""
@@ -163,246 +279,468 @@ def hover_year_msg(year):
     </div>
     """
 
-# Session state initialization
-if "course_plan" not in st.session_state:
-    st.session_state.course_plan = {year: ["" for _ in range(8)] for year in years}
-    st.session_state.course_plan_codes = {year: ["" for _ in range(8)] for year in years}
+# Session state initialization: the whole plan is one array of course ids, middle school
+# slots first and then 8 per year. Names, codes and credits are looked up in the shared
+# school catalog when rendering, so each session only holds a few hundred bytes of plan.
+year_offsets = {year: ms_slots + n * slots_per_year for n, year in enumerate(years)}
+
+def new_plan():
+    return array("H", bytes(2 * (ms_slots + len(years) * slots_per_year)))
+
+def plan_record(plan=None):
+    """The session's plan (or another plan array) as course codes, in the planner_core plan layout."""
+    plan = st.session_state.plan if plan is None else plan
+    return {
+        "ms_credits": [course_codes[course_id] for course_id in plan[:ms_slots]],
+        "courses": {
+            year: [course_codes[course_id] for course_id in plan[start:start + slots_per_year]]
+            for year, start in year_offsets.items()
+        },
+    }
+
+def course_label(course_id):
+    return option_label(course_names[course_id], course_codes[course_id])
+
+if "plan" not in st.session_state:
+    st.session_state.plan = new_plan()
+plan = st.session_state.plan
+
+if "plan_version" not in st.session_state:
+    st.session_state.plan_version = 0
+
+# --- Plan scenarios: named plans kept side by side (see scenarios.py) ---
+if "scenarios" not in st.session_state:
+    st.session_state.scenarios = PlanScenarios(plan, st.session_state.get("grad_pathway", snapshot["pathways"][0]))
+    st.session_state.active_scenario = st.session_state.scenarios.base_name
+scenarios = st.session_state.scenarios
+
+# A newly published catalog image may number the courses differently: carry the plan and
+# its scenarios over by course code, and let the selectboxes re-read their positions
+previous_image = st.session_state.get("catalog_image")
+if previous_image is not None and previous_image.name != catalog_image.name:
+    rows = scenarios.to_rows(previous_image.codes)
+    base = array("H", [course_ids.get(previous_image.codes[course_id], 0) for course_id in scenarios.base])
+    for slot, course_id in enumerate(plan):
+        plan[slot] = course_ids.get(previous_image.codes[course_id], 0)
+    for key in list(st.session_state):
+        if key.startswith("ms_course_") or (key.startswith(tuple(years)) and not key.endswith("_code")):
+            del st.session_state[key]
+    st.session_state.scenarios = scenarios = PlanScenarios.from_rows(base, rows, course_ids)
+    st.session_state.plan_version += 1
+st.session_state.catalog_image = catalog_image
+
+def sync_scenario(name=None):
+    """Records the session's plan in the active scenario; its version only moves if it changed."""
+    scenarios = st.session_state.scenarios
+    scenarios.update(
+        name or st.session_state.active_scenario, st.session_state.plan,
+        st.session_state.get("grad_pathway", snapshot["pathways"][0])
+    )
+    return scenarios
+
+def switch_scenario(previous):
+    scenarios = sync_scenario(previous)
+    selected = st.session_state.active_scenario
+    apply_plan(scenarios.plan(selected), scenarios.pathway(selected))
+    st.session_state.plan_version += 1
+
+def add_scenario():
+    name = st.session_state.get("new_scenario_name", "").strip()
+    scenarios = sync_scenario()
+    if not name:
+        st.session_state.scenario_msg = ("warning", "Enter a name for the new scenario.")
+        return
+    if name in scenarios:
+        st.session_state.scenario_msg = ("warning", f"There is already a scenario named '{name}'.")
+        return
+    # Starts as a copy of the plan on screen, so the widgets already show it
+    scenarios.add(name, st.session_state.active_scenario)
+    st.session_state.active_scenario = name
+    st.session_state.new_scenario_name = ""
+
+def remove_scenario():
+    scenarios = st.session_state.scenarios
+    scenarios.remove(st.session_state.active_scenario)
+    st.session_state.active_scenario = scenarios.base_name
+    apply_plan(scenarios.plan(scenarios.base_name), scenarios.pathway(scenarios.base_name))
+    st.session_state.plan_version += 1
+
+def scenario_evaluation(name):
+    """The scenario's pathway check, computed once per scenario version."""
+    def evaluate():
+        pathway = scenarios.pathway(name)
+        return evaluate_pathway(snapshot, normalize_plan(dict(plan_record(scenarios.plan(name)), pathway=pathway)), pathway)
+    return scenarios.cached(name, "evaluation", evaluate)
+
+scenario_col, new_col, add_col, remove_col = st.columns([2, 2, 1, 1])
+with scenario_col:
+    st.selectbox(
+        "Plan scenario",
+        scenarios.names(),
+        key="active_scenario",
+        on_change=switch_scenario,
+        args=(st.session_state.active_scenario,)
+    )
+with new_col:
+    st.text_input("New scenario name", key="new_scenario_name", placeholder="Plan B: CTE")
+with add_col:
+    st.button("➕ Copy as New Scenario", on_click=add_scenario)
+with remove_col:
+    st.button(
+        "🗑️ Remove Scenario",
+        on_click=remove_scenario,
+        disabled=st.session_state.active_scenario == scenarios.base_name
+    )
+if "scenario_msg" in st.session_state:
+    level, message = st.session_state.pop("scenario_msg")
+    getattr(st, level)(message)
+
+# In-browser planner: eligibility and the tracker run client-side from a cached bundle
+
+client_mode = st.toggle(
+    "⚡ Plan in your browser (faster; changes reach the planner when you press Save)",
+    key="client_planner"
+)
 
-if "ms_credits" not in st.session_state:
-    st.session_state.ms_credits = ["" for _ in range(4)]
+if client_mode:
+    import streamlit.components.v1 as components
+    from client_bundle import component_dir
+
+    plan_tracker = components.declare_component("plan_tracker", path=component_dir)
+    plan_tracker(
+        bundle=school["bundle"],
+        plan=plan_record(),
+        pathway=st.session_state.get("grad_pathway", snapshot["pathways"][0]),
+        plan_version=st.session_state.plan_version,
+        dept_name_to_code=dept_name_to_code,
+        key="client_plan",
+        on_change=apply_client_plan,
+        default=None
+    )
 
 # Middle School Credits
-st.header("High School Credit Earned in Middle School")
-ms_courses = course_catalog[course_catalog["Grade Levels"].apply(lambda x: 8 in x)]
-ms_options = [""] + ms_courses["Course Name"].tolist()
-ms_lookup = dict(zip(ms_courses["Course Name"], ms_courses["Course Code"].astype(str)))
-ms_cols = st.columns(4)
-for i in range(4):
-    with ms_cols[i]:
-        st.session_state.ms_credits[i] = st.selectbox(
-            f"Middle School Course {i+1}",
-            ms_options,
-            index=ms_options.index(st.session_state.ms_credits[i]) if st.session_state.ms_credits[i] in ms_options else 0,
-            key=f"ms_course_{i}"
-        )
+if not client_mode:
+    st.header("High School Credit Earned in Middle School")
+    ms_cols = st.columns(4)
+    for i in range(4):
+        with ms_cols[i]:
+            plan[i] = st.selectbox(
+                f"Middle School Course {i+1}",
+                ms_options,
+                index=ms_options.index(plan[i]) if plan[i] in ms_options else 0,
+                format_func=course_names.__getitem__,
+                key=f"ms_course_{i}"
+            )
 
-# Build course prerequisite dictionary
-prereq_dict = dict(zip(course_catalog["Course Code"].astype(str), course_catalog["Prerequisites"]))
-
-# Helper to check if prerequisites are met
-def has_prereq_met(course_code, current_year, course_plan_codes, prereq_dict, current_index):
-    taken = [ms_lookup.get(name, "") for name in st.session_state.ms_credits if name]
-    for yr in years:
-        for idx, code in enumerate(course_plan_codes[yr]):
-            if yr == current_year and idx >= current_index:
-                break
-            if code:
-                taken.append(code)
-        if yr == current_year:
-            break
-    raw = prereq_dict.get(course_code, "None")
-    if raw == "None":
-        return True
-    try:
-        parsed = ast.literal_eval(raw)
-        if isinstance(parsed, int) or isinstance(parsed, str):
-            return str(parsed) in taken
-        elif isinstance(parsed, list) and all(isinstance(x, list) for x in parsed):
-            return all(any(str(code) in taken for code in group) for group in parsed)
-        elif isinstance(parsed, list):
-            return any(str(code) in taken for code in parsed)
+# Every course planned before this slot, the key for the shared eligible-course cache
+def taken_before(current_year, current_index):
+    before = st.session_state.plan[:year_offsets[current_year] + current_index]
+    return frozenset(course_codes[course_id] for course_id in before if course_id)
+
+# Course ids planned in the year before `year` (middle school for 9th grade) and the year before that
+def earlier_ids(year):
+    n = years.index(year)
+    previous = plan[year_offsets[years[n - 1]]:year_offsets[year]] if n else plan[:ms_slots]
+    earlier = plan[year_offsets[years[n - 2]]:year_offsets[years[n - 1]]] if n > 1 else plan[:ms_slots] if n else []
+    return frozenset(previous) - {0}, frozenset(earlier) - {0}
+
+# Helper to check if prerequisites are met by every course planned before this slot
+def has_prereq_met(course_code, current_year, current_index):
+    return prereq_met(prereq_dict.get(course_code, []), taken_before(current_year, current_index))
+
+# --- Registration mode: seat-capped courses are reserved when a plan is finalized ---
+registration_open = os.environ.get("WHS_REGISTRATION_OPEN") == "1"
+
+def option_label(course_name, code):
+    if not (registration_open and course_name):
+        return course_name
+    remaining = seat_cache(snapshot["school_id"]).remaining(code)
+    if remaining is None:
+        return course_name
+    return f"{course_name} ({remaining} seats left)" if remaining > 0 else f"{course_name} (full — waitlist)"
+
+def finalize_registration():
+    student_id = st.session_state.get("student_id", "").strip()
+    if not student_id:
+        st.session_state.registration_result = ("warning", "Enter a student ID before finalizing registration.")
+        return
+    # The saved plan is the base scenario, and the seats must match what export and feasibility read
+    scenarios = st.session_state.scenarios
+    if st.session_state.active_scenario != scenarios.base_name:
+        st.session_state.registration_result = (
+            "warning", f"Switch to the '{scenarios.base_name}' scenario to finalize. Registration uses your saved plan."
+        )
+        return
+    save_current_plan()
+    codes = [course_codes[course_id] for course_id in scenarios.plan(scenarios.base_name)[ms_slots:] if course_id]
+    with closing(plan_store.connect()) as conn:
+        results, counts = capacity.finalize_registration(conn, student_id, codes, st.session_state.school_id)
+    seat_cache(st.session_state.school_id).update(counts)
+    if not results:
+        st.session_state.registration_result = ("success", "Registration finalized — no seat-limited courses in this plan.")
+        return
+    lines = []
+    for code, result in sorted(results.items()):
+        name = course_names_by_code.get(code, code)
+        if result["status"] == "seated":
+            lines.append(f"✅ {name}: seat reserved")
         else:
-            return False
-    except:
-        return False
-
-english_course_codes_by_grade = {
-    "9th Grade": ["2401", "2404"],
-    "10th Grade": ["2501", "2504"],
-    "11th Grade": ["2601", "2608"],
-    "12th Grade": ["2715", "2606"]
-}
+            lines.append(f"⏳ {name}: waitlisted (position {result['waitlist_position']})")
+    st.session_state.registration_result = ("info", "Registration finalized:\n\n" + "\n\n".join(lines))
 
 
-# Main planner loop
-for year in years:
-    #st.header(year)
-    st.markdown(hover_year_msg(year), unsafe_allow_html=True)
+# Main planner loop (the in-browser planner replaces it when enabled)
+if not client_mode:
+    # Options are listed with the courses students chose most often after the same earlier courses first
+    next_courses = sequence_index(st.session_state.school_id)
+    pathway = st.session_state.get("grad_pathway", snapshot["pathways"][0])
+    for year in years:
+        year_started = time.perf_counter()
+        previous_ids, earlier_year_ids = earlier_ids(year)
+        #st.header(year)
+        st.markdown(hover_year_msg(year), unsafe_allow_html=True)
 
-    cols = st.columns(4)
-    grade_num = int(year.split()[0].replace("th", "").replace("st", "").replace("nd", "").replace("rd", ""))
-    base_courses = course_catalog[course_catalog["Grade Levels"].apply(lambda x: grade_num in x)]
+        cols = st.columns(4)
 
-    for i in range(8):
-        department = row_labels_fall[i] if i < 4 else row_labels_spring[i - 4]
-        col = cols[i % 4]
+        for i in range(8):
+            department = row_labels_fall[i] if i < 4 else row_labels_spring[i - 4]
+            col = cols[i % 4]
 
-        with col:
-            label = f"{year} – {department}"
-            dept_courses = base_courses[base_courses["Department"] == department]
+            with col:
+                label = f"{year} – {department}"
 
-            if i < 4:
-                # --- Core subjects ---
-                if department == "English":
-                    allowed_codes = english_course_codes_by_grade.get(year, [])
-                    eligible_courses = dept_courses[
-                        dept_courses["Course Code"].astype(str).isin(allowed_codes)
-                    ]
-                else:
-                    eligible_courses = dept_courses[
-                        dept_courses["Course Code"].astype(str).apply(
-                            lambda code: has_prereq_met(code, year, st.session_state.course_plan_codes, prereq_dict, i)
+                if i < 4:
+                    # --- Core subjects ---
+                    if department == "English":
+                        eligible_courses = eligible_ids(year, (department,), None)
+                    else:
+                        eligible_courses = eligible_ids(year, (department,), taken_before(year, i))
+
+                    if eligible_courses:
+                        options = [0, *ranked_ids(next_courses, year, pathway, eligible_courses, previous_ids, earlier_year_ids)]
+                        slot = year_offsets[year] + i
+
+                        plan[slot] = st.selectbox(
+                            label=label,
+                            options=options,
+                            index=options.index(plan[slot]) if plan[slot] in options else 0,
+                            format_func=course_label,
+                            key=f"{year}_{i}"
                         )
-                    ]
-
-                if not eligible_courses.empty:
-                    options = [""] + eligible_courses["Course Name"].tolist()
-                    code_lookup = dict(zip(eligible_courses["Course Name"], eligible_courses["Course Code"].astype(str)))
-                    notes_lookup = dict(zip(eligible_courses["Course Name"], eligible_courses["Notes"]))
-
-                    selected_course = st.selectbox(
-                        label=label,
-                        options=options,
-                        index=options.index(st.session_state.course_plan[year][i]) if st.session_state.course_plan[year][i] in options else 0,
-                        key=f"{year}_{i}"
-                    )
 
-                    st.session_state.course_plan[year][i] = selected_course
-                    st.session_state.course_plan_codes[year][i] = code_lookup.get(selected_course, "")
+                        if plan[slot]:
+                            note = course_notes[plan[slot]]
+                            if note:
+                                st.caption(f"ℹ️ {note}")
+                    else:
+                        st.info(f"No eligible courses found for {department} in {year}.")
 
-                    if selected_course:
-                        note = notes_lookup.get(selected_course, "")
-                        if note:
-                            st.caption(f"ℹ️ {note}")
                 else:
-                    st.info(f"No eligible courses found for {department} in {year}.")
-
-            else:
-                # --- Electives: 3-letter department code input ---
-                course_code_key = f"{year}_{i}_code"
+                    # --- Electives: 3-letter department code input ---
+                    course_code_key = f"{year}_{i}_code"
 
-                if course_code_key not in st.session_state:
-                    st.session_state[course_code_key] = ""
+                    if course_code_key not in st.session_state:
+                        st.session_state[course_code_key] = ""
 
-                st.text_input(
-                    f"Enter 3-letter code for Course {i+1}",
-                    max_chars=3,
-                    key=course_code_key
-                )
-
-                course_code = st.session_state[course_code_key].strip().upper()
-                department_names = dept_code_to_name.get(course_code, [])
-
-                if isinstance(department_names, str):
-                    department_names = [department_names]
-
-                if department_names:
-                    dept_courses = base_courses[base_courses["Department"].isin(department_names)]
-                    eligible_courses = dept_courses[dept_courses["Course Code"].astype(str).apply(
-                        lambda code: has_prereq_met(code, year, st.session_state.course_plan_codes, prereq_dict, i)
-                    )]
-                else:
-                    eligible_courses = pd.DataFrame(columns=base_courses.columns)
-
-                if not eligible_courses.empty:
-                    options = [""] + eligible_courses["Course Name"].tolist()
-                    code_lookup = dict(zip(eligible_courses["Course Name"], eligible_courses["Course Code"].astype(str)))
-                    notes_lookup = dict(zip(eligible_courses["Course Name"], eligible_courses["Notes"]))
-
-                    selected_course = st.selectbox(
-                        label=f"{label} – Select Course",
-                        options=options,
-                        index=options.index(st.session_state.course_plan[year][i]) if st.session_state.course_plan[year][i] in options else 0,
-                        key=f"{year}_{i}"
+                    st.text_input(
+                        f"Enter 3-letter code for Course {i+1}",
+                        max_chars=3,
+                        key=course_code_key
                     )
 
-                    st.session_state.course_plan[year][i] = selected_course
-                    st.session_state.course_plan_codes[year][i] = code_lookup.get(selected_course, "")
+                    course_code = st.session_state[course_code_key].strip().upper()
+                    department_names = dept_code_to_name.get(course_code, [])
 
-                    if selected_course:
-                        note = notes_lookup.get(selected_course, "")
-                        if note:
-                            st.caption(f"ℹ️ {note}")
-                elif course_code:
-                    if not department_names:
-                        st.warning(f"'{course_code}' is not a valid department code.")
-                    else:
-                        st.warning(f"No eligible course found for code '{course_code}' in {year} Grade.")
+                    if isinstance(department_names, str):
+                        department_names = [department_names]
 
-    st.markdown("---")
+                    if department_names:
+                        eligible_courses = eligible_ids(year, tuple(department_names), taken_before(year, i))
+                    else:
+                        eligible_courses = ()
+
+                    if eligible_courses:
+                        options = [0, *ranked_ids(next_courses, year, pathway, eligible_courses, previous_ids, earlier_year_ids)]
+                        slot = year_offsets[year] + i
+
+                        plan[slot] = st.selectbox(
+                            label=f"{label} – Select Course",
+                            options=options,
+                            index=options.index(plan[slot]) if plan[slot] in options else 0,
+                            format_func=course_label,
+                            key=f"{year}_{i}"
+                        )
 
-# --- DUPLICATE COURSE CODE CHECK GLOBALS ---
-unlimited_repeatable_codes = {"1201", "1210", "1221"}  # e.g., Band, Orchestra
-limited_repeatable_counts = {"2410": 2}  # e.g., Exp in Reading (max 2 times)
+                        if plan[slot]:
+                            note = course_notes[plan[slot]]
+                            if note:
+                                st.caption(f"ℹ️ {note}")
+                    elif course_code:
+                        if not department_names:
+                            st.warning(f"'{course_code}' is not a valid department code.")
+                        else:
+                            st.warning(f"No eligible course found for code '{course_code}' in {year} Grade.")
+
+        st.markdown("---")
+        metrics.phase_seconds.observe(time.perf_counter() - year_started, phase="planner_loop", grade=year)
+
+sync_scenario()
+
+# Edit history: this rerun's slot and pathway changes, as events in the plan edit log
+if "plan_events" not in st.session_state:
+    st.session_state.plan_events = event_log.PlanRecorder()
+st.session_state.plan_events.observe(
+    st.session_state.school_id, st.session_state.get("student_id", "").strip(),
+    st.session_state.get("grad_pathway", snapshot["pathways"][0]), [course_codes[course_id] for course_id in plan]
+)
 
-from collections import Counter
+if len(scenarios.names()) > 1:
+    with st.expander("📊 Compare Plan Scenarios"):
+        comparison = []
+        for name in scenarios.names():
+            result = scenario_evaluation(name)
+            met = sum(requirement["met"] for requirement in result["requirements"])
+            comparison.append({
+                "Scenario": name,
+                "Pathway": result["pathway"],
+                "Total Credits": result["total_credits"],
+                "Requirements Met": f"{met}/{len(result['requirements'])}",
+                "All Met": "✅" if result["all_met"] else "—",
+                f"Slots Differing from {scenarios.base_name}": len(scenarios.delta(name)),
+            })
+        st.dataframe(pd.DataFrame(comparison), hide_index=True)
+
+if registration_open:
+    st.header("Course Registration")
+    st.caption("Finalizing reserves a seat in each seat-limited course in your plan, or a waitlist spot if it is full.")
+    st.button("✅ Finalize Registration", on_click=finalize_registration)
+    if "registration_result" in st.session_state:
+        level, message = st.session_state.registration_result
+        getattr(st, level)(message)
 
 def check_for_duplicate_courses(selected_df):
     """Checks for course codes that appear more often than allowed."""
-    all_selected_codes = []
-
-    for course_name in st.session_state.ms_credits:
-        if course_name:
-            row = course_catalog[course_catalog["Course Name"] == course_name]
-            if not row.empty:
-                all_selected_codes.append(str(row["Course Code"].values[0]))
-
-    for year in st.session_state.course_plan:
-        for course_name in st.session_state.course_plan[year]:
-            if course_name:
-                row = course_catalog[course_catalog["Course Name"] == course_name]
-                if not row.empty:
-                    all_selected_codes.append(str(row["Course Code"].values[0]))
+    all_selected_codes = [course_codes[course_id] for course_id in st.session_state.plan if course_id]
 
-    code_counts = Counter(all_selected_codes)
-
-    non_repeatable_violations = [
-        code for code, count in code_counts.items()
-        if (
-            (code in unlimited_repeatable_codes and count > 1000)  # safeguard: should never warn
-            or (code in limited_repeatable_counts and count > limited_repeatable_counts[code])
-            or (code not in unlimited_repeatable_codes and code not in limited_repeatable_counts and count > 1)
-        )
-    ]
+    non_repeatable_violations = find_duplicate_codes(
+        all_selected_codes, snapshot["unlimited_repeatable_codes"], snapshot["limited_repeatable_counts"]
+    )
+    st.session_state.plan_events.duplicate_warning(non_repeatable_violations)
     
     # Report violations in a single summary message
     if non_repeatable_violations:
-        names = [
-            course_catalog[course_catalog["Course Code"].astype(str) == code]["Course Name"].values[0]
-            for code in non_repeatable_violations
-            if not course_catalog[course_catalog["Course Code"].astype(str) == code].empty
-        ]
+        names = [course_names_by_code[code] for code in non_repeatable_violations if code in course_names_by_code]
         st.error(f"⚠️ Duplicate course selection: {', '.join(names)} — most courses may only be taken once.")
 
 # Outside the function — placeholder value
 total_credits = 0
-def show_graduation_tracker():
-    #st.markdown("### 🎓 Graduation Tracker")
-    graduation_df = course_catalog.copy()
-    selected_df_rows = []
-    claimed_courses = set()
 
-    cte_cluster_map = {
-        "Ag, Food & Natural Resources": {"9601", "9605", "18102", "18203", "18501"},
-        "Architecture & Construction": {"17003", "17004", "17007", "17008"},
-        "Business and Finance": {"9115", "9110", "9120"},
-        "Education & Training": {"19051", "19052", "19151"},
-        "Health Science": {"3066", "3067", "14001", "14002", "14154"},
-        "Hospitality & Tourism": {"16052", "16058", "16059", "19253"},
-        "Human Services": {"19001", "19051", "19052"},
-        "Information Technology": {"5105", "5606", "5700"},
-        "Manufacturing": {"13203", "13204", "13207", "13208"},
-        "STEM": {"21017", "21018", "21023"},
-        "Transportation & Distribution": {"20104", "20110"}
-    }
+def cluster_suggestions(progress, taken, cancelled):
+    """(cluster, progress entry, course names that would finish it) for the nearest unfinished CTE clusters."""
+    suggestions = []
+    for cluster in nearest_clusters(progress):
+        if cancelled.is_set():
+            return None
+        picks = courses_to_finish(
+            cte_cluster_index, progress, cluster, credits_by_code,
+            lambda code: prereq_met(prereq_dict.get(code, []), taken)
+        )
+        suggestions.append((cluster, progress[cluster], [course_names_by_code.get(code, code) for code in picks]))
+    return suggestions
 
-    for course_name in st.session_state.ms_credits + sum(st.session_state.course_plan.values(), []):
-        if not course_name:
-            continue
-        row = graduation_df[graduation_df["Course Name"] == course_name]
-        if not row.empty:
-            selected_df_rows.append(row)
-    selected_df = pd.concat(selected_df_rows, ignore_index=True) if selected_df_rows else pd.DataFrame(columns=graduation_df.columns)
+def draw_cluster_suggestions(suggestions):
+    for cluster, entry, names in suggestions:
+        if names:
+            st.info(f"{cluster}: {entry['credits']}/{entry['target']} credits — add {', '.join(names)}")
+        else:
+            st.info(f"{cluster}: {entry['credits']}/{entry['target']} credits — no eligible courses left to finish it")
+
+def show_cluster_suggestions(progress):
+    """Lists the nearest unfinished CTE clusters and the courses that would complete them."""
+    taken = frozenset(course_codes[course_id] for course_id in st.session_state.plan if course_id)
+    show_analysis("cte_suggestions", "Looking for courses that would finish a CTE cluster…",
+                  draw_cluster_suggestions, cluster_suggestions, progress, taken)
+
+# --- Sidebar analyses: computed on the shared worker pool and drawn once they finish (see analysis_pool.py) ---
+def analysis_version():
+    """Changes whenever the plan on screen does: a load, a scenario switch or any slot or pathway edit."""
+    active = st.session_state.active_scenario
+    return st.session_state.plan_version, active, st.session_state.scenarios.version(active)
+
+def submit_analysis(name, function, args):
+    ctx = get_script_run_ctx()
+    return analysis_pool.pool().submit(ctx.session_id if ctx else "", name, analysis_version(), function, *args)
+
+def show_analysis(name, waiting_message, draw, function, *args):
+    job = submit_analysis(name, function, args)
+    if job.done():
+        draw_analysis(st.empty(), job, draw)
+    else:
+        poll_analysis(name, waiting_message, function, args)
+
+@st.fragment(run_every=analysis_pool.poll_seconds)
+def poll_analysis(name, waiting_message, function, args):
+    """Checks a running analysis without rerunning the page; once it is finished the page reruns and draws it.
+
+    A page that no longer calls this fragment (the result was drawn, or the plan changed)
+    stops its polling, so a session never polls for more than the analysis it is waiting on.
+    """
+    if submit_analysis(name, function, args).done():
+        st.rerun()
+    st.caption(f"⏳ {waiting_message}")
+
+def draw_analysis(placeholder, job, draw):
+    if job.state == "done":
+        with placeholder.container():
+            draw(job.result())
+    elif job.state == "failed":
+        placeholder.caption(f"⚠️ This check could not finish ({type(job.error()).__name__}).")
+    elif job.state == "rejected":
+        placeholder.caption("⏳ The planner is busy; this check will run after your next change.")
+    else:
+        placeholder.empty()
+
+# Column types of the catalog as read from the CSV, kept so an empty plan still has string columns
+selected_dtypes = {
+    "Course Name": "str", "Course Code": "str", "Department": "str", "Grade Levels": "object",
+    "Credits": "float64", "Tags": "str", "Prerequisites": "str", "Notes": "str",
+}
+
+def selected_courses_df():
+    """Catalog rows of every planned course, middle school first, in planner order."""
+    course_rows = [course_id for course_id in st.session_state.plan if course_id]
+    return pd.DataFrame({
+        "Course Name": [course_names[course_id] for course_id in course_rows],
+        "Course Code": [course_codes[course_id] for course_id in course_rows],
+        "Department": [catalog_image.department(course_id) for course_id in course_rows],
+        "Grade Levels": [catalog_image.grades(course_id) for course_id in course_rows],
+        "Credits": [catalog_image.credits[course_id] for course_id in course_rows],
+        "Tags": [catalog_image.tags[course_id] for course_id in course_rows],
+        "Prerequisites": [catalog_image.prerequisites[course_id] for course_id in course_rows],
+        "Notes": [course_notes[course_id] for course_id in course_rows],
+    }).astype(selected_dtypes)
+
+def show_rules_tracker():
+    """Tracker for schools that ship their own pathway rules: one line per requirement."""
+    pathway = st.session_state.get("grad_pathway", snapshot["pathways"][0])
+    result = scenario_evaluation(st.session_state.active_scenario)
+    st.subheader(f"🎓 {pathway} Graduation Requirements")
+    st.markdown(f"**Total Credits:** {result['total_credits']:.1f}")
+    for requirement in result["requirements"]:
+        detail = f" — {requirement['earned']:.1f} / {requirement['required']}" if "required" in requirement else ""
+        if requirement["met"]:
+            st.success(f"{requirement['label']}{detail}")
+        else:
+            st.warning(f"{requirement['label']}{detail}")
+    check_for_duplicate_courses(None)
+    if result["all_met"]:
+        st.success(f"✅ All {pathway} requirements met!")
+    return result["total_credits"]
+
+def show_graduation_tracker(st=st):
+    #st.markdown("### 🎓 Graduation Tracker")
+    claimed_courses = set()
+    selected_df = selected_courses_df()
 
     selected_codes = selected_df["Course Code"].astype(str).tolist()
 
@@ -570,7 +908,6 @@ def show_graduation_tracker():
         else:
             st.success("✅ All graduation requirements for the University Pathway are complete!")
         
-        st.session_state.total_credits = total_credits
         return total_credits
         
 #----------------------------------------------------------------------------------------------------------------------------------------
@@ -580,15 +917,7 @@ def show_graduation_tracker():
         st.markdown("### 🛠️ Career & Technical Graduation Tracker")
     
         # Rebuild selected_df
-        selected_df_rows = []
-        for course_name in st.session_state.ms_credits + sum(st.session_state.course_plan.values(), []):
-            if not course_name:
-                continue
-            row = course_catalog[course_catalog["Course Name"] == course_name]
-            if not row.empty:
-                selected_df_rows.append(row)
-    
-        selected_df = pd.concat(selected_df_rows, ignore_index=True) if selected_df_rows else pd.DataFrame(columns=course_catalog.columns)
+        selected_df = selected_courses_df()
         selected_df["Course Code"] = selected_df["Course Code"].astype(str)
         selected_df["Credits"] = pd.to_numeric(selected_df["Credits"], errors="coerce")
         selected_df.dropna(subset=["Credits"], inplace=True)
@@ -703,18 +1032,8 @@ def show_graduation_tracker():
             st.sidebar.warning(f"Fine Arts: {fine_credits}/1 credit")
     
         # ---- CTE CLUSTER CHECK----
-        cte_df = selected_df[selected_df["Department"].isin(["CTE", "Business", "Computer Science"])]
-        cte_df["Course Code"] = cte_df["Course Code"].astype(str)
-        
-        cluster_hits = {}
-        for cluster, codes in cte_cluster_map.items():
-            matched = cte_df[cte_df["Course Code"].isin(codes)]
-            total_cluster_credits = matched["Credits"].sum()
-            codes_taken = set(matched["Course Code"])
-            all_courses_completed = codes_taken == set(codes)
-        
-            if all_courses_completed or total_cluster_credits >= 1.5:
-                cluster_hits[cluster] = total_cluster_credits
+        cte_progress = cluster_progress(cte_cluster_index, zip(selected_df["Course Code"], selected_df["Credits"]))
+        cluster_hits = completed_clusters(cte_progress)
         
         if cluster_hits:
             matched_cluster = max(cluster_hits, key=cluster_hits.get)
@@ -723,6 +1042,7 @@ def show_graduation_tracker():
             )
         else:
             st.sidebar.warning("CTE cluster requirement not met")
+            show_cluster_suggestions(cte_progress)
 
         # ---- FINAL STATUS CHECK ----
         all_met = (
@@ -741,7 +1061,6 @@ def show_graduation_tracker():
         else:
             st.success("✅ All graduation requirements for the Career & Technical Pathway are complete!")
             
-        st.session_state.total_credits = total_credits
         return total_credits
         
 #------------------------------------------------------------------------------------------------------------------------------------
@@ -752,15 +1071,7 @@ def show_graduation_tracker():
         st.markdown("🏅 **Advanced/Honors Endorsement Tracker**")
     
         claimed_courses = set()    
-        selected_df_rows = []
-        for course_name in st.session_state.ms_credits + sum(st.session_state.course_plan.values(), []):
-            if not course_name:
-                continue
-            row = course_catalog[course_catalog["Course Name"] == course_name]
-            if not row.empty:
-                selected_df_rows.append(row)
-
-        selected_df = pd.concat(selected_df_rows, ignore_index=True) if selected_df_rows else pd.DataFrame(columns=course_catalog.columns)        
+        selected_df = selected_courses_df()
         selected_df["Course Code"] = selected_df["Course Code"].astype(str)
         selected_df["Credits"] = pd.to_numeric(selected_df["Credits"], errors="coerce")
         selected_df.dropna(subset=["Credits"], inplace=True)
@@ -902,18 +1213,8 @@ def show_graduation_tracker():
         lang_credits = lang_df["Credits"].sum()
     
         # CTE cluster logic
-        cte_df = selected_df[selected_df["Department"].isin(["CTE", "Business", "Computer Science"])]
-        cte_df["Course Code"] = cte_df["Course Code"].astype(str)
-    
-        cluster_hits = {}
-        for cluster, codes in cte_cluster_map.items():
-            matched = cte_df[cte_df["Course Code"].isin(codes)]
-            total_cluster_credits = matched["Credits"].sum()
-            codes_taken = set(matched["Course Code"])
-            all_courses_completed = codes_taken == set(codes)
-    
-            if all_courses_completed or total_cluster_credits >= 1.5:
-                cluster_hits[cluster] = total_cluster_credits
+        cte_progress = cluster_progress(cte_cluster_index, zip(selected_df["Course Code"], selected_df["Credits"]))
+        cluster_hits = completed_clusters(cte_progress)
     
         if lang_credits >= 2:
             st.success(f"Languages: ✅ {lang_credits}/2 credits in World Languages")
@@ -922,6 +1223,7 @@ def show_graduation_tracker():
             st.success(f"✅ Completed CTE cluster: **{matched_cluster}** ({cluster_hits[matched_cluster]} credits)")
         else:
             st.warning("World Language or CTE cluster requirement not met")
+            show_cluster_suggestions(cte_progress)
     
         # --- Final Graduation Check ---
         if (
@@ -938,13 +1240,12 @@ def show_graduation_tracker():
         else:
             st.warning("Some graduation requirements are still unmet. Please review the categories above.")
         
-        st.session_state.total_credits = total_credits
         return total_credits
 
     # End of show_graduation_tracker definition
     # ------------------------------------------
 # Only get total_credits for print mode, without rerendering the tracker
-total_credits = st.session_state.get("total_credits", 0)
+total_credits = sum(credits_by_code[course_codes[course_id]] for course_id in plan if course_id)
 
 # === PRINT-FRIENDLY VIEW TOGGLE ===
 
@@ -966,13 +1267,16 @@ if "print_mode" not in st.session_state:
 
 st.markdown("---")
 if st.session_state.print_mode:
-    
+    print_started = time.perf_counter()
+    # Only the print view needs these
+    import base64
+    from datetime import datetime
+    import streamlit.components.v1 as components
+
     selected_pathway = st.session_state.get("grad_pathway", "N/A")
-    total_credits = st.session_state.get("total_credits", 0)
 
     # Load and encode logo image
-    with open("WHS_logo2.webp", "rb") as image_file:
-        logo_base64 = base64.b64encode(image_file.read()).decode()
+    logo_base64 = str(school["logo"], "ascii")
 
     # Format timestamp as MM/DD/YY HH:MM (24-hour)
     timestamp = datetime.now().strftime("%m/%d/%y %H:%M")
@@ -1004,9 +1308,9 @@ if st.session_state.print_mode:
 
 """
 
-    for year in years:
-        core = ", ".join([c for c in st.session_state.course_plan[year][:4] if c])
-        elective = ", ".join([c for c in st.session_state.course_plan[year][4:] if c])
+    for year, start in year_offsets.items():
+        core = ", ".join([course_names[c] for c in plan[start:start + 4] if c])
+        elective = ", ".join([course_names[c] for c in plan[start + 4:start + slots_per_year] if c])
         html_printable += f"<tr><td>{year}</td><td>{core}</td><td>{elective}</td></tr>"
 
     html_printable += f"""
@@ -1046,10 +1350,29 @@ if st.session_state.print_mode:
             </button>
         </div>
     """, height=100)
+    metrics.phase_seconds.observe(time.perf_counter() - print_started, phase="print_build", grade="all")
      
 #----------END PRINT LOOP-------------
 
 # Call tracker in sidebar
 with st.sidebar:
-    department_sidebar()
-    show_graduation_tracker()
+    department_sidebar(dept_code_to_name)
+    if not client_mode:
+        with metrics.phase_seconds.time(phase="tracker", grade="all"):
+            if school_config.get("pathway_rules"):
+                show_rules_tracker()
+            elif shadow.sampled():
+                # Shadow mode: note what the legacy tracker shows; the candidate engine checks it off this rerun
+                recorder = shadow.TrackerRecorder(st)
+                legacy_started = time.perf_counter()
+                legacy_total = show_graduation_tracker(recorder)
+                shadow.worker().submit(
+                    snapshot, normalize_plan(dict(plan_record(), pathway=st.session_state.grad_pathway)),
+                    st.session_state.grad_pathway, recorder.lines, time.perf_counter() - legacy_started, legacy_total
+                )
+            else:
+                show_graduation_tracker()
+
+pathway_label = st.session_state.get("grad_pathway", snapshot["pathways"][0])
+metrics.rerun_seconds.observe(time.perf_counter() - rerun_started, pathway=pathway_label)
+metrics.reruns_total.inc(pathway=pathway_label)
@@ -0,0 +1,154 @@
+"""Background analyses for the planner sidebar, run on a small shared worker pool.
+
+    WHS_ANALYSIS_WORKERS=2 streamlit run WHS_course_plan.py
+
+The credit totals in the sidebar are drawn on every rerun. Slower analyses, such as which
+courses would finish a nearly complete CTE cluster, are submitted here as jobs instead.
+The rerun never waits for them: a small polling fragment stands in for each unfinished
+one and reruns the page as soon as its result is in.
+
+A job belongs to one session and analysis, and carries the plan version it was computed
+from. Submitting the same version again returns the existing job and its result.
+Submitting a newer version cancels the older job, so a student who changes a slot never
+waits for an analysis of the plan they had before. A job that has not started is
+dropped. A running job sees its `cancelled` event set and can stop early, and its
+result is thrown away. The pool is bounded: once `max_pending` jobs are waiting or
+running, new jobs are turned away and the planner says so instead of queueing more work.
+
+The workers are threads, so jobs read the school's mapped catalog image and indexes in place.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+import metrics
+
+default_workers = int(os.environ.get("WHS_ANALYSIS_WORKERS", "2"))
+poll_seconds = float(os.environ.get("WHS_ANALYSIS_POLL_SECONDS", "0.5"))  # how often a waiting sidebar checks
+max_jobs = 1000  # (session, analysis) results kept; the oldest are forgotten first
+
+jobs_total = metrics.Counter(
+    "planner_analysis_jobs_total", "Sidebar analysis jobs by outcome.", ["analysis", "outcome"]
+)
+analysis_seconds = metrics.Histogram(
+    "planner_analysis_seconds", "Time a sidebar analysis ran on the worker pool.", ["analysis"]
+)
+analysis_wait_seconds = metrics.Histogram(
+    "planner_analysis_wait_seconds", "Time from submitting a sidebar analysis to its result.", ["analysis"]
+)
+
+
+class Job:
+    """One analysis of one plan version; `state` is pending, done, failed, cancelled or rejected."""
+
+    def __init__(self, name, version):
+        self.name = name
+        self.version = version
+        self.cancelled = threading.Event()
+        self.submitted = time.perf_counter()
+        self.future = None
+        self.rejected = False
+
+    @property
+    def state(self):
+        if self.rejected:
+            return "rejected"
+        if self.cancelled.is_set():
+            return "cancelled"
+        if not self.future.done():
+            return "pending"
+        return "failed" if self.future.exception() else "done"
+
+    def done(self):
+        return self.state != "pending"
+
+    def result(self):
+        return self.future.result() if self.state == "done" else None
+
+    def error(self):
+        return self.future.exception() if self.state == "failed" else None
+
+
+class AnalysisPool:
+    """Bounded thread pool with at most one live job per (owner, analysis)."""
+
+    def __init__(self, workers=default_workers, max_pending=None):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending or 8 * self.workers
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+        self._jobs = OrderedDict()  # (owner, analysis) -> latest Job
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, owner, name, version, function, *args):
+        """The job computing function(*args, cancelled=event) for this version, started if new."""
+        key = (owner, name)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.version == version and job.state not in ("cancelled", "rejected"):
+                self._jobs.move_to_end(key)
+                return job
+            if job is not None and job.state == "pending":
+                job.cancelled.set()
+                if job.future.cancel():
+                    self._pending -= 1  # never started, so _run will not count it down
+                jobs_total.inc(analysis=name, outcome="cancelled")
+
+            job = self._jobs[key] = Job(name, version)
+            self._jobs.move_to_end(key)
+            while len(self._jobs) > max_jobs:
+                self._jobs.popitem(last=False)
+            if self._pending >= self.max_pending:
+                job.rejected = True
+                jobs_total.inc(analysis=name, outcome="rejected")
+                return job
+            self._pending += 1
+            # Assigned under the lock, so a concurrent submit for this key never sees a job without a future
+            job.future = self._executor.submit(self._run, job, function, args)
+        return job
+
+    def _run(self, job, function, args):
+        try:
+            if job.cancelled.is_set():
+                raise CancelledError()
+            started = time.perf_counter()
+            try:
+                value = function(*args, cancelled=job.cancelled)
+            except Exception:
+                jobs_total.inc(analysis=job.name, outcome="failed")
+                raise
+            if not job.cancelled.is_set():
+                finished = time.perf_counter()
+                analysis_seconds.observe(finished - started, analysis=job.name)
+                analysis_wait_seconds.observe(finished - job.submitted, analysis=job.name)
+                jobs_total.inc(analysis=job.name, outcome="done")
+            return value
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool():
+    """The process-wide analysis pool, started on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = AnalysisPool()
+    return _pool
+
+
+metrics.Gauge(
+    "planner_analysis_pending", "Sidebar analysis jobs waiting for or running on the pool.",
+    callback=lambda: {(): _pool.pending() if _pool is not None else 0}
+)
@@ -0,0 +1,319 @@
+"""Local JSON API over the planning core, for SIS integration.
+
+    python api_server.py serve --port 8600 --workers 4
+    python api_server.py loadtest --url http://127.0.0.1:8600/validate --requests 2000 --concurrency 16
+
+Endpoints (POST, JSON body; a list body is treated as a batch and answered with a list):
+    /options   {"plan": {...}, "year": "10th Grade", "slot": 4, "department_code": "CTE"}
+    /validate  {"plan": {...}}
+    /pathway   {"plan": {...}, "pathway": "University"}
+Any body may name a "school" from schools.json; the default school is used otherwise.
+GET /health reports the worker pid and the schools it has loaded.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import threading
+import time
+import traceback
+import http.client
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from planner_core import (
+    years, load_snapshot, normalize_plan, eligible_options, validate_plan, evaluate_pathway
+)
+from schools import SchoolCache, load_registry
+
+max_body_bytes = 2 * 1024 * 1024
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _codes(value):
+    return isinstance(value, list) and all(code is None or isinstance(code, (str, int)) for code in value)
+
+
+def _optional_string(body, key, label=None):
+    value = body.get(key)
+    if value is not None and not isinstance(value, str):
+        raise BadRequest(f"'{label or key}' must be a string")
+    return value
+
+
+def _plan(body):
+    plan = body.get("plan")
+    if not isinstance(plan, dict):
+        raise BadRequest("'plan' must be an object")
+    courses = plan.get("courses")
+    if courses is not None and not isinstance(courses, dict):
+        raise BadRequest("'plan.courses' must be an object mapping each year to a list of course codes")
+    for year, row in (courses or {}).items():
+        if row is not None and not _codes(row):
+            raise BadRequest(f"'plan.courses[\"{year}\"]' must be a list of course codes")
+    if plan.get("ms_credits") is not None and not _codes(plan["ms_credits"]):
+        raise BadRequest("'plan.ms_credits' must be a list of course codes")
+    _optional_string(plan, "pathway", "plan.pathway")
+    return normalize_plan(plan)
+
+
+def options_endpoint(snapshot, body):
+    year = body.get("year")
+    if year not in years:
+        raise BadRequest(f"'year' must be one of {years}")
+    slot = body.get("slot")
+    if not isinstance(slot, int) or not 0 <= slot < 8:
+        raise BadRequest("'slot' must be an integer from 0 to 7")
+    catalog = snapshot["catalog"]
+    codes = eligible_options(snapshot, _plan(body), year, slot, _optional_string(body, "department_code") or "")
+    return {"options": [
+        {"code": code, "name": catalog[code]["name"], "credits": catalog[code]["credits"], "notes": catalog[code]["notes"]}
+        for code in codes
+    ]}
+
+
+def validate_endpoint(snapshot, body):
+    plan = _plan(body)
+    result = validate_plan(snapshot, plan)
+    try:
+        result["pathway"] = evaluate_pathway(snapshot, plan)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    return result
+
+
+def pathway_endpoint(snapshot, body):
+    try:
+        return evaluate_pathway(snapshot, _plan(body), _optional_string(body, "pathway"))
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+
+routes = {
+    "/options": options_endpoint,
+    "/validate": validate_endpoint,
+    "/pathway": pathway_endpoint,
+}
+
+
+def make_handler(registry, school_cache):
+    def answer(endpoint, body):
+        school_id = _optional_string(body, "school") or registry["default"]
+        if school_id not in registry["schools"]:
+            raise BadRequest(f"Unknown school: {school_id}")
+        return endpoint(school_cache.get(school_id), body)
+
+    class PlannerHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so load tests measure the planner rather than TCP setup
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "pid": os.getpid(), "schools": school_cache.loaded()})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            endpoint = routes.get(self.path)
+            header = self.headers.get("Content-Length")
+            if header is None:
+                self.close_connection = True
+                self._send(411, {"error": "Content-Length is required"})
+                return
+            try:
+                length = int(header)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.close_connection = True  # the body's end is unknown, so the connection cannot be reused
+                self._send(400, {"error": "Content-Length must be a non-negative integer"})
+                return
+            if length > max_body_bytes:
+                self.close_connection = True
+                self._send(413, {"error": "request body too large"})
+                return
+            raw = self.rfile.read(length)
+            if endpoint is None:
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(raw or b"null")
+                if isinstance(body, list):
+                    self._send(200, [self._answer(endpoint, item) for item in body])
+                elif isinstance(body, dict):
+                    self._send(200, answer(endpoint, body))
+                else:
+                    raise BadRequest("body must be an object or a list of objects")
+            except (BadRequest, json.JSONDecodeError) as e:
+                self._send(400, {"error": str(e)})
+            except Exception:
+                traceback.print_exc()
+                self._send(500, {"error": "internal error"})
+
+        def _answer(self, endpoint, item):
+            # One bad entry in a batch should not fail its neighbours
+            if not isinstance(item, dict):
+                return {"error": "batch entries must be objects"}
+            try:
+                return answer(endpoint, item)
+            except BadRequest as e:
+                return {"error": str(e)}
+            except Exception:
+                traceback.print_exc()
+                return {"error": "internal error"}
+
+        def log_message(self, format, *args):
+            pass
+
+    return PlannerHandler
+
+
+def serve(host, port, workers, registry_path=None):
+    """Pre-fork server: the socket and default school are set up once, then each worker serves with its own threads.
+
+    Every worker keeps its own bounded cache of read-only school snapshots; the default
+    school is loaded before forking so workers start with it already in memory.
+    """
+    registry = load_registry(registry_path)
+    school_cache = SchoolCache(lambda school_id: load_snapshot(school=registry["schools"][school_id]))
+    school_cache.get(registry["default"])
+    server = ThreadingHTTPServer((host, port), make_handler(registry, school_cache))
+    server.daemon_threads = True
+    print(f"Serving planner API on http://{host}:{port} with {workers} worker(s)")
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(*_):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        stop()
+    server.server_close()
+
+
+def load_test(url, body, total_requests, concurrency):
+    """Fires total_requests POSTs from concurrency threads and reports throughput and latency percentiles."""
+    data = json.dumps(body).encode()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_thread = [total_requests // concurrency + (1 if i < total_requests % concurrency else 0) for i in range(concurrency)]
+
+    target = urllib.parse.urlsplit(url)
+    headers = {"Content-Type": "application/json"}
+
+    def worker(count):
+        local = []
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                connection.request("POST", target.path or "/", body=data, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise OSError(f"HTTP {response.status}")
+                local.append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                with lock:
+                    errors.append(str(e))
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(count,)) for count in per_thread]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    if not latencies:
+        return {"requests": 0, "errors": len(errors)}
+    cut = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cut[49] * 1000, 2),
+        "p95_ms": round(cut[94] * 1000, 2),
+        "p99_ms": round(cut[98] * 1000, 2),
+    }
+
+
+sample_plan = {
+    "pathway": "University",
+    "courses": {
+        "9th Grade": ["2401", "4301", "7201", "8101", "2201", "6105", "3101", "1101"],
+        "10th Grade": ["2501", "4401", "7101", "8201", "3102", "6101", "8410", "1106"],
+        "11th Grade": ["2601", "4506", "7301", "8304", "8701", "", "", ""],
+        "12th Grade": ["2715", "", "", "8401", "", "", "", ""],
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_args = sub.add_parser("serve")
+    serve_args.add_argument("--host", default="127.0.0.1")
+    serve_args.add_argument("--port", type=int, default=8600)
+    serve_args.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    serve_args.add_argument("--schools", default=None, help="school registry (default: schools.json or $WHS_SCHOOLS)")
+    load_args = sub.add_parser("loadtest")
+    load_args.add_argument("--url", default="http://127.0.0.1:8600/validate")
+    load_args.add_argument("--requests", type=int, default=1000)
+    load_args.add_argument("--concurrency", type=int, default=8)
+    load_args.add_argument("--batch", type=int, default=1, help="plans per request body")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers, args.schools)
+    else:
+        body = {"plan": sample_plan} if args.batch <= 1 else [{"plan": sample_plan}] * args.batch
+        print(json.dumps(load_test(args.url, body, args.requests, args.concurrency), indent=2))
+
+
+if __name__ == "__main__":
+    main()
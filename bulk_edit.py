@@ -0,0 +1,344 @@
+"""Counselor bulk edits: change one course in every saved plan that has it, in one transaction.
+
+    python bulk_edit.py replace 9605 9606 [--grade 11] [--school whs] [--report impact.csv] [--dry-run]
+    python bulk_edit.py drop 9605 [--grade 11] [--school whs] [--report impact.csv] [--dry-run]
+
+`replace` puts the new code in every slot that holds the old one, for a course that was
+renumbered. `drop` takes a cancelled course out, and fills each slot it leaves with the best
+course the planner would have offered there:
+- a course in the same CTE cluster first;
+- then the courses other students with the same earlier courses chose most often (see sequences.py);
+- then catalog order.
+When nothing is eligible, the slot is left empty.
+--grade limits the edit to those grades (8 is the middle school credits).
+
+The plan store finds the affected plans in SQL, base plans and saved scenarios alike.
+Only those plans are edited and checked again. Each is run through the planner's slot
+validation (catalog, grade, department, prerequisites, duplicates) and its pathway
+requirements, before and after the edit.
+
+Everything is written in one transaction, which holds the store's write lock from the
+first read to the commit. If any plan fails, nothing is written. A plan fails when the edit
+gives it a validation issue it did not have before, such as a later course whose
+prerequisite was dropped. --allow-new-issues writes such plans anyway. They are still listed.
+The impact report has one row per changed plan or scenario: the slots changed, and the
+pathway status and validation issues before and after.
+"""
+import argparse
+import csv
+import os
+import time
+
+import plan_store
+import sequences
+from planner_core import (
+    years, core_departments, ms_slots, slots_per_year, grade_number, prereq_met, taken_before, load_snapshot,
+    evaluate_pathway, validate_plan
+)
+from schools import load_registry
+
+ms_grade = 8
+report_columns = [
+    "student_id", "student_name", "grade", "scenario", "pathway", "changes", "total_credits_before",
+    "total_credits_after", "all_met_before", "all_met_after", "newly_unmet", "newly_met", "new_issues",
+]
+
+
+class BulkEditRejected(ValueError):
+    """Raised (after rolling back) when the edit would give plans new validation issues."""
+
+    def __init__(self, message, impacts):
+        super().__init__(message)
+        self.impacts = impacts
+
+
+# Plans as the planner numbers its slots: 4 middle school slots, then 8 per year
+
+def flatten(plan):
+    return list(plan["ms_credits"]) + [code for year in years for code in plan["courses"][year]]
+
+
+def unflatten(codes, pathway):
+    return {
+        "ms_credits": list(codes[:ms_slots]),
+        "courses": {
+            year: list(codes[ms_slots + n * slots_per_year:ms_slots + (n + 1) * slots_per_year])
+            for n, year in enumerate(years)
+        },
+        "pathway": pathway,
+    }
+
+
+def slot_year(slot):
+    """(year, slot within the year), with year None for a middle school slot."""
+    if slot < ms_slots:
+        return None, slot
+    return years[(slot - ms_slots) // slots_per_year], (slot - ms_slots) % slots_per_year
+
+
+def slot_label(slot):
+    year, index = slot_year(slot)
+    return f"Middle School {index + 1}" if year is None else f"{year} course {index + 1}"
+
+
+class CourseEdit:
+    """Replaces or drops one course code in the slots of the chosen grades."""
+
+    def __init__(self, snapshot, code, replacement=None, grades=None, next_courses=None):
+        self.snapshot = snapshot
+        self.code = code
+        self.replacement = replacement  # None: drop and fill with the best eligible alternative
+        self.grades = set(grades) if grades else None
+        self.next_courses = next_courses or sequences.NextCourseIndex()
+        self._positions = {code: n for n, code in enumerate(snapshot["catalog"])}
+
+    def slots(self, codes):
+        return [
+            slot for slot, code in enumerate(codes)
+            if code == self.code and (self.grades is None or self.grade(slot) in self.grades)
+        ]
+
+    @staticmethod
+    def grade(slot):
+        year, _ = slot_year(slot)
+        return ms_grade if year is None else grade_number(year)
+
+    def apply(self, plan):
+        """(edited plan, [(slot, before, after)]); slots are edited in planner order."""
+        codes = flatten(plan)
+        changes = []
+        for slot in self.slots(codes):
+            codes[slot] = ""
+            after = self.replacement if self.replacement is not None else self.alternative(codes, slot, plan["pathway"])
+            codes[slot] = after
+            changes.append((slot, self.code, after))
+        return unflatten(codes, plan["pathway"]), changes
+
+    def alternative(self, codes, slot, pathway):
+        """The course the dropped one's slot is filled with, or "" if none is eligible."""
+        catalog = self.snapshot["catalog"]
+        dropped = catalog.get(self.code)
+        year, index = slot_year(slot)
+        if year is None:
+            department = dropped["department"] if dropped else None
+            offered = [code for code, course in catalog.items() if ms_grade in course["grades"]]
+            taken = set()
+        else:
+            department = core_departments[index] if index < len(core_departments) else (
+                dropped["department"] if dropped else None
+            )
+            offered = self.snapshot["courses_by_grade"][year]
+            if index == 0:
+                offered = [code for code in offered if code in self.snapshot["english_course_codes_by_grade"].get(year, [])]
+            taken = taken_before(unflatten(codes, pathway), year, index)
+        if department is None:
+            return ""  # the course is no longer in the catalog, so there is nothing to match it with
+        in_plan = set(codes)
+        candidates = [
+            code for code in offered
+            if code != self.code and code not in in_plan and catalog[code]["department"] == department
+            and prereq_met(catalog[code]["prereq_groups"], taken)
+        ]
+        if not candidates:
+            return ""
+
+        clusters = set(self.snapshot["cluster_index"]["code_to_clusters"].get(self.code, ()))
+        grade = self.grade(slot)
+        previous, earlier = self._earlier_codes(codes, grade)
+        scores = self.next_courses.scores(grade, pathway, previous, earlier) if self.next_courses else {}
+        return max(candidates, key=lambda code: (
+            bool(clusters.intersection(self.snapshot["cluster_index"]["code_to_clusters"].get(code, ()))),
+            *scores.get(code, (0, 0)),
+            -self._positions[code],
+        ))
+
+    def _earlier_codes(self, codes, grade):
+        """Codes planned in the grade before `grade` and the one before that."""
+        def codes_in(g):
+            return [code for slot, code in enumerate(codes) if code and self.grade(slot) == g]
+        return codes_in(grade - 1), codes_in(grade - 2)
+
+
+def _issue_keys(validation):
+    return (
+        {(issue["year"], issue["slot"], issue["code"], issue["problem"]) for issue in validation["issues"]}
+        | {("duplicate", None, code, "duplicate selection") for code in validation["duplicates"]}
+    )
+
+
+def issue_label(issue):
+    year, slot, code, problem = issue
+    return f"{code}: {problem}" if slot is None else f"{year} course {slot + 1}: {code} {problem}"
+
+
+def _status(snapshot, plan):
+    if plan["pathway"] not in snapshot["rules"]:
+        return None
+    return evaluate_pathway(snapshot, plan)
+
+
+def check(snapshot, before, after, changes):
+    """Impact of one edited plan: pathway status and validation issues before and after."""
+    status_before, status_after = _status(snapshot, before), _status(snapshot, after)
+    met_before = {r["label"]: r["met"] for r in status_before["requirements"]} if status_before else {}
+    met_after = {r["label"]: r["met"] for r in status_after["requirements"]} if status_after else {}
+    new_issues = sorted(
+        _issue_keys(validate_plan(snapshot, after)) - _issue_keys(validate_plan(snapshot, before)),
+        key=lambda issue: (str(issue[0]), issue[1] if issue[1] is not None else -1, issue[2])
+    )
+    return {
+        "changes": changes,
+        "status_before": status_before,
+        "status_after": status_after,
+        "newly_unmet": [label for label, met in met_before.items() if met and not met_after.get(label)],
+        "newly_met": [label for label, met in met_after.items() if met and not met_before.get(label)],
+        "new_issues": new_issues,
+    }
+
+
+def run_edit(conn, snapshot, edit, dry_run=False, allow_new_issues=False):
+    """Applies `edit` to every affected plan of the school in one transaction; returns the impacts.
+
+    Raises BulkEditRejected, with nothing written, if a plan would get new validation issues
+    and `allow_new_issues` is false. Any other error rolls back as well.
+    """
+    impacts = []
+    conn.execute("BEGIN IMMEDIATE")  # no planner save can slip in between reading and writing
+    try:
+        plan_records, scenario_writes = [], []
+        for record in plan_store.plans_with_course(conn, edit.code, snapshot["school_id"]):
+            rows = plan_store.load_scenarios(conn, record["student_id"])
+            base_before = flatten(record)
+            base_after, changes = edit.apply(record)
+            student = {key: record[key] for key in ("student_id", "student_name", "grade")}
+            if changes:
+                plan_records.append(dict(record, **base_after))
+                impacts.append(dict(student, scenario=rows[0]["name"] if rows else "",
+                                    pathway=record["pathway"], **check(snapshot, record, base_after, changes)))
+
+            new_rows = rows[:1]
+            scenarios_changed = False
+            base_codes = flatten(base_after)
+            for row in rows[1:]:
+                codes = list(base_before)
+                for slot, code in row["delta"].items():
+                    codes[int(slot)] = code
+                scenario = unflatten(codes, row["pathway"])
+                scenario_after, changes = edit.apply(scenario)
+                delta = {slot: code for slot, code in enumerate(flatten(scenario_after)) if code != base_codes[slot]}
+                new_rows.append(dict(row, delta=delta))
+                scenarios_changed |= delta != {int(slot): code for slot, code in row["delta"].items()}
+                if changes:
+                    impacts.append(dict(student, scenario=row["name"], pathway=row["pathway"],
+                                        **check(snapshot, scenario, scenario_after, changes)))
+            if scenarios_changed:
+                scenario_writes.append((record["student_id"], new_rows))
+
+        rejected = [impact for impact in impacts if impact["new_issues"]]
+        if rejected and not allow_new_issues:
+            raise BulkEditRejected(f"{len(rejected)} plan(s) would get new validation issues", impacts)
+        if not dry_run:
+            plan_store.write_plans(conn, plan_records)
+            for student_id, rows in scenario_writes:
+                plan_store.write_scenarios(conn, student_id, rows)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("ROLLBACK" if dry_run else "COMMIT")
+    return impacts
+
+
+def _course(snapshot, code):
+    course = snapshot["catalog"].get(code)
+    return f"{code} {course['name'].strip()}" if course else (code or "(empty)")
+
+
+def write_report(path, snapshot, impacts):
+    def status(impact, when, key):
+        return impact[f"status_{when}"][key] if impact[f"status_{when}"] else None
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(report_columns)
+        for impact in impacts:
+            writer.writerow([
+                impact["student_id"], impact["student_name"], impact["grade"], impact["scenario"], impact["pathway"],
+                "; ".join(f"{slot_label(slot)}: {_course(snapshot, before)} -> {_course(snapshot, after)}"
+                          for slot, before, after in impact["changes"]),
+                status(impact, "before", "total_credits"), status(impact, "after", "total_credits"),
+                status(impact, "before", "all_met"), status(impact, "after", "all_met"),
+                "; ".join(impact["newly_unmet"]), "; ".join(impact["newly_met"]),
+                "; ".join(issue_label(issue) for issue in impact["new_issues"]),
+            ])
+
+
+def summary(impacts):
+    slots = [after for impact in impacts for _, _, after in impact["changes"]]
+    return {
+        "plans changed": len({impact["student_id"] for impact in impacts}),
+        "scenarios changed": len(impacts),
+        "slots changed": len(slots),
+        "slots left empty": sum(1 for after in slots if not after),
+        "no longer meet pathway": sum(
+            1 for impact in impacts
+            if impact["status_before"] and impact["status_before"]["all_met"] and not impact["status_after"]["all_met"]
+        ),
+        "now meet pathway": sum(
+            1 for impact in impacts
+            if impact["status_before"] and not impact["status_before"]["all_met"] and impact["status_after"]["all_met"]
+        ),
+        "with new validation issues": sum(1 for impact in impacts if impact["new_issues"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="plan store (default: plans.db or $WHS_PLAN_DB)")
+    parser.add_argument("--school", default=None, help="school id from schools.json (default: the registry default)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replace = commands.add_parser("replace", help="put course NEW in every slot holding course OLD")
+    replace.add_argument("code", metavar="OLD")
+    replace.add_argument("replacement", metavar="NEW")
+    drop = commands.add_parser("drop", help="take course CODE out and fill its slots with eligible alternatives")
+    drop.add_argument("code", metavar="CODE")
+    for command in (replace, drop):
+        command.add_argument("--grade", type=int, nargs="+", help="only these grades (8 = middle school credits)")
+        command.add_argument("--report", help="write the before/after impact report to this CSV")
+        command.add_argument("--dry-run", action="store_true", help="report the impact, then roll back")
+        command.add_argument("--allow-new-issues", action="store_true",
+                             help="write plans the edit gives new validation issues (they stay in the report)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    registry = load_registry()
+    config = registry["schools"][args.school or registry["default"]]
+    snapshot = load_snapshot(school=config)
+    replacement = getattr(args, "replacement", None)
+    if replacement is not None and replacement not in snapshot["catalog"]:
+        parser.error(f"{replacement} is not in {config['name']}'s catalog")
+    path = sequences.index_path(config["id"])
+    next_courses = sequences.NextCourseIndex.load(path) if replacement is None and os.path.exists(path) else None
+    edit = CourseEdit(snapshot, args.code, replacement, args.grade, next_courses)
+    conn = plan_store.connect(args.db)
+
+    try:
+        impacts = run_edit(conn, snapshot, edit, args.dry_run, args.allow_new_issues)
+        outcome = "dry run, nothing written" if args.dry_run else "committed"
+    except BulkEditRejected as e:
+        impacts = e.impacts
+        outcome = f"rolled back: {e}"
+    if args.report:
+        write_report(args.report, snapshot, impacts)
+
+    for key, value in summary(impacts).items():
+        print(f"{key}: {value}")
+    print(f"seconds: {round(time.perf_counter() - started, 2)}")
+    print(outcome)
+    if outcome.startswith("rolled back"):
+        for impact in [impact for impact in impacts if impact["new_issues"]][:20]:
+            print(f"  {impact['student_id']} {impact['scenario']}: {issue_label(impact['new_issues'][0])}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import csv
+import os
+import threading
+import time
+
+# Seat limits for sections with a hard cap (PLTW courses, CTE labs). Courses not listed are unlimited.
+default_capacity_path = "WHS_course_capacity.csv"
+
+# Course codes are only unique within a school, so every row is keyed by school as well
+schema = """
+CREATE TABLE IF NOT EXISTS seat_counts (
+    school      TEXT NOT NULL DEFAULT 'whs',
+    course_code TEXT NOT NULL,
+    capacity    INTEGER NOT NULL,
+    seated      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (school, course_code)
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    school      TEXT NOT NULL DEFAULT 'whs',
+    course_code TEXT NOT NULL,
+    student_id  TEXT NOT NULL,
+    status      TEXT NOT NULL CHECK (status IN ('seated', 'waitlisted')),
+    created_at  REAL NOT NULL,
+    UNIQUE (school, course_code, student_id)
+);
+CREATE INDEX IF NOT EXISTS reservations_waitlist ON reservations (school, course_code, status, id);
+"""
+
+# Stores created before multi-school support keyed seats by course code alone
+_migration = """
+ALTER TABLE seat_counts RENAME TO seat_counts_single;
+ALTER TABLE reservations RENAME TO reservations_single;
+DROP INDEX IF EXISTS reservations_waitlist;
+""" + schema + """
+INSERT INTO seat_counts (course_code, capacity, seated) SELECT course_code, capacity, seated FROM seat_counts_single;
+INSERT INTO reservations (id, course_code, student_id, status, created_at)
+    SELECT id, course_code, student_id, status, created_at FROM reservations_single;
+DROP TABLE seat_counts_single;
+DROP TABLE reservations_single;
+"""
+
+
+def load_capacities(path=default_capacity_path):
+    """Course code -> seats; an empty table (or no file) means registration has no limits."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return {row["Course Code"].strip(): int(row["Seats"]) for row in csv.DictReader(f) if row["Seats"].strip()}
+
+
+def init_store(conn, capacities, school="whs"):
+    """Creates the reservation tables and applies the school's current capacity table.
+
+    Lowering a capacity below the seats already taken unseats nobody: those students keep
+    their seats, the course shows 0 remaining, and new requests join the waitlist until
+    drops bring the seated count under the new capacity.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(seat_counts)")}
+    conn.executescript(_migration if columns and "school" not in columns else schema)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for code, seats in capacities.items():
+            conn.execute(
+                "INSERT INTO seat_counts (school, course_code, capacity) VALUES (?, ?, ?) "
+                "ON CONFLICT(school, course_code) DO UPDATE SET capacity = excluded.capacity",
+                (school, code, seats)
+            )
+            _promote_waitlist(conn, school, code)  # a raised capacity seats the head of the waitlist
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _promote_waitlist(conn, school, code):
+    while True:
+        row = conn.execute(
+            "SELECT id FROM reservations WHERE school = ? AND course_code = ? AND status = 'waitlisted' "
+            "ORDER BY id LIMIT 1", (school, code)
+        ).fetchone()
+        if row is None:
+            return
+        taken = conn.execute(
+            "UPDATE seat_counts SET seated = seated + 1 WHERE school = ? AND course_code = ? AND seated < capacity",
+            (school, code)
+        ).rowcount
+        if not taken:
+            return
+        conn.execute("UPDATE reservations SET status = 'seated' WHERE id = ?", (row[0],))
+
+
+def finalize_registration(conn, student_id, codes, school="whs"):
+    """Atomically reserves a seat (or a waitlist spot) in every capped course of the plan.
+
+    Courses the student dropped since their last finalize are released, and the seat goes to
+    the head of that course's waitlist. Everything runs in one short write transaction.
+    """
+    wanted = set(codes)
+    started = time.time()
+    conn.execute("BEGIN IMMEDIATE")  # take the write lock up front so two finalizes never interleave
+    try:
+        capped = {row[0] for row in conn.execute("SELECT course_code FROM seat_counts WHERE school = ?", (school,))}
+        wanted &= capped
+        existing = dict(conn.execute(
+            "SELECT course_code, status FROM reservations WHERE school = ? AND student_id = ?", (school, student_id)
+        ).fetchall())
+
+        for code in set(existing) - wanted:
+            conn.execute(
+                "DELETE FROM reservations WHERE school = ? AND course_code = ? AND student_id = ?",
+                (school, code, student_id)
+            )
+            if existing[code] == "seated":
+                conn.execute(
+                    "UPDATE seat_counts SET seated = seated - 1 WHERE school = ? AND course_code = ?", (school, code)
+                )
+                _promote_waitlist(conn, school, code)
+
+        for code in sorted(wanted - set(existing)):
+            seated = conn.execute(
+                "UPDATE seat_counts SET seated = seated + 1 WHERE school = ? AND course_code = ? AND seated < capacity",
+                (school, code)
+            ).rowcount
+            conn.execute(
+                "INSERT INTO reservations (school, course_code, student_id, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (school, code, student_id, "seated" if seated else "waitlisted", started)
+            )
+
+        results = {}
+        for code, status, reservation_id in conn.execute(
+            "SELECT course_code, status, id FROM reservations WHERE school = ? AND student_id = ?", (school, student_id)
+        ).fetchall():
+            position = None
+            if status == "waitlisted":
+                position = conn.execute(
+                    "SELECT COUNT(*) FROM reservations "
+                    "WHERE school = ? AND course_code = ? AND status = 'waitlisted' AND id <= ?",
+                    (school, code, reservation_id)
+                ).fetchone()[0]
+            results[code] = {"status": status, "waitlist_position": position}
+        counts = dict(conn.execute(
+            "SELECT course_code, MAX(capacity - seated, 0) FROM seat_counts WHERE school = ?", (school,)
+        ).fetchall())
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return results, counts
+
+
+class SeatCache:
+    """Remaining seats per capped course of one school, shared by every session on this server.
+
+    The planner loop reads it on every render; the store is queried at most once per
+    `ttl` seconds, and a finalize on this server updates it immediately.
+    """
+
+    def __init__(self, connect, ttl=2.0, school="whs"):
+        self._connect = connect
+        self._school = school
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._remaining = {}
+        self._loaded_at = 0.0
+
+    def remaining(self, code):
+        if time.monotonic() - self._loaded_at > self._ttl:
+            self._refresh()
+        return self._remaining.get(code)
+
+    def update(self, counts):
+        with self._lock:
+            self._remaining = dict(counts)
+            self._loaded_at = time.monotonic()
+
+    def _refresh(self):
+        # Only one session pays for the query; the rest keep reading the previous counts meanwhile
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            conn = self._connect()
+            try:
+                self._remaining = dict(conn.execute(
+                    "SELECT course_code, MAX(capacity - seated, 0) FROM seat_counts WHERE school = ?", (self._school,)
+                ))
+            finally:
+                conn.close()
+            self._loaded_at = time.monotonic()
+        finally:
+            self._lock.release()
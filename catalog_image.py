@@ -0,0 +1,338 @@
+"""Compiled catalog image shared read-only by every planner process on a machine.
+
+    python catalog_image.py [school]   # compiles the catalog, publishes it and prints its file name
+
+Course ids, credits, department and grade codes, prerequisite bitsets, string tables and
+the base64 banner and logo are laid out in one file that each process memory-maps. The
+operating system keeps a single copy of its pages however many server processes map it.
+
+Images are named by a hash of their contents and never change once written. Publishing
+writes `<school>.current` (the name of the newest image) with a rename, and running
+processes switch to the new image the next time they check (see school_context.py).
+Only this script publishes. A planner process compiles an image from the CSV only when no
+image has been published for its school yet.
+
+Layout, little-endian: an 8-byte magic, a u32 section count, then one (name: 8 bytes,
+offset: u64, length: u64) entry per section. Per-course arrays have n + 1 entries, so
+course id n is catalog row n - 1 and id 0 is the empty slot, as in the planner.
+"""
+import base64
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping, Sequence
+
+from planner_core import years, load_snapshot
+from schools import load_registry
+
+magic = b"WHSCAT1\0"
+image_dir = os.environ.get(
+    "WHS_CATALOG_IMAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog_images")
+)
+section_entry = struct.Struct("<8sQQ")
+string_fields = ("codes", "names", "notes", "tags", "prereqs")
+
+
+def _string_table(values):
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = array("I", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    return struct.pack("<I", len(encoded)) + offsets.tobytes() + b"".join(encoded)
+
+
+def _encode_file(path):
+    if not path or not os.path.exists(path):
+        return b""
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read())
+
+
+def build_image(snapshot, config):
+    """The image file contents for one school."""
+    catalog = snapshot["catalog"]
+    courses = list(catalog.values())
+    n = len(courses)
+    ids = {course["code"]: course_id for course_id, course in enumerate(courses, 1)}
+    departments = sorted({course["department"] for course in courses})
+    department_index = {name: i for i, name in enumerate(departments)}
+    english = {}
+    for year, codes in snapshot["english_course_codes_by_grade"].items():
+        for code in codes:
+            if year in years:
+                english[code] = english.get(code, 0) | 1 << years.index(year)
+
+    # Open-addressing table: crc32(code) picks a slot, linear probing on collisions, 0 = empty
+    code_table = array("H", bytes(2 * (1 << max(2 * n, 1).bit_length())))
+    mask = len(code_table) - 1
+    for code, course_id in ids.items():
+        slot = zlib.crc32(code.encode("utf-8")) & mask
+        while code_table[slot]:
+            slot = (slot + 1) & mask
+        code_table[slot] = course_id
+
+    width = (n + 1 + 7) // 8  # bytes per prerequisite group bitset, one bit per course id
+    group_offsets = array("I", [0, 0])
+    bitsets = bytearray()
+    for course in courses:
+        for group in course["prereq_groups"]:
+            bits = sum(1 << ids[code] for code in group if code in ids)
+            bitsets += bits.to_bytes(width, "little")
+        group_offsets.append(len(bitsets) // width)
+
+    sections = {
+        "meta": json.dumps({
+            "school": snapshot["school_id"], "count": n, "departments": departments, "years": years,
+            "group_width": width,
+        }).encode(),
+        "credits": array("d", [0.0] + [course["credits"] for course in courses]).tobytes(),
+        "dept": bytes([0] + [department_index[course["department"]] for course in courses]),
+        # Bit g is set when the course is offered in grade g
+        "grades": array("H", [0] + [sum(1 << g for g in course["grades"]) for course in courses]).tobytes(),
+        # Bit y is set when the course is an English option for years[y]
+        "english": bytes([0] + [english.get(course["code"], 0) for course in courses]),
+        "groups": group_offsets.tobytes(),
+        "bitsets": bytes(bitsets),
+        "codes#": code_table.tobytes(),
+        "banner": _encode_file(config.get("banner")),
+        "logo": _encode_file(config.get("logo")),
+    }
+    for field, key in zip(string_fields, ("code", "name", "notes", "tags", "prerequisites")):
+        sections[field] = _string_table([""] + [course[key] for course in courses])
+
+    header_size = len(magic) + 4 + section_entry.size * len(sections)
+    header = bytearray(magic + struct.pack("<I", len(sections)))
+    body = bytearray()
+    for name, data in sections.items():
+        body += b"\0" * (-(header_size + len(body)) % 8)  # keep every array 8-byte aligned
+        header += section_entry.pack(name.encode().ljust(8, b"\0"), header_size + len(body), len(data))
+        body += data
+    return bytes(header + body)
+
+
+def write_image(snapshot, config, directory=None):
+    """Writes the image once and returns its file name (<school>.<hash>.img)."""
+    directory = directory or image_dir
+    data = build_image(snapshot, config)
+    name = f"{snapshot['school_id']}.{hashlib.sha256(data).hexdigest()[:12]}.img"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return name
+
+
+def publish(school_id, name, directory=None):
+    """Points <school>.current at `name` with an atomic rename, and drops older images."""
+    directory = directory or image_dir
+    if published(school_id, directory) == name:
+        return
+    pointer = os.path.join(directory, f"{school_id}.current")
+    tmp_path = f"{pointer}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(tmp_path, pointer)
+    own_image = re.compile(rf"{re.escape(school_id)}\.[0-9a-f]{{12}}\.img")
+    for old in os.listdir(directory):
+        if own_image.fullmatch(old) and old != name:
+            try:
+                os.remove(os.path.join(directory, old))  # processes that still map it keep their pages
+            except OSError:
+                pass
+
+
+def published(school_id, directory=None):
+    """File name of the school's current image, or None if none has been published."""
+    try:
+        with open(os.path.join(directory or image_dir, f"{school_id}.current"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class StringTable(Sequence):
+    """Read-only list of strings backed by the image; table[course_id] decodes one entry."""
+
+    def __init__(self, view):
+        count = struct.unpack_from("<I", view)[0]
+        self._offsets = view[4:4 + 4 * (count + 1)].cast("I")
+        self._blob = view[4 + 4 * (count + 1):]
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if index.__class__ is slice:
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return str(self._blob[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+
+class _ByCode(Mapping):
+    """Course code -> value(course id), looked up in the image's code hash table."""
+
+    def __init__(self, image, value):
+        self._image = image
+        self._value = value
+
+    def __contains__(self, code):
+        return isinstance(code, str) and bool(self._image.course_id(code))
+
+    def __getitem__(self, code):
+        course_id = self._image.course_id(code) if isinstance(code, str) else 0
+        if not course_id:
+            raise KeyError(code)
+        return self._value(course_id)
+
+    def __iter__(self):
+        return (self._image.codes[course_id] for course_id in range(1, self._image.count + 1))
+
+    def __len__(self):
+        return self._image.count
+
+
+# Catalog entry fields decoded only when read
+lazy_fields = {
+    "grades": lambda image, course_id: image.grades(course_id),
+    "tags": lambda image, course_id: image.tags[course_id],
+    "prerequisites": lambda image, course_id: image.prerequisites[course_id],
+    "prereq_groups": lambda image, course_id: image.prereq_groups(course_id),
+    "notes": lambda image, course_id: image.notes[course_id],
+}
+
+
+class _Course(dict):
+    """A planner_core catalog entry. The fields requirements check are filled in up front;
+    the rest are decoded from the image the first time they are read."""
+
+    def __init__(self, image, course_id):
+        super().__init__(
+            code=image.codes[course_id], name=image.names[course_id],
+            department=image.department(course_id), credits=image.credits[course_id],
+        )
+        self._image = image
+        self._id = course_id
+
+    def __missing__(self, key):
+        if key not in lazy_fields:
+            raise KeyError(key)
+        value = self[key] = lazy_fields[key](self._image, self._id)
+        return value
+
+
+class CatalogImage:
+    """One mapped image. Everything handed out is a view or a small value decoded on demand."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if bytes(view[:len(magic)]) != magic:
+            raise ValueError(f"{path} is not a catalog image")
+        sections = {}
+        (count,) = struct.unpack_from("<I", view, len(magic))
+        for i in range(count):
+            name, offset, length = section_entry.unpack_from(view, len(magic) + 4 + i * section_entry.size)
+            sections[name.rstrip(b"\0").decode()] = view[offset:offset + length]
+
+        meta = json.loads(bytes(sections["meta"]))
+        self.school = meta["school"]
+        self.count = meta["count"]
+        self.departments = meta["departments"]
+        self._group_width = meta["group_width"]
+        self.credits = sections["credits"].cast("d")
+        self.department_codes = sections["dept"]
+        self.grade_masks = sections["grades"].cast("H")
+        self.english_masks = sections["english"]
+        self._groups = sections["groups"].cast("I")
+        self._bitsets = sections["bitsets"]
+        self._code_table = sections["codes#"].cast("H")
+        self.codes, self.names, self.notes, self.tags, self.prerequisites = (
+            StringTable(sections[field]) for field in string_fields
+        )
+        self.banner = sections["banner"]
+        self.logo = sections["logo"]
+        # Catalog entries and code lookups, filled on first use and reused: at most one per course
+        self._courses = [None] * (self.count + 1)
+        self._ids = {}
+
+    def course_id(self, code):
+        """Catalog id for a course code, 0 if it is not in the catalog."""
+        course_id = self._ids.get(code)
+        if course_id is None:
+            course_id = self._find(code)
+            if course_id:
+                self._ids[code] = course_id  # only catalog codes, so this never outgrows the catalog
+        return course_id
+
+    def _find(self, code):
+        table = self._code_table
+        mask = len(table) - 1
+        slot = zlib.crc32(code.encode("utf-8")) & mask
+        while table[slot]:
+            if self.codes[table[slot]] == code:
+                return table[slot]
+            slot = (slot + 1) & mask
+        return 0
+
+    def department(self, course_id):
+        return self.departments[self.department_codes[course_id]] if course_id else ""
+
+    def grades(self, course_id):
+        mask = self.grade_masks[course_id]
+        return [g for g in range(16) if mask >> g & 1]
+
+    def prereq_bitsets(self, course_id):
+        """One int per prerequisite group; a group is met when it shares a bit with the taken set."""
+        width = self._group_width
+        start, end = self._groups[course_id], self._groups[course_id + 1]
+        return [int.from_bytes(self._bitsets[i * width:(i + 1) * width], "little") for i in range(start, end)]
+
+    def prereq_groups(self, course_id):
+        """The groups as lists of course codes, in catalog order."""
+        groups = []
+        for bits in self.prereq_bitsets(course_id):
+            codes = []
+            while bits:
+                low = bits & -bits
+                codes.append(self.codes[low.bit_length() - 1])
+                bits ^= low
+            groups.append(codes)
+        return groups
+
+    def ids_in_grade(self, grade):
+        """Course ids offered in a grade (a number, as in the Grade Levels column), in catalog order."""
+        return [course_id for course_id in range(1, self.count + 1) if self.grade_masks[course_id] >> grade & 1]
+
+    def course(self, course_id):
+        """The planner_core catalog entry for one course, built the first time it is read."""
+        course = self._courses[course_id]
+        if course is None:
+            course = self._courses[course_id] = _Course(self, course_id)
+        return course
+
+    def by_code(self, value):
+        """A read-only code -> value(course id) mapping, e.g. by_code(image.course) for the catalog."""
+        return _ByCode(self, value)
+
+
+def open_image(name, directory=None):
+    return CatalogImage(os.path.join(directory or image_dir, name))
+
+
+if __name__ == "__main__":
+    registry = load_registry()
+    config = registry["schools"][sys.argv[1] if len(sys.argv) > 1 else registry["default"]]
+    name = write_image(load_snapshot(school=config), config)
+    publish(config["id"], name)
+    print(name)
@@ -0,0 +1,72 @@
+"""Compiled JSON bundle of the catalog and planning rules for the in-browser planner.
+
+    python client_bundle.py [school]   # writes the bundle and prints its file name
+
+The file name carries a hash of its contents, so the browser can cache it indefinitely
+and a catalog or rules change always produces a new name.
+"""
+import hashlib
+import json
+import os
+import sys
+
+from planner_core import years, core_departments, load_snapshot
+from schools import load_registry
+
+bundle_format = 1
+component_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "plan_tracker")
+bundle_dir = os.path.join(component_dir, "bundles")
+
+
+def build_bundle(snapshot):
+    """Everything planner.js needs to check eligibility and pathways without the server."""
+    catalog = snapshot["catalog"]
+    bundle = {
+        "format": bundle_format,
+        "school": snapshot["school_id"],
+        "years": years,
+        "core_departments": core_departments,
+        "dept_code_to_name": snapshot["dept_code_to_name"],
+        "english_course_codes_by_grade": snapshot["english_course_codes_by_grade"],
+        "unlimited_repeatable_codes": sorted(snapshot["unlimited_repeatable_codes"]),
+        "limited_repeatable_counts": snapshot["limited_repeatable_counts"],
+        "pathways": snapshot["pathways"],
+        # Catalog order matters: option lists are shown in file order, as in the server planner
+        "courses": [
+            {
+                "code": code,
+                "name": course["name"],
+                "department": course["department"],
+                "grades": course["grades"],
+                "credits": course["credits"],
+                "notes": course["notes"],
+                "prereq": course["prereq_groups"],
+            }
+            for code, course in catalog.items()
+        ],
+        "rules": snapshot["rules"],
+        "clusters": {cluster: sorted(codes) for cluster, codes in snapshot["cluster_index"]["clusters"].items()},
+        "cluster_targets": snapshot["cluster_index"]["targets"],
+    }
+    payload = json.dumps(bundle, sort_keys=True, separators=(",", ":"))
+    bundle["version"] = hashlib.sha256(payload.encode()).hexdigest()[:12]
+    return bundle
+
+
+def write_bundle(snapshot, directory=bundle_dir):
+    """Writes plan_bundle.<version>.json once and returns the file name."""
+    bundle = build_bundle(snapshot)
+    name = f"plan_bundle.{bundle['version']}.json"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(bundle, f, separators=(",", ":"))
+        os.replace(tmp_path, path)  # concurrent servers never see a half-written bundle
+    return name
+
+
+if __name__ == "__main__":
+    registry = load_registry()
+    print(write_bundle(load_snapshot(school=registry["schools"][sys.argv[1] if len(sys.argv) > 1 else registry["default"]])))
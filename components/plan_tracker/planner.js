@@ -0,0 +1,343 @@
+// In-browser mirror of planner_core.py. Slot eligibility and pathway checks run against the
+// compiled bundle (client_bundle.py), and the plan only goes back to the server on Save.
+(function () {
+    "use strict";
+
+    function send(type, data) {
+        window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: type }, data || {}), "*");
+    }
+
+    function setHeight() {
+        send("streamlit:setFrameHeight", { height: document.documentElement.scrollHeight + 8 });
+    }
+
+    let bundle = null;
+    let bundleName = null;
+    let planVersion = null;
+    let catalog = {};
+    let codeToClusters = {};
+    let plan = null;
+    const slots = {};
+
+    // --- Rules: keep in step with planner_core.py ---
+
+    function prereqMet(groups, taken) {
+        return groups.every(group => group.some(code => taken.has(code)));
+    }
+
+    function takenBefore(year, slot) {
+        const taken = new Set(plan.ms_credits.filter(Boolean));
+        for (const yr of bundle.years) {
+            const row = plan.courses[yr];
+            for (let i = 0; i < row.length; i++) {
+                if (yr === year && i >= slot) return taken;
+                if (row[i]) taken.add(row[i]);
+            }
+        }
+        return taken;
+    }
+
+    function slotDepartments(slot, deptCode) {
+        if (slot < bundle.core_departments.length) return [bundle.core_departments[slot]];
+        const names = bundle.dept_code_to_name[(deptCode || "").trim().toUpperCase()] || [];
+        return typeof names === "string" ? [names] : names;
+    }
+
+    function eligibleOptions(year, slot, deptCode) {
+        const departments = slotDepartments(slot, deptCode);
+        const grade = parseInt(year, 10);
+        const candidates = bundle.courses.filter(c => c.grades.includes(grade) && departments.includes(c.department));
+        if (slot === 0) {
+            const allowed = bundle.english_course_codes_by_grade[year] || [];
+            return candidates.filter(c => allowed.includes(c.code));
+        }
+        const taken = takenBefore(year, slot);
+        return candidates.filter(c => prereqMet(c.prereq, taken));
+    }
+
+    function planCodes() {
+        const codes = plan.ms_credits.filter(Boolean);
+        for (const year of bundle.years) codes.push(...plan.courses[year].filter(Boolean));
+        return codes;
+    }
+
+    function duplicateCodes(codes) {
+        const counts = new Map();
+        codes.forEach(code => counts.set(code, (counts.get(code) || 0) + 1));
+        const unlimited = new Set(bundle.unlimited_repeatable_codes);
+        const limited = bundle.limited_repeatable_counts;
+        return [...counts]
+            .filter(([code, count]) => (code in limited ? count > limited[code] : !unlimited.has(code) && count > 1))
+            .map(([code]) => code);
+    }
+
+    function matches(req, course) {
+        if (req.departments && !req.departments.includes(course.department)) return false;
+        if (req.codes && !req.codes.includes(course.code)) return false;
+        if (req.name_contains && !course.name.toLowerCase().includes(req.name_contains)) return false;
+        return !(req.exclude_names || []).includes(course.name);
+    }
+
+    function completedClusters(selected) {
+        const progress = {};
+        for (const cluster of Object.keys(bundle.clusters)) progress[cluster] = { credits: 0, taken: new Set() };
+        for (const course of selected) {
+            for (const cluster of codeToClusters[course.code] || []) {
+                progress[cluster].credits += course.credits;
+                progress[cluster].taken.add(course.code);
+            }
+        }
+        const hits = {};
+        for (const [cluster, entry] of Object.entries(progress)) {
+            if (entry.credits >= bundle.cluster_targets[cluster] || entry.taken.size === bundle.clusters[cluster].length) {
+                hits[cluster] = entry.credits;
+            }
+        }
+        return hits;
+    }
+
+    function evaluateRequirement(req, selected) {
+        const result = { key: req.key, label: req.label };
+        if (req.any_of) {
+            result.options = req.any_of.map(option => evaluateRequirement(option, selected));
+            result.met = result.options.some(option => option.met);
+            return result;
+        }
+        if (req.cte_cluster) {
+            const hits = completedClusters(selected);
+            const names = Object.keys(hits);
+            result.cluster = names.length ? names.reduce((best, name) => (hits[name] > hits[best] ? name : best)) : null;
+            result.earned = result.cluster ? hits[result.cluster] : 0;
+            result.met = names.length > 0;
+            return result;
+        }
+        const matched = selected.filter(course => matches(req, course));
+        result.earned = matched.reduce((total, course) => total + course.credits, 0);
+        result.required = req.min_credits || 0;
+        let met = result.earned >= result.required;
+        if (req.groups) {
+            const codes = new Set(matched.map(course => course.code));
+            result.groups_met = req.groups.every(group => group.some(code => codes.has(code)));
+            met = met && result.groups_met;
+        }
+        if (req.same_language) {
+            const prefixes = {};
+            matched.forEach(course => {
+                const prefix = course.code.slice(0, 2);
+                prefixes[prefix] = (prefixes[prefix] || 0) + 1;
+            });
+            result.same_language = Object.values(prefixes).some(count => count >= 2);
+            met = met && result.same_language;
+        }
+        result.met = met;
+        return result;
+    }
+
+    function evaluatePathway(pathway) {
+        const selected = planCodes().filter(code => catalog[code]).map(code => catalog[code]);
+        const requirements = bundle.rules[pathway].map(req => evaluateRequirement(req, selected));
+        return {
+            pathway: pathway,
+            total_credits: selected.reduce((total, course) => total + course.credits, 0),
+            requirements: requirements,
+            all_met: requirements.every(req => req.met),
+        };
+    }
+
+    // --- Rendering ---
+
+    function element(tag, className, text) {
+        const node = document.createElement(tag);
+        if (className) node.className = className;
+        if (text !== undefined) node.textContent = text;
+        return node;
+    }
+
+    function describe(result) {
+        if (result.options) {
+            const met = result.options.find(option => option.met);
+            return met ? `${result.label}: ✅ ${describe(met)}` : `${result.label} requirement not met`;
+        }
+        if (result.cluster !== undefined) {
+            return result.cluster ? `Completed CTE cluster: ${result.cluster} (${result.earned} credits)` : "CTE cluster requirement not met";
+        }
+        let text = `${result.label}: ${result.met ? "✅ " : ""}${result.earned}/${result.required}`;
+        if (result.groups_met === false) text += " (check required coverage)";
+        if (result.same_language === false) text += " (2 years same language required)";
+        return text;
+    }
+
+    function renderTracker() {
+        const tracker = document.getElementById("tracker");
+        tracker.replaceChildren();
+        const result = evaluatePathway(plan.pathway);
+        const duplicates = duplicateCodes(planCodes());
+        if (duplicates.length) {
+            const names = duplicates.map(code => (catalog[code] || { name: code }).name).join(", ");
+            tracker.appendChild(element("div", "line error", `⚠️ Duplicate course selection: ${names} — most courses may only be taken once.`));
+        }
+        for (const req of result.requirements) {
+            tracker.appendChild(element("div", "line " + (req.met ? "met" : "unmet"), describe(req)));
+        }
+        tracker.appendChild(result.all_met
+            ? element("div", "line met", `✅ All graduation requirements for the ${result.pathway} pathway are complete!`)
+            : element("div", "line error", "Some graduation requirements are still unmet. Please review the categories above."));
+    }
+
+    function fillSelect(select, options, value) {
+        const signature = options.map(course => course.code).join(",");
+        if (select.dataset.signature !== signature) {
+            select.replaceChildren(new Option("", ""));
+            options.forEach(course => select.appendChild(new Option(course.name, course.code)));
+            select.dataset.signature = signature;
+        }
+        select.value = value;
+    }
+
+    function refresh() {
+        const msOptions = bundle.courses.filter(course => course.grades.includes(8));
+        plan.ms_credits.forEach((code, i) => {
+            if (!msOptions.some(course => course.code === code)) plan.ms_credits[i] = "";
+            fillSelect(slots.ms[i].select, msOptions, plan.ms_credits[i]);
+        });
+
+        // Same order as the server loop: a slot's options depend on every slot before it
+        for (const year of bundle.years) {
+            plan.courses[year].forEach((code, i) => {
+                const slot = slots[year][i];
+                const options = eligibleOptions(year, i, plan.dept_codes[year][i]);
+                if (!options.some(course => course.code === code)) plan.courses[year][i] = "";
+                fillSelect(slot.select, options, plan.courses[year][i]);
+                slot.select.style.display = options.length ? "" : "none";
+                const course = catalog[plan.courses[year][i]];
+                slot.note.textContent = course && course.notes ? `ℹ️ ${course.notes}` : "";
+            });
+        }
+        renderTracker();
+        setHeight();
+    }
+
+    function markDirty() {
+        document.getElementById("status").textContent = "Unsaved changes";
+        refresh();
+    }
+
+    function slotElement(label, row, index, withCode) {
+        const wrapper = element("div", "slot");
+        wrapper.appendChild(element("label", null, label));
+        const slot = { select: element("select"), note: element("div", "note") };
+        if (withCode) {
+            slot.input = element("input");
+            slot.input.maxLength = 3;
+            slot.input.placeholder = "3-letter code";
+            slot.input.addEventListener("input", () => {
+                plan.dept_codes[row][index] = slot.input.value.trim().toUpperCase();
+                markDirty();
+            });
+            wrapper.appendChild(slot.input);
+        }
+        slot.select.addEventListener("change", () => {
+            if (row === "ms") plan.ms_credits[index] = slot.select.value;
+            else plan.courses[row][index] = slot.select.value;
+            markDirty();
+        });
+        wrapper.appendChild(slot.select);
+        wrapper.appendChild(slot.note);
+        (slots[row] = slots[row] || [])[index] = slot;
+        return wrapper;
+    }
+
+    function buildLayout() {
+        const ms = document.getElementById("ms");
+        ms.replaceChildren();
+        plan.ms_credits.forEach((_, i) => ms.appendChild(slotElement(`Middle School Course ${i + 1}`, "ms", i, false)));
+
+        const container = document.getElementById("years");
+        container.replaceChildren();
+        for (const year of bundle.years) {
+            container.appendChild(element("div", "year", year));
+            const grid = element("div", "grid");
+            plan.courses[year].forEach((_, i) => {
+                const label = i < bundle.core_departments.length ? `${year} – ${bundle.core_departments[i]}` : `${year} – Course ${i + 1}`;
+                grid.appendChild(slotElement(label, year, i, i >= bundle.core_departments.length));
+            });
+            container.appendChild(grid);
+        }
+
+        const pathway = document.getElementById("pathway");
+        pathway.replaceChildren(...bundle.pathways.map(name => new Option(name, name)));
+        pathway.onchange = () => {
+            plan.pathway = pathway.value;
+            markDirty();
+        };
+    }
+
+    function loadPlan(args) {
+        const source = args.plan || {};
+        plan = {
+            ms_credits: (source.ms_credits || []).concat(["", "", "", ""]).slice(0, 4),
+            courses: {},
+            dept_codes: {},
+            pathway: args.pathway || bundle.pathways[0],
+        };
+        for (const year of bundle.years) {
+            const codes = ((source.courses || {})[year] || []).concat(Array(8).fill("")).slice(0, 8);
+            plan.courses[year] = codes;
+            plan.dept_codes[year] = codes.map((code, i) => {
+                const course = catalog[code];
+                return i >= bundle.core_departments.length && course ? args.dept_name_to_code[course.department] || "" : "";
+            });
+        }
+        buildLayout();
+        document.getElementById("pathway").value = plan.pathway;
+        for (const year of bundle.years) {
+            slots[year].forEach((slot, i) => {
+                if (slot.input) slot.input.value = plan.dept_codes[year][i];
+            });
+        }
+        document.getElementById("status").textContent = "";
+        refresh();
+    }
+
+    document.getElementById("save").addEventListener("click", () => {
+        send("streamlit:setComponentValue", {
+            dataType: "json",
+            value: {
+                plan: { ms_credits: plan.ms_credits, courses: plan.courses },
+                pathway: plan.pathway,
+                bundle_version: bundle.version,
+                saved_at: Date.now(),
+            },
+        });
+        document.getElementById("status").textContent = "Saved";
+    });
+
+    window.addEventListener("message", event => {
+        const data = event.data;
+        if (!data || data.type !== "streamlit:render") return;
+        const args = data.args;
+        if (args.bundle !== bundleName) {
+            // The name changes whenever the contents do, so the browser may cache it forever
+            fetch(`bundles/${args.bundle}`, { cache: "force-cache" })
+                .then(response => response.json())
+                .then(loaded => {
+                    bundle = loaded;
+                    bundleName = args.bundle;
+                    catalog = {};
+                    codeToClusters = {};
+                    bundle.courses.forEach(course => { catalog[course.code] = course; });
+                    for (const [cluster, codes] of Object.entries(bundle.clusters)) {
+                        codes.forEach(code => (codeToClusters[code] = codeToClusters[code] || []).push(cluster));
+                    }
+                    planVersion = args.plan_version;
+                    loadPlan(args);
+                });
+        } else if (args.plan_version !== planVersion) {
+            // The server replaced the plan (e.g. Load Plan); unsaved browser edits give way to it
+            planVersion = args.plan_version;
+            loadPlan(args);
+        }
+    });
+
+    send("streamlit:componentReady", { apiVersion: 1 });
+})();
@@ -0,0 +1,95 @@
+# CTE career clusters and the course codes that make up each one
+cte_cluster_map = {
+    "Ag, Food & Natural Resources": {"9601", "9605", "18102", "18203", "18501"},
+    "Architecture & Construction": {"17003", "17004", "17007", "17008"},
+    "Business and Finance": {"9115", "9110", "9120"},
+    "Education & Training": {"19051", "19052", "19151"},
+    "Health Science": {"3066", "3067", "14001", "14002", "14154"},
+    "Hospitality & Tourism": {"16052", "16058", "16059", "19253"},
+    "Human Services": {"19001", "19051", "19052"},
+    "Information Technology": {"5105", "5606", "5700"},
+    "Manufacturing": {"13203", "13204", "13207", "13208"},
+    "STEM": {"21017", "21018", "21023"},
+    "Transportation & Distribution": {"20104", "20110"}
+}
+
+# A cluster is complete at 1.5 credits, or when every course in it has been taken
+default_cluster_credits = 1.5
+cluster_credit_targets = {}  # e.g., {"STEM": 2.0} to override the default for one cluster
+
+
+def build_cluster_index(cluster_map, course_credits, credit_targets=None):
+    """Inverts the cluster map into course code -> clusters, with each cluster's credit target.
+
+    A cluster none of whose courses carry credit in this catalog (all missing, or all zero
+    credits) could never be started, and a target of 0 would count it complete with nothing
+    taken. It is left out of the index and listed under "unavailable" instead.
+    """
+    credit_targets = cluster_credit_targets if credit_targets is None else credit_targets
+    clusters = {}
+    code_to_clusters = {}
+    targets = {}
+    unavailable = []
+    for cluster, codes in cluster_map.items():
+        cluster_total = sum(course_credits.get(str(code), 0) for code in codes)
+        if cluster_total <= 0:
+            unavailable.append(cluster)
+            continue
+        clusters[cluster] = {str(code) for code in codes}
+        for code in clusters[cluster]:
+            code_to_clusters.setdefault(code, []).append(cluster)
+        # Taking every course in a small cluster completes it, so never ask for more than it offers
+        targets[cluster] = min(credit_targets.get(cluster, default_cluster_credits), cluster_total)
+    return {
+        "clusters": clusters,
+        "code_to_clusters": code_to_clusters,
+        "targets": targets,
+        "unavailable": unavailable,
+    }
+
+
+def cluster_progress(cluster_index, selected_courses):
+    """Single pass over (code, credits) pairs; returns credits and codes taken for every cluster."""
+    progress = {cluster: {"credits": 0.0, "taken": set()} for cluster in cluster_index["clusters"]}
+    code_to_clusters = cluster_index["code_to_clusters"]
+    for code, credits in selected_courses:
+        for cluster in code_to_clusters.get(str(code), ()):
+            progress[cluster]["credits"] += credits
+            progress[cluster]["taken"].add(str(code))
+
+    for cluster, entry in progress.items():
+        target = cluster_index["targets"][cluster]
+        entry["target"] = target
+        entry["remaining"] = max(target - entry["credits"], 0.0)
+        entry["complete"] = entry["credits"] >= target or entry["taken"] == cluster_index["clusters"][cluster]
+    return progress
+
+
+def completed_clusters(progress):
+    return {cluster: entry["credits"] for cluster, entry in progress.items() if entry["complete"]}
+
+
+def nearest_clusters(progress, limit=3):
+    """Started but incomplete clusters, closest to completion first."""
+    started = [
+        cluster for cluster, entry in progress.items()
+        if entry["taken"] and not entry["complete"]
+    ]
+    return sorted(started, key=lambda cluster: (progress[cluster]["remaining"], cluster))[:limit]
+
+
+def courses_to_finish(cluster_index, progress, cluster, course_credits, is_eligible):
+    """Fewest eligible courses (largest credits first) that close the cluster's credit gap."""
+    entry = progress[cluster]
+    candidates = sorted(
+        (code for code in cluster_index["clusters"][cluster] if code not in entry["taken"] and is_eligible(code)),
+        key=lambda code: (-course_credits.get(code, 0), code)
+    )
+    picks = []
+    remaining = entry["remaining"]
+    for code in candidates:
+        if remaining <= 0:
+            break
+        picks.append(code)
+        remaining -= course_credits.get(code, 0)
+    return picks if remaining <= 0 else []
@@ -0,0 +1,305 @@
+"""Append-only binary log of plan edits, and a tool to replay it.
+
+    python event_log.py replay [--log plan_events.log] [--student ID | --session HEX] [--at TIME]
+    python event_log.py stats [--log plan_events.log]
+
+Each session's first rerun writes a snapshot of its plan. After that, every slot change,
+pathway switch and new duplicate-course warning is one small record. A fresh snapshot is
+written when a whole plan is replaced (load, scenario switch, in-browser save), when the
+student ID changes, and every WHS_EVENT_SNAPSHOT_EVERY events. Replay rebuilds a plan from
+its latest snapshot at or before the requested time, plus the events that follow it.
+
+Records are buffered in memory and written by a background thread every
+WHS_EVENT_FLUSH_SECONDS, with one fsync per batch, so the planner never waits on the
+disk. A crash loses at most that interval. Each record is framed as
+
+    sync (2 bytes) | payload length (u16) | crc32 (u32) | payload
+
+so a torn write at the end of the file is detected and skipped, and later records are
+still found. Set WHS_EVENT_LOG to "" to turn logging off.
+"""
+import argparse
+import atexit
+import datetime
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+
+from planner_core import years, ms_slots, slots_per_year
+
+log_path = os.environ.get("WHS_EVENT_LOG", "plan_events.log")
+flush_seconds = float(os.environ.get("WHS_EVENT_FLUSH_SECONDS", "1.0"))
+snapshot_every = int(os.environ.get("WHS_EVENT_SNAPSHOT_EVERY", "64"))
+bulk_change = 8  # more slots than this changing in one rerun is a plan replacement: snapshot instead
+
+plan_slots = ms_slots + len(years) * slots_per_year
+
+SNAPSHOT, SLOT, PATHWAY, DUPLICATE = 1, 2, 3, 4
+kind_names = {SNAPSHOT: "snapshot", SLOT: "slot", PATHWAY: "pathway", DUPLICATE: "duplicate"}
+
+sync = b"\xa5\x5a"
+frame = struct.Struct("<2sHI")     # sync, payload length, crc32 of payload
+event_head = struct.Struct("<dQB")  # unix time, session, kind
+
+
+def _pack_str(value):
+    data = str(value).encode("utf-8")[:255]
+    return bytes([len(data)]) + data
+
+
+def _unpack_str(payload, offset):
+    length = payload[offset]
+    return payload[offset + 1:offset + 1 + length].decode("utf-8"), offset + 1 + length
+
+
+class EventLog:
+    """Buffers encoded records and appends them to the log file in fsynced batches."""
+
+    def __init__(self, path=log_path, flush_interval=flush_seconds):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+        atexit.register(self.flush)
+
+    def append(self, session, kind, body=b""):
+        payload = event_head.pack(time.time(), session, kind) + body
+        record = frame.pack(sync, len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            self._buffer += record
+
+    def snapshot(self, session, school, student_id, pathway, codes):
+        self.append(session, SNAPSHOT, b"".join(
+            [_pack_str(school), _pack_str(student_id), _pack_str(pathway)] + [_pack_str(code) for code in codes]
+        ))
+
+    def slot(self, session, slot, code):
+        self.append(session, SLOT, bytes([slot]) + _pack_str(code))
+
+    def pathway(self, session, pathway):
+        self.append(session, PATHWAY, _pack_str(pathway))
+
+    def duplicate(self, session, codes):
+        self.append(session, DUPLICATE, bytes([min(len(codes), 255)]) + b"".join(_pack_str(c) for c in codes[:255]))
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                data, self._buffer = bytes(self._buffer), bytearray()
+            if not data:
+                return
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)  # one append per batch
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass  # disk trouble must not take the planner down; the next batch retries the file
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def event_log():
+    """The process-wide log, or None when WHS_EVENT_LOG is empty."""
+    global _log
+    if _log is None and log_path:
+        with _log_lock:
+            if _log is None:
+                _log = EventLog()
+    return _log
+
+
+class PlanRecorder:
+    """Kept in one session's state: turns the plan seen at the end of each rerun into events."""
+
+    def __init__(self):
+        self.session = random.getrandbits(64)
+        self.codes = None
+        self.school = None
+        self.pathway = None
+        self.student_id = None
+        self.since_snapshot = 0
+        self.duplicates = ()
+
+    def observe(self, school, student_id, pathway, codes):
+        log = event_log()
+        if log is None:
+            return
+        changed = [] if self.codes is None else [i for i, code in enumerate(codes) if code != self.codes[i]]
+        if (self.codes is None or (school, student_id) != (self.school, self.student_id)
+                or len(changed) > bulk_change or self.since_snapshot >= snapshot_every):
+            log.snapshot(self.session, school, student_id, pathway, codes)
+            self.since_snapshot = 0
+        else:
+            for slot in changed:
+                log.slot(self.session, slot, codes[slot])
+            if pathway != self.pathway:
+                log.pathway(self.session, pathway)
+                self.since_snapshot += 1
+            self.since_snapshot += len(changed)
+        self.codes, self.school, self.pathway, self.student_id = list(codes), school, pathway, student_id
+
+    def duplicate_warning(self, codes):
+        """Logs a duplicate-course warning when the set of duplicates shown changes."""
+        codes = tuple(codes)
+        log = event_log()
+        if log is not None and codes and codes != self.duplicates:
+            log.duplicate(self.session, list(codes))
+        self.duplicates = codes
+
+
+# --- Reading ---
+
+def read_events(path):
+    """Yields (time, session, kind, body) from a log, skipping damaged or torn records."""
+    if not os.path.getsize(path):
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        position = 0
+        while True:
+            position = data.find(sync, position)
+            if position < 0 or position + frame.size > len(data):
+                return
+            _, length, crc = frame.unpack_from(data, position)
+            payload = data[position + frame.size:position + frame.size + length]
+            if len(payload) != length or zlib.crc32(payload) != crc or length < event_head.size:
+                position += 1  # not a record boundary (or a torn one): look for the next sync marker
+                continue
+            position += frame.size + length
+            when, session, kind = event_head.unpack_from(payload)
+            yield when, session, kind, _decode(kind, payload, event_head.size)
+
+
+def _decode(kind, payload, offset):
+    if kind == SNAPSHOT:
+        values = []
+        while offset < len(payload):
+            value, offset = _unpack_str(payload, offset)
+            values.append(value)
+        return {"school": values[0], "student_id": values[1], "pathway": values[2], "codes": values[3:]}
+    if kind == SLOT:
+        code, _ = _unpack_str(payload, offset + 1)
+        return {"slot": payload[offset], "code": code}
+    if kind == PATHWAY:
+        return {"pathway": _unpack_str(payload, offset)[0]}
+    if kind == DUPLICATE:
+        codes, count, offset = [], payload[offset], offset + 1
+        for _ in range(count):
+            code, offset = _unpack_str(payload, offset)
+            codes.append(code)
+        return {"codes": codes}
+    return {}
+
+
+def slot_label(slot):
+    if slot < ms_slots:
+        return f"Middle School {slot + 1}"
+    year, index = divmod(slot - ms_slots, slots_per_year)
+    return f"{years[year]} {index + 1}"
+
+
+def replay(path, at=None, session=None, student_id=None):
+    """Plan state per session as of `at` (unix time; None for the end of the log)."""
+    states = {}
+    for when, event_session, kind, body in read_events(path):
+        if at is not None and when > at:
+            continue  # batches from several processes may interleave slightly out of order
+        if session is not None and event_session != session:
+            continue
+        if kind == SNAPSHOT:
+            states[event_session] = dict(body, codes=list(body["codes"]), time=when)
+            continue
+        state = states.get(event_session)
+        if state is None:
+            continue  # its snapshot was lost; the next one picks the session up again
+        if kind == SLOT and body["slot"] < len(state["codes"]):
+            state["codes"][body["slot"]] = body["code"]
+        elif kind == PATHWAY:
+            state["pathway"] = body["pathway"]
+        state["time"] = when
+    return {
+        event_session: state for event_session, state in states.items()
+        if student_id is None or state["student_id"] == str(student_id)
+    }
+
+
+def as_plan(state):
+    """A replayed state in the planner_core plan layout."""
+    codes = state["codes"] + [""] * (plan_slots - len(state["codes"]))
+    return {
+        "ms_credits": codes[:ms_slots],
+        "courses": {
+            year: codes[ms_slots + n * slots_per_year:ms_slots + (n + 1) * slots_per_year]
+            for n, year in enumerate(years)
+        },
+        "pathway": state["pathway"],
+        "student_id": state["student_id"],
+        "school": state["school"],
+    }
+
+
+def stats(path):
+    kinds, slots, pathways, duplicates = Counter(), Counter(), Counter(), Counter()
+    sessions = set()
+    for _, session, kind, body in read_events(path):
+        sessions.add(session)
+        kinds[kind_names.get(kind, kind)] += 1
+        if kind == SLOT:
+            slots[slot_label(body["slot"])] += 1
+        elif kind == PATHWAY:
+            pathways[body["pathway"]] += 1
+        elif kind == DUPLICATE:
+            duplicates.update(body["codes"])
+    return {"sessions": len(sessions), "events": dict(kinds), "slot_changes": dict(slots.most_common()),
+            "pathway_switches": dict(pathways), "duplicate_warnings": dict(duplicates.most_common())}
+
+
+def _parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="rebuild plans as they were at a point in time")
+    replay_parser.add_argument("--log", default=log_path or "plan_events.log")
+    replay_parser.add_argument("--student", help="only sessions working on this student ID")
+    replay_parser.add_argument("--session", help="only this session (hex, as printed by replay)")
+    replay_parser.add_argument("--at", help="unix time or ISO date/time (default: end of the log)")
+    stats_parser = commands.add_parser("stats", help="count edits by slot, pathway switches and duplicate warnings")
+    stats_parser.add_argument("--log", default=log_path or "plan_events.log")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        json.dump(stats(args.log), sys.stdout, indent=2)
+        print()
+        return
+    states = replay(args.log, _parse_time(args.at) if args.at else None,
+                    int(args.session, 16) if args.session else None, args.student)
+    for session, state in sorted(states.items(), key=lambda item: item[1]["time"]):
+        print(json.dumps({"session": f"{session:016x}", "as_of": state["time"], "plan": as_plan(state)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Export every saved plan for district analytics: a Parquet dataset and a counselor workbook.
+
+    python export.py [--parquet plans_export] [--xlsx plans_export.xlsx] [--school whs]
+
+The Parquet dataset has one row per student, grade and course, with the student's pathway
+status (total credits, all requirements met, and one met_<requirement> column per
+requirement) repeated on each row. It is partitioned by school (school=<id>/part-0.parquet,
+replaced on every run), and one row group is written per batch of students. Each file is
+written under a hidden temporary name and moved into place only once the export has
+finished, so an export that fails leaves the previous files as they were. A student with an empty plan gets one
+row with no course, so every student appears.
+
+The workbook has one row per student: pathway status, unmet requirements and the courses
+of each grade. It is written with openpyxl's write-only mode, which streams rows to disk.
+
+Plans are read from the store in batches and nothing else is kept, so memory use stays
+flat however many students there are.
+"""
+import argparse
+import datetime
+import os
+import time
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+import plan_store
+from planner_core import years, grade_number, load_snapshot, evaluate_pathway
+from schools import load_registry
+
+batch_size = 2000  # students per Parquet row group
+ms_grade = 8
+
+plan_fields = [
+    # The school is not a column: it comes from the partition directory, as dataset readers expect
+    ("student_id", pa.string()),
+    ("student_name", pa.string()),
+    ("student_grade", pa.int8()),
+    ("pathway", pa.string()),
+    ("plan_version", pa.int32()),
+    ("updated_at", pa.timestamp("s", tz="UTC")),
+    ("grade", pa.int8()),
+    ("slot", pa.int8()),
+    ("course_code", pa.string()),
+    ("course_name", pa.string()),
+    ("department", pa.string()),
+    ("credits", pa.float64()),
+    ("total_credits", pa.float64()),
+    ("all_met", pa.bool_()),
+]
+workbook_columns = [
+    ("Student ID", 12), ("Student Name", 24), ("School", 8), ("Grade", 7), ("Pathway", 28), ("Total Credits", 13),
+    ("All Requirements Met", 12), ("Unmet Requirements", 48), ("Middle School", 32),
+] + [(year, 48) for year in years]
+
+
+def requirement_keys(snapshots):
+    """Every requirement key in any school's pathways, in first-seen order."""
+    keys = {}
+    for snapshot in snapshots.values():
+        for rules in snapshot["rules"].values():
+            for requirement in rules:
+                keys.setdefault(requirement["key"], None)
+    return list(keys)
+
+
+def plan_status(snapshot, plan):
+    """evaluate_pathway for a saved plan, or None when its pathway is not one of the school's."""
+    if snapshot is None or plan["pathway"] not in snapshot["rules"]:
+        return None
+    return evaluate_pathway(snapshot, plan)
+
+
+def plan_courses(plan):
+    """(grade, slot, code) for every filled slot, middle school first."""
+    for slot, code in enumerate(plan["ms_credits"]):
+        if code:
+            yield ms_grade, slot, code
+    for year in years:
+        for slot, code in enumerate(plan["courses"][year]):
+            if code:
+                yield grade_number(year), slot, code
+
+
+class ParquetExport:
+    """Column buffers for one batch of students, written as one row group per school."""
+
+    def __init__(self, directory, keys):
+        self.directory = directory
+        self.keys = keys
+        self.schema = pa.schema(plan_fields + [(f"met_{key}", pa.bool_()) for key in keys])
+        self.paths = {}
+        self._tmp_paths = {}
+        self._writers = {}
+        self._batches = {}  # school -> column buffers
+        self.rows = 0
+
+    def add(self, plan, snapshot, status):
+        catalog = snapshot["catalog"] if snapshot else {}
+        met = {requirement["key"]: requirement["met"] for requirement in status["requirements"]} if status else {}
+        student = (
+            plan["student_id"], plan["student_name"], plan["grade"], plan["pathway"], plan["version"],
+            datetime.datetime.fromtimestamp(plan["updated_at"], datetime.timezone.utc),
+        )
+        summary = (
+            status["total_credits"] if status else None, status["all_met"] if status else None,
+        ) + tuple(met.get(key) for key in self.keys)
+        courses = [
+            (grade, slot, code, course.get("name"), course.get("department"), course.get("credits"))
+            for grade, slot, code in plan_courses(plan)
+            for course in [catalog.get(code) or {}]
+        ] or [(None,) * 6]
+        columns = self._batches.setdefault(plan["school"], [[] for _ in self.schema.names])
+        # Student and status values repeat on every course row; course values vary per row
+        for column, value in zip(columns, student):
+            column.extend([value] * len(courses))
+        for column, values in zip(columns[len(student):], zip(*courses)):
+            column.extend(values)
+        for column, value in zip(columns[len(student) + 6:], summary):
+            column.extend([value] * len(courses))
+        self.rows += len(courses)
+
+    def flush(self):
+        for school, columns in self._batches.items():
+            table = pa.Table.from_arrays(columns, schema=self.schema)
+            self._writer(school).write_table(table)
+        self._batches = {}
+
+    def _writer(self, school):
+        if school not in self._writers:
+            path = os.path.join(self.directory, f"school={school}", "part-0.parquet")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Dataset readers skip names starting with "."
+            tmp_path = os.path.join(os.path.dirname(path), f".part-0.parquet.{os.getpid()}.tmp")
+            self._writers[school] = pq.ParquetWriter(tmp_path, self.schema, compression="zstd")
+            self._tmp_paths[school] = tmp_path
+            self.paths[school] = path
+        return self._writers[school]
+
+    def close(self):
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        for school, tmp_path in self._tmp_paths.items():
+            os.replace(tmp_path, self.paths[school])
+
+    def abort(self):
+        for writer in self._writers.values():
+            writer.close()
+        for tmp_path in self._tmp_paths.values():
+            os.remove(tmp_path)
+
+
+class WorkbookExport:
+    """One row per student in a write-only workbook; openpyxl streams rows to a temporary file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Plans")
+        self.sheet.freeze_panes = "A2"
+        header = []
+        for n, (title, width) in enumerate(workbook_columns):
+            self.sheet.column_dimensions[get_column_letter(n + 1)].width = width
+            cell = WriteOnlyCell(self.sheet, value=title)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        self.sheet.append(header)
+        self.rows = 0
+
+    def add(self, plan, snapshot, status):
+        catalog = snapshot["catalog"] if snapshot else {}
+
+        def names(codes):
+            return "; ".join(catalog[code]["name"].strip() if code in catalog else code for code in codes if code)
+
+        unmet = [requirement["label"] for requirement in status["requirements"] if not requirement["met"]] if status else []
+        self.sheet.append([
+            plan["student_id"], plan["student_name"], plan["school"], plan["grade"], plan["pathway"],
+            status["total_credits"] if status else None,
+            ("Yes" if status["all_met"] else "No") if status else "Unknown pathway",
+            "; ".join(unmet), names(plan["ms_credits"]),
+        ] + [names(plan["courses"][year]) for year in years])
+        self.rows += 1
+
+    def close(self):
+        directory, name = os.path.split(os.path.abspath(self.path))
+        tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+        try:
+            self.workbook.save(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, self.path)
+
+    def abort(self):
+        # Rows so far only went to openpyxl's own temporary file; finish it so nothing is left open
+        self.sheet.close()
+
+
+def export_plans(conn, schools, parquet_dir=None, xlsx_path=None, school=None):
+    """Streams the store into the requested outputs; returns (students, exports)."""
+    snapshots = {school_id: load_snapshot(school=config) for school_id, config in schools.items()}
+    parquet = ParquetExport(parquet_dir, requirement_keys(snapshots)) if parquet_dir else None
+    exports = [export for export in (parquet, WorkbookExport(xlsx_path) if xlsx_path else None) if export]
+    students = 0
+    try:
+        for plan in plan_store.iter_plans(conn, batch_size=batch_size, school=school):
+            snapshot = snapshots.get(plan["school"])
+            status = plan_status(snapshot, plan)
+            for export in exports:
+                export.add(plan, snapshot, status)
+            students += 1
+            if parquet and students % batch_size == 0:
+                parquet.flush()
+    except BaseException:
+        for export in exports:
+            export.abort()
+        raise
+    for export in exports:
+        export.close()
+    return students, exports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="plan store (default: plans.db or $WHS_PLAN_DB)")
+    parser.add_argument("--school", default=None, help="only this school id (default: every school)")
+    parser.add_argument("--parquet", help="directory for the Parquet dataset")
+    parser.add_argument("--xlsx", help="path of the counselor workbook")
+    args = parser.parse_args()
+    if not args.parquet and not args.xlsx:
+        parser.error("give --parquet, --xlsx or both")
+
+    started = time.perf_counter()
+    registry = load_registry()
+    schools = {args.school: registry["schools"][args.school]} if args.school else registry["schools"]
+    conn = plan_store.connect(args.db)
+    students, exports = export_plans(conn, schools, args.parquet, args.xlsx, args.school)
+
+    print(f"students: {students}")
+    for export in exports:
+        if isinstance(export, ParquetExport):
+            print(f"parquet rows: {export.rows}")
+            for path in export.paths.values():
+                print(f"  {path}")
+        else:
+            print(f"workbook rows: {export.rows}  {export.path}")
+    print(f"seconds: {round(time.perf_counter() - started, 2)}")
+
+
+if __name__ == "__main__":
+    main()
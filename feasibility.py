@@ -0,0 +1,281 @@
+"""Graduation-feasibility forecast for a school's saved plans.
+
+    python feasibility.py [--school whs] [--grades 10 11] [--report infeasible.csv]
+
+For every saved plan in the given grades, this checks whether the empty slots from the
+student's current grade onward could still complete the plan's pathway. Slots that already
+hold a course stay as they are. Nothing is searched. Each unmet requirement gets an upper
+bound: credits, group coverage, or years of one language, from slots that are open and
+from courses whose prerequisite chain can be finished before those slots. When a bound
+falls short, no way of filling the open slots can meet that requirement. The student is
+flagged, and that requirement is reported as blocking.
+"""
+import argparse
+import csv
+import math
+import time
+from collections import Counter
+
+import plan_store
+from planner_core import (
+    years, core_departments, slots_per_year, grade_number, prereq_met, plan_codes, load_snapshot,
+    evaluate_pathway, matches_requirement
+)
+from schools import load_registry
+
+default_grades = (10, 11)
+elective = "elective"
+
+
+def build_index(snapshot):
+    """Per (year, slot kind), the courses the planner could ever offer there, ignoring prerequisites."""
+    catalog = snapshot["catalog"]
+    elective_departments = set(snapshot["dept_name_to_code"])
+    admissible = {}
+    for year in years:
+        offered = snapshot["courses_by_grade"][year]
+        for slot, department in enumerate(core_departments):
+            codes = [code for code in offered if catalog[code]["department"] == department]
+            if slot == 0:
+                codes = [code for code in codes if code in snapshot["english_course_codes_by_grade"].get(year, [])]
+            admissible[year, slot] = frozenset(codes)
+        admissible[year, elective] = frozenset(
+            code for code in offered if catalog[code]["department"] in elective_departments
+        )
+    return {"snapshot": snapshot, "admissible": admissible, "candidates": {}}
+
+
+def _candidates(index, requirement):
+    """Codes a requirement counts, largest credits first (built once per requirement)."""
+    key = id(requirement)
+    if key not in index["candidates"]:
+        catalog = index["snapshot"]["catalog"]
+        if requirement.get("cte_cluster"):
+            matching = [code for code in catalog if code in index["snapshot"]["cluster_index"]["code_to_clusters"]]
+        else:
+            matching = [code for code, course in catalog.items() if matches_requirement(requirement, course)]
+        index["candidates"][key] = sorted(matching, key=lambda code: -catalog[code]["credits"])
+    return index["candidates"][key]
+
+
+class _Openings:
+    """The empty slots left in one plan, and the earliest of them each course could fill."""
+
+    def __init__(self, index, plan, first_open_grade):
+        snapshot = index["snapshot"]
+        catalog = snapshot["catalog"]
+        self.index = index
+        self.credits = {code: course["credits"] for code, course in catalog.items()}
+        self.planned = plan_codes(plan)
+        self.counts = Counter(self.planned)
+        self.unlimited = snapshot["unlimited_repeatable_codes"]
+        self.limited = snapshot["limited_repeatable_counts"]
+        self.positions = []  # (position, admissible codes)
+        self.earliest = {}   # code -> first open position it can fill with its prerequisites done
+
+        # Walk the slots in planner order. A course can fill an open slot once its prerequisites
+        # are planned or can be placed in some earlier open slot. This is a relaxation (one
+        # slot may serve several chains), so the result never understates what is reachable.
+        taken = {code for code in plan["ms_credits"] if code}
+        for n, year in enumerate(years):
+            is_open = grade_number(year) >= first_open_grade
+            for slot, code in enumerate(plan["courses"][year]):
+                if code or not is_open:
+                    if code:
+                        taken.add(code)
+                    continue
+                position = n * slots_per_year + slot
+                allowed = index["admissible"][year, slot if slot < len(core_departments) else elective]
+                self.positions.append((position, allowed))
+                reached = [
+                    c for c in allowed
+                    if c not in self.earliest and (slot == 0 or prereq_met(catalog[c]["prereq_groups"], taken))
+                ]
+                for c in reached:
+                    self.earliest[c] = position
+                taken.update(reached)
+
+    def copies_left(self, code):
+        """How many more times a course could be added (inf for unlimited repeats)."""
+        if code in self.unlimited:
+            return math.inf
+        return max(self.limited.get(code, 1) - self.counts[code], 0)
+
+    def fits(self, code, position, allowed):
+        return code in allowed and self.earliest.get(code, math.inf) <= position and self.copies_left(code) > 0
+
+    def slots_for(self, codes):
+        """Open positions that at least one of `codes` could fill."""
+        return [position for position, allowed in self.positions if any(self.fits(c, position, allowed) for c in codes)]
+
+    def max_credits(self, candidates):
+        """Upper bound on credits the open slots could add from `candidates` (largest first)."""
+        by_slot = 0.0
+        for position, allowed in self.positions:
+            for code in candidates:
+                if self.fits(code, position, allowed):
+                    by_slot += self.credits[code]
+                    break
+        # Each course can only be added as often as it may repeat
+        by_course = sum(
+            self.credits[code] * self.copies_left(code) if self.credits[code] else 0.0
+            for code in candidates if code in self.earliest
+        )
+        return min(by_slot, by_course)
+
+    def why_not(self, codes):
+        """Why none of `codes` can fill an open slot: not offered there, or prerequisites too deep."""
+        if any(code in allowed for code in codes for _, allowed in self.positions):
+            return "prerequisites cannot be finished in the open slots"
+        return "not offered in any open slot"
+
+
+def _names(snapshot, codes, limit=3):
+    catalog = snapshot["catalog"]
+    names = [catalog[code]["name"].strip() if code in catalog else code for code in codes]
+    return " / ".join(names[:limit]) + (" / ..." if len(names) > limit else "")
+
+
+def requirement_blocker(index, openings, requirement, result):
+    """None if the open slots could still meet the requirement, otherwise why they cannot."""
+    if result["met"]:
+        return None
+    snapshot = index["snapshot"]
+    if "any_of" in requirement:
+        reasons = [
+            requirement_blocker(index, openings, option, option_result)
+            for option, option_result in zip(requirement["any_of"], result["options"])
+        ]
+        if all(reasons):
+            return "; ".join(f"{option['label']}: {reason}" for option, reason in zip(requirement["any_of"], reasons))
+        return None
+    candidates = _candidates(index, requirement)
+
+    if requirement.get("cte_cluster"):
+        progress = {cluster: 0.0 for cluster in snapshot["cluster_index"]["clusters"]}
+        for code in openings.planned:
+            for cluster in snapshot["cluster_index"]["code_to_clusters"].get(code, ()):
+                progress[cluster] += openings.credits.get(code, 0.0)
+        shortfalls = []
+        for cluster, codes in snapshot["cluster_index"]["clusters"].items():
+            target = snapshot["cluster_index"]["targets"][cluster]
+            reachable = progress[cluster] + openings.max_credits([c for c in candidates if c in codes])
+            if reachable >= target:
+                return None
+            shortfalls.append((target - reachable, cluster, reachable, target))
+        _, cluster, reachable, target = min(shortfalls)
+        return f"no cluster can be completed (closest: {cluster}, at most {reachable:.1f} of {target} credits)"
+
+    required = requirement.get("min_credits", 0)
+    reachable = result["earned"] + openings.max_credits(candidates)
+    if reachable < required:
+        return f"at most {reachable:.1f} of {required} credits"
+
+    if result.get("groups_met") is False:
+        planned = set(openings.planned)
+        counted = set(candidates)
+        missing = [
+            [code for code in group if code in counted] for group in requirement["groups"]
+            if not any(code in planned and code in counted for code in group)
+        ]
+        covering = set()
+        for group in missing:
+            slots = openings.slots_for(group)
+            if not slots:
+                return f"needs {_names(snapshot, group)}: {openings.why_not(group)}"
+            covering.update(slots)
+        if len(covering) < len(missing):
+            return f"{len(missing)} required courses left but only {len(covering)} open slots can hold them"
+
+    if result.get("same_language") is False:
+        counted = set(candidates)
+        planned = Counter(code[:2] for code in openings.planned if code in counted)
+        for prefix in sorted({code[:2] for code in candidates}):
+            need = 2 - planned[prefix]
+            codes = [code for code in candidates if code[:2] == prefix]
+            reachable_codes = sum(min(openings.copies_left(code), need) for code in codes if code in openings.earliest)
+            if len(openings.slots_for(codes)) >= need and reachable_codes >= need:
+                return None
+        return "no language can still reach two courses"
+    return None
+
+
+def forecast_plan(index, plan, first_open_grade=None):
+    """Blocking requirements for one saved plan; an empty list means it can still be completed."""
+    snapshot = index["snapshot"]
+    first_open_grade = first_open_grade or plan.get("grade") or 9
+    openings = _Openings(index, plan, first_open_grade)
+    result = evaluate_pathway(snapshot, plan)
+    rules = snapshot["rules"][result["pathway"]]
+    blockers = []
+    for requirement, requirement_result in zip(rules, result["requirements"]):
+        reason = requirement_blocker(index, openings, requirement, requirement_result)
+        if reason:
+            blockers.append({"key": requirement["key"], "label": requirement["label"], "reason": reason})
+    return blockers
+
+
+def forecast_school(conn, snapshot, grades=default_grades, skipped=None):
+    """Yields (plan, blockers) for every saved plan of the school in `grades`.
+
+    Plans that cannot be checked are counted in `skipped` when a Counter is given: "no_grade"
+    for plans saved without a current grade, and "unknown_pathway" for plans in `grades`
+    whose pathway the school has no rules for.
+    """
+    skipped = Counter() if skipped is None else skipped
+    index = build_index(snapshot)
+    for plan in plan_store.iter_plans(conn, school=snapshot["school_id"]):
+        if plan["grade"] is None:
+            skipped["no_grade"] += 1
+        elif plan["grade"] not in grades:
+            continue
+        elif plan["pathway"] not in snapshot["rules"]:
+            skipped["unknown_pathway"] += 1
+        else:
+            yield plan, forecast_plan(index, plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="plan store (default: plans.db or $WHS_PLAN_DB)")
+    parser.add_argument("--school", default=None, help="school id from schools.json (default: the registry default)")
+    parser.add_argument("--grades", type=int, nargs="+", default=list(default_grades),
+                        help="current grades to check (default: 10 11)")
+    parser.add_argument("--report", help="write one row per flagged student and blocking requirement to this CSV")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    registry = load_registry()
+    snapshot = load_snapshot(school=registry["schools"][args.school or registry["default"]])
+    conn = plan_store.connect(args.db)
+
+    checked = 0
+    flagged = []
+    blocking = Counter()
+    skipped = Counter()
+    for plan, blockers in forecast_school(conn, snapshot, set(args.grades), skipped):
+        checked += 1
+        if blockers:
+            flagged.append((plan, blockers))
+            blocking.update(blocker["label"] for blocker in blockers)
+
+    if args.report:
+        with open(args.report, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["student_id", "student_name", "grade", "pathway", "requirement", "reason"])
+            for plan, blockers in flagged:
+                for blocker in blockers:
+                    writer.writerow([plan["student_id"], plan["student_name"], plan["grade"], plan["pathway"],
+                                     blocker["label"], blocker["reason"]])
+
+    print(f"students: {checked}")
+    print(f"infeasible: {len(flagged)}")
+    print(f"skipped, no current grade saved: {skipped['no_grade']}")
+    print(f"skipped, pathway has no rules: {skipped['unknown_pathway']}")
+    print(f"seconds: {round(time.perf_counter() - started, 2)}")
+    for label, count in blocking.most_common():
+        print(f"  blocked by {label}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,12 @@
-
 import streamlit as st
 import pandas as pd
 
-def department_sidebar():
+def department_sidebar(dept_code_to_name):
     with st.sidebar:
         with st.expander("Department Codes"):
             dept_codes = {
-                "Business": "BUS",
-                "Computer Science": "CSC",
-                "CTE": "CTE",
-                "English": "ENG",
-                "Fine Arts and Vocal Music": "MUS",
-                "Mathematics": "MTH",
-                "Performing Arts": "DRM",
-                "Physical Education": "PED",
-                "Science": "SCI",
-                "Social Studies": "SOC",
-                "Visual Arts": "ART",
-                "World Languages": "WLG"
+                " and ".join(names) if isinstance(names, list) else names: code
+                for code, names in dept_code_to_name.items()
             }
-            df = pd.DataFrame(dept_codes.items(), columns=["Department", "Code"])
+            df = pd.DataFrame(sorted(dept_codes.items()), columns=["Department", "Code"])
             st.dataframe(df, use_container_width=True, hide_index=True)
@@ -0,0 +1,195 @@
+"""In-process metrics for the planner, served in Prometheus text format.
+
+    curl http://127.0.0.1:8503/metrics      # port from WHS_METRICS_PORT
+
+Label values must come from small fixed sets (pathway, grade, phase, cache name) so the
+number of series stays bounded no matter how many students use the planner.
+"""
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+metrics_port = int(os.environ.get("WHS_METRICS_PORT", "8503"))
+
+# Seconds; planner reruns run from a few milliseconds to about a second
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_registry = []
+_server = None
+_server_lock = threading.Lock()
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value not in (float("inf"), float("-inf")) else ("+Inf" if value > 0 else "-Inf")
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge:
+    """A value read at scrape time from `callback`, which returns {label values tuple: value}."""
+
+    def __init__(self, name, help, labelnames=(), callback=None, type="gauge"):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.callback = callback
+        self.type = type
+        _registry.append(self)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        for key, value in (self.callback() if self.callback else {}).items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=default_buckets):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}"
+
+
+# --- Planner metrics ---
+rerun_seconds = Histogram(
+    "planner_rerun_seconds", "Full script rerun time.", ["pathway"]
+)
+phase_seconds = Histogram(
+    "planner_phase_seconds", "Time in one phase of a rerun (planner_loop is per grade).", ["phase", "grade"]
+)
+reruns_total = Counter("planner_reruns_total", "Script reruns; use rate() for reruns per second.", ["pathway"])
+
+session_idle_seconds = float(os.environ.get("WHS_SESSION_IDLE_SECONDS", "900"))
+_last_seen = OrderedDict()  # session -> last rerun, least recently seen first
+_sessions_lock = threading.Lock()
+
+
+def _forget_idle_sessions(now):
+    # Pruned on every touch as well as on scrape, so the dict stays bounded with no scraper
+    cutoff = now - session_idle_seconds
+    while _last_seen and next(iter(_last_seen.values())) < cutoff:
+        _last_seen.popitem(last=False)
+
+
+def touch_session(session_key):
+    now = time.monotonic()
+    with _sessions_lock:
+        _last_seen[session_key] = now
+        _last_seen.move_to_end(session_key)
+        _forget_idle_sessions(now)
+
+
+def _active_sessions():
+    with _sessions_lock:
+        _forget_idle_sessions(time.monotonic())
+        return {(): len(_last_seen)}
+
+
+Gauge("planner_active_sessions", "Sessions that reran in the last WHS_SESSION_IDLE_SECONDS.", callback=_active_sessions)
+
+
+def render():
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        data = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host="127.0.0.1", port=metrics_port):
+    """Serves /metrics from a background thread; safe to call on every rerun."""
+    global _server
+    if _server is not None:
+        return _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError:
+                # Port taken (another planner process on this box): this one runs without an endpoint
+                _server = False
+                return _server
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
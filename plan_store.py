@@ -0,0 +1,197 @@
+import json
+import os
+import sqlite3
+import time
+
+from planner_core import normalize_plan
+
+# Saved plans live in one SQLite file. Each row holds a student's plan as JSON in the
+# same shape the API uses: {"ms_credits": [code x4], "courses": {year: [code x8]}}.
+default_db_path = os.environ.get("WHS_PLAN_DB", "plans.db")
+
+schema = """
+CREATE TABLE IF NOT EXISTS plans (
+    student_id   TEXT PRIMARY KEY,
+    school       TEXT NOT NULL DEFAULT 'whs',
+    student_name TEXT NOT NULL DEFAULT '',
+    grade        INTEGER,
+    pathway      TEXT NOT NULL DEFAULT 'University',
+    plan         TEXT NOT NULL,
+    version      INTEGER NOT NULL DEFAULT 1,
+    updated_at   REAL NOT NULL,
+    change_seq   INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# change_seq orders saves by commit: SQLite has one writer at a time, so a save always numbers
+# itself after every save already committed. Plans are never deleted, so MAX only grows.
+upsert_sql = """
+INSERT INTO plans (student_id, school, student_name, grade, pathway, plan, version, updated_at, change_seq)
+VALUES (?, ?, ?, ?, ?, ?, 1, ?, (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM plans))
+ON CONFLICT(student_id) DO UPDATE SET
+    school = excluded.school,
+    student_name = excluded.student_name,
+    grade = COALESCE(excluded.grade, plans.grade),
+    pathway = excluded.pathway,
+    plan = excluded.plan,
+    version = plans.version + 1,
+    updated_at = excluded.updated_at,
+    change_seq = excluded.change_seq
+"""
+
+# Named scenarios of a student's plan. The plans row is the base scenario; the others keep
+# only the slots where they differ from it, as {"slot": code} with slots numbered like the
+# planner's session plan (4 middle school slots, then 8 per year).
+scenario_schema = """
+CREATE TABLE IF NOT EXISTS plan_scenarios (
+    student_id TEXT NOT NULL,
+    position   INTEGER NOT NULL,
+    name       TEXT NOT NULL,
+    pathway    TEXT NOT NULL,
+    delta      TEXT NOT NULL,
+    PRIMARY KEY (student_id, position)
+)
+"""
+
+columns = "student_id, school, student_name, grade, pathway, plan, version, updated_at, change_seq"
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or default_db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(schema)
+    conn.execute(scenario_schema)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(plans)")}
+    if "school" not in existing:
+        conn.execute("ALTER TABLE plans ADD COLUMN school TEXT NOT NULL DEFAULT 'whs'")  # stores from before multi-school
+    if "change_seq" not in existing:
+        conn.execute("ALTER TABLE plans ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS plans_school ON plans (school)")
+    conn.execute("CREATE INDEX IF NOT EXISTS plans_updated ON plans (updated_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS plans_changes ON plans (change_seq)")
+    return conn
+
+
+def _row_to_record(row):
+    student_id, school, student_name, grade, pathway, plan_json, version, updated_at, change_seq = row
+    plan = normalize_plan(dict(json.loads(plan_json), pathway=pathway))
+    plan.update(student_id=student_id, school=school, student_name=student_name, grade=grade, version=version,
+                updated_at=updated_at, change_seq=change_seq)
+    return plan
+
+
+def _record_params(record, now):
+    plan = normalize_plan(record)
+    stored = json.dumps({"ms_credits": plan["ms_credits"], "courses": plan["courses"]}, separators=(",", ":"))
+    return (str(record["student_id"]), record.get("school") or "whs", record.get("student_name") or "",
+            record.get("grade"), plan["pathway"], stored, now)
+
+
+def write_plans(conn, records, now=None):
+    """Upserts plan records inside the caller's transaction."""
+    now = now or time.time()
+    conn.executemany(upsert_sql, (_record_params(record, now) for record in records))
+
+
+def save_plans(conn, records):
+    """Upserts many plan records in one transaction."""
+    conn.execute("BEGIN")
+    try:
+        write_plans(conn, records)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def save_plan(conn, record):
+    save_plans(conn, [record])
+
+
+def load_plans(conn, student_ids):
+    """Plan records for the given ids, keyed by student id; missing ids are left out."""
+    records = {}
+    student_ids = [str(s) for s in student_ids]
+    for start in range(0, len(student_ids), 500):  # stay under SQLite's bound-parameter limit
+        chunk = student_ids[start:start + 500]
+        rows = conn.execute(
+            f"SELECT {columns} FROM plans WHERE student_id IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+        for row in rows:
+            records[row[0]] = _row_to_record(row)
+    return records
+
+
+def load_plan(conn, student_id):
+    return load_plans(conn, [student_id]).get(str(student_id))
+
+
+def iter_plans(conn, batch_size=1000, school=None, changed_after=None):
+    """Streams every stored plan without reading the whole table at once.
+
+    `school` keeps one school's plans; `changed_after` keeps plans whose `change_seq` is
+    above it, i.e. saved after the save that got that number.
+    """
+    where, params = [], []
+    if school:
+        where.append("school = ?")
+        params.append(school)
+    if changed_after is not None:
+        where.append("change_seq > ?")
+        params.append(changed_after)
+    condition = f" WHERE {' AND '.join(where)}" if where else ""
+    cursor = conn.execute(f"SELECT {columns} FROM plans{condition} ORDER BY student_id", params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield _row_to_record(row)
+
+
+def write_scenarios(conn, student_id, rows):
+    """Replaces a student's scenarios inside the caller's transaction."""
+    student_id = str(student_id)
+    conn.execute("DELETE FROM plan_scenarios WHERE student_id = ?", (student_id,))
+    conn.executemany(
+        "INSERT INTO plan_scenarios (student_id, position, name, pathway, delta) VALUES (?, ?, ?, ?, ?)",
+        ((student_id, position, row["name"], row["pathway"], json.dumps(row["delta"], separators=(",", ":")))
+         for position, row in enumerate(rows))
+    )
+
+
+def plans_with_course(conn, code, school=None):
+    """Plans whose base plan or saved scenarios hold course `code`, in student id order.
+
+    The match is a text search of the stored JSON for the quoted code, so SQLite picks the
+    plans without any being decoded here.
+    """
+    quoted = json.dumps(str(code))
+    where, params = ["(instr(plan, ?) > 0 OR student_id IN "
+                     "(SELECT student_id FROM plan_scenarios WHERE instr(delta, ?) > 0))"], [quoted, quoted]
+    if school:
+        where.append("school = ?")
+        params.append(school)
+    rows = conn.execute(f"SELECT {columns} FROM plans WHERE {' AND '.join(where)} ORDER BY student_id", params)
+    return [_row_to_record(row) for row in rows]
+
+
+def save_scenarios(conn, student_id, rows):
+    """Replaces a student's scenarios with `rows` ([{name, pathway, delta}], base first)."""
+    conn.execute("BEGIN")
+    try:
+        write_scenarios(conn, student_id, rows)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def load_scenarios(conn, student_id):
+    """A student's saved scenarios, base first; empty if they only have the one plan."""
+    rows = conn.execute(
+        "SELECT name, pathway, delta FROM plan_scenarios WHERE student_id = ? ORDER BY position", (str(student_id),)
+    )
+    return [{"name": name, "pathway": pathway, "delta": json.loads(delta)} for name, pathway, delta in rows]
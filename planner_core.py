@@ -0,0 +1,371 @@
+import ast
+import csv
+import json
+from collections import Counter
+
+from cte_clusters import cte_cluster_map, build_cluster_index, cluster_progress, completed_clusters
+
+# Planning rules shared by the Streamlit app and the HTTP API.
+# Nothing in this module imports streamlit or pandas.
+
+years = ["9th Grade", "10th Grade", "11th Grade", "12th Grade"]
+core_departments = ["English", "Mathematics", "Science", "Social Studies"]
+slots_per_year = 8
+ms_slots = 4
+
+# Department codes typed into the elective slots
+dept_code_to_name = {
+    "BUS": "Business",
+    "CSC": "Computer Science",
+    "CTE": "CTE",
+    "ENG": "English",
+    "MUS": ["Fine Arts", "Vocal Music"],
+    "MTH": "Mathematics",
+    "DRM": "Performing Arts",
+    "PED": "Physical Education",
+    "SCI": "Science",
+    "SOC": "Social Studies",
+    "ART": "Visual Arts",
+    "WLG": "World Languages"
+}
+
+
+english_course_codes_by_grade = {
+    "9th Grade": ["2401", "2404"],
+    "10th Grade": ["2501", "2504"],
+    "11th Grade": ["2601", "2608"],
+    "12th Grade": ["2715", "2606"]
+}
+
+# Grade-level guidance messages for hover tooltips
+grade_requirements = {
+    "9th Grade": "English 9, Algebra I, Speech or Debate, World Geography, Biology, PE/Health [6 credits min]",
+    "10th Grade": "English 10, Geometry, World History, Physical Science or Chemistry [6 credits min]",
+    "11th Grade": "English 11, Algebra II, US History, Science, Personal Finance(BUS) or Economics(SOC) [6 credits min]",
+    "12th Grade": "English 12, US Government, Personal Finance(BUS) or Economics(SOC) [6 credits min]"
+}
+
+# --- DUPLICATE COURSE CODE CHECK GLOBALS ---
+unlimited_repeatable_codes = {"1201", "1210", "1221"}  # e.g., Band, Orchestra
+limited_repeatable_counts = {"2410": 2}  # e.g., Exp in Reading (max 2 times)
+
+# --- Requirement building blocks used by every pathway ---
+required_english_groups = [["2401", "2404"], ["2501", "2504"], ["2601", "2608"], ["2715", "2606"]]
+speech_debate_codes = ["2201", "2205"]
+ss_required = {
+    "Geography": ["8101"],
+    "World History": ["8201"],
+    "U.S. History": ["8304", "8310"],
+    "U.S. Government": ["8401", "8405"]
+}
+finance_codes = ["8701", "9120"]
+fine_arts_departments = ["Fine Arts", "Vocal Music", "Performing Arts", "Visual Arts"]
+required_math_groups = [["4301", "4304"], ["4401", "4402"], ["4506", "4504"]]
+pathways = ["University", "Career & Technical", "Honors/Scholarship Opportunity"]
+
+
+def invert_dept_codes(code_to_name):
+    """Department name -> the code a student types to reach it."""
+    return {
+        name: code
+        for code, names in code_to_name.items()
+        for name in ([names] if isinstance(names, str) else names)
+    }
+
+
+def grade_number(year):
+    return int(year.split()[0].replace("th", "").replace("st", "").replace("nd", "").replace("rd", ""))
+
+
+def parse_prereq(raw):
+    """Turns a catalog prerequisite cell into groups of codes: every group needs one code taken."""
+    raw = str(raw).strip()
+    if raw in ("", "None", "nan"):
+        return []
+    try:
+        parsed = ast.literal_eval(raw)
+    except (ValueError, SyntaxError):
+        return [[]]  # unreadable prerequisites can never be met
+    if isinstance(parsed, (int, str)):
+        return [[str(parsed)]]
+    if isinstance(parsed, list) and parsed and all(isinstance(x, list) for x in parsed):
+        return [[str(code) for code in group] for group in parsed]
+    if isinstance(parsed, list):
+        return [[str(code) for code in parsed]]
+    return [[]]
+
+
+def prereq_met(groups, taken):
+    return all(any(code in taken for code in group) for group in groups)
+
+
+def load_catalog(path="WHS_course_catalog.csv"):
+    """Reads the catalog CSV into plain dicts keyed by course code, in file order."""
+    catalog = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            code = row["Course Code"].strip()
+            try:
+                credits = float(row["Credits"])
+            except (TypeError, ValueError):
+                credits = 0.0
+            raw_prereq = (row.get("Prerequisites") or "None").strip() or "None"
+            catalog[code] = {
+                "code": code,
+                "name": row["Course Name"],
+                "department": row["Department"],
+                "grades": [int(g) for g in ast.literal_eval(row["Grade Levels"])],
+                "credits": credits,
+                "tags": row.get("Tags") or "",
+                "prerequisites": raw_prereq,
+                "prereq_groups": parse_prereq(raw_prereq),
+                "notes": row.get("Notes") or "",
+            }
+    return catalog
+
+
+def build_pathway_rules(catalog):
+    """Declarative requirement list per pathway; each entry is checked by evaluate_requirement()."""
+    valid_english_codes = [code for group in required_english_groups for code in group]
+    english = {"key": "english", "label": "English", "departments": ["English"], "codes": valid_english_codes,
+               "min_credits": 4, "groups": required_english_groups}
+    speech = {"key": "speech", "label": "Speech/Debate", "departments": ["English"], "codes": speech_debate_codes,
+              "min_credits": 0.5}
+    social_studies = {"key": "social_studies", "label": "Social Studies", "departments": ["Social Studies"],
+                      "min_credits": 3, "groups": list(ss_required.values())}
+    finance = {"key": "finance", "label": "Econ/Finance", "codes": finance_codes, "min_credits": 0.5}
+    native_american = {"key": "native_american_studies", "label": "Native American Studies", "codes": ["8410"],
+                       "min_credits": 0.5}
+    pe = {"key": "pe", "label": "PE", "departments": ["Physical Education"], "exclude_names": ["Health Education"],
+          "min_credits": 0.5}
+    health = {"key": "health", "label": "Health", "name_contains": "health", "min_credits": 0.5}
+    fine_arts = {"key": "fine_arts", "label": "Fine Arts", "departments": fine_arts_departments, "min_credits": 1}
+    world_language = {"key": "world_language", "label": "World Language", "departments": ["World Languages"],
+                      "min_credits": 2, "same_language": True}
+    cte_cluster = {"key": "cte_cluster", "label": "CTE Cluster", "cte_cluster": True}
+    total = {"key": "total_credits", "label": "Total Credits", "min_credits": 24}
+
+    def core(key, label, department, minimum):
+        return {"key": key, "label": label, "departments": [department], "min_credits": minimum}
+
+    advanced_math_codes = ["4502"] + sorted(
+        code for code, course in catalog.items()
+        if course["department"] == "Mathematics" and code.isdigit() and int(code) > 4600
+    )
+    honors_math = {"key": "math", "label": "Mathematics", "departments": ["Mathematics"], "min_credits": 4,
+                   "groups": required_math_groups + [advanced_math_codes]}
+    honors_science = {"key": "science", "label": "Science", "departments": ["Science"], "min_credits": 4,
+                      "groups": [["7201"], ["7301"], ["7101"]]}
+    language_or_cte = {"key": "language_or_cte", "label": "World Language or CTE Cluster",
+                       "any_of": [dict(world_language, same_language=False), cte_cluster]}
+
+    shared_tail = [social_studies, finance, native_american, pe, health, fine_arts]
+    return {
+        "University": [total, english, speech, core("math", "Mathematics", "Mathematics", 3),
+                       core("science", "Science", "Science", 3)] + shared_tail + [world_language],
+        "Career & Technical": [total, english, speech, core("math", "Mathematics", "Mathematics", 3),
+                               core("science", "Science", "Science", 3)] + shared_tail + [cte_cluster],
+        "Honors/Scholarship Opportunity": [total, english, speech, honors_math, honors_science] + shared_tail
+                                          + [language_or_cte],
+    }
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_snapshot(catalog_path=None, school=None, catalog=None):
+    """Everything a request needs, built once and only ever read afterwards.
+
+    `school` is a registry entry (see schools.py); anything it leaves out falls back to
+    the WHS defaults in this module. `catalog` is an already loaded catalog mapping (such
+    as a catalog image's) to use instead of reading the CSV.
+    """
+    school = school or {}
+    if catalog is None:
+        catalog = load_catalog(catalog_path or school.get("catalog") or "WHS_course_catalog.csv")
+    credits_by_code = {code: course["credits"] for code, course in catalog.items()}
+    rules = _read_json(school["pathway_rules"]) if school.get("pathway_rules") else build_pathway_rules(catalog)
+    clusters = _read_json(school["cte_clusters"]) if school.get("cte_clusters") else cte_cluster_map
+    return {
+        "school_id": school.get("id", "whs"),
+        "catalog": catalog,
+        "rules": rules,
+        "pathways": list(rules),
+        "cluster_index": build_cluster_index(clusters, credits_by_code),
+        "dept_code_to_name": school.get("dept_code_to_name", dept_code_to_name),
+        "dept_name_to_code": invert_dept_codes(school.get("dept_code_to_name", dept_code_to_name)),
+        "english_course_codes_by_grade": school.get("english_course_codes_by_grade", english_course_codes_by_grade),
+        "grade_requirements": school.get("grade_requirements", grade_requirements),
+        "unlimited_repeatable_codes": set(school.get("unlimited_repeatable_codes", unlimited_repeatable_codes)),
+        "limited_repeatable_counts": school.get("limited_repeatable_counts", limited_repeatable_counts),
+        "courses_by_grade": {
+            year: [code for code, course in catalog.items() if grade_number(year) in course["grades"]]
+            for year in years
+        },
+    }
+
+
+# --- Plans ---
+# A plan is {"ms_credits": [code x4], "courses": {year: [code x8]}, "pathway": name}; "" marks an empty slot.
+
+def normalize_plan(plan):
+    courses = plan.get("courses") or {}
+    normalized = {
+        "ms_credits": [str(code or "") for code in (plan.get("ms_credits") or [])][:ms_slots],
+        "courses": {},
+        "pathway": plan.get("pathway") or "University",
+    }
+    normalized["ms_credits"] += [""] * (ms_slots - len(normalized["ms_credits"]))
+    for year in years:
+        row = [str(code or "") for code in (courses.get(year) or [])][:slots_per_year]
+        normalized["courses"][year] = row + [""] * (slots_per_year - len(row))
+    return normalized
+
+
+def plan_codes(plan):
+    """Every selected code, middle school first, in planner order."""
+    codes = [code for code in plan["ms_credits"] if code]
+    for year in years:
+        codes.extend(code for code in plan["courses"][year] if code)
+    return codes
+
+
+def taken_before(plan, year, slot):
+    """Codes available as prerequisites for a slot: middle school plus every earlier slot."""
+    taken = {code for code in plan["ms_credits"] if code}
+    for yr in years:
+        for idx, code in enumerate(plan["courses"][yr]):
+            if yr == year and idx >= slot:
+                return taken
+            if code:
+                taken.add(code)
+    return taken
+
+
+def slot_departments(slot, department_code="", code_to_name=dept_code_to_name):
+    if slot < len(core_departments):
+        return [core_departments[slot]]
+    names = code_to_name.get(department_code.strip().upper(), [])
+    return [names] if isinstance(names, str) else list(names)
+
+
+def eligible_options(snapshot, plan, year, slot, department_code=""):
+    """Courses the planner would offer in one slot, in catalog order."""
+    catalog = snapshot["catalog"]
+    departments = slot_departments(slot, department_code, snapshot["dept_code_to_name"])
+    candidates = [code for code in snapshot["courses_by_grade"][year] if catalog[code]["department"] in departments]
+    if slot == 0:
+        allowed = snapshot["english_course_codes_by_grade"].get(year, [])
+        return [code for code in candidates if code in allowed]
+    taken = taken_before(plan, year, slot)
+    return [code for code in candidates if prereq_met(catalog[code]["prereq_groups"], taken)]
+
+
+def find_duplicate_codes(codes, unlimited=unlimited_repeatable_codes, limited=limited_repeatable_counts):
+    """Codes that appear more often than allowed, in first-seen order."""
+    code_counts = Counter(codes)
+    return [
+        code for code, count in code_counts.items()
+        if (
+            (code in limited and count > limited[code])
+            or (code not in unlimited and code not in limited and count > 1)
+        )
+    ]
+
+
+def matches_requirement(requirement, course):
+    if "departments" in requirement and course["department"] not in requirement["departments"]:
+        return False
+    if "codes" in requirement and course["code"] not in requirement["codes"]:
+        return False
+    if "name_contains" in requirement and requirement["name_contains"] not in course["name"].lower():
+        return False
+    return course["name"] not in requirement.get("exclude_names", ())
+
+
+def evaluate_requirement(requirement, selected, cluster_index):
+    result = {"key": requirement["key"], "label": requirement["label"]}
+    if "any_of" in requirement:
+        options = [evaluate_requirement(option, selected, cluster_index) for option in requirement["any_of"]]
+        result.update(met=any(option["met"] for option in options), options=options)
+        return result
+
+    if requirement.get("cte_cluster"):
+        hits = completed_clusters(cluster_progress(cluster_index, ((c["code"], c["credits"]) for c in selected)))
+        cluster = max(hits, key=hits.get) if hits else None
+        result.update(met=bool(hits), cluster=cluster, earned=hits.get(cluster, 0.0))
+        return result
+
+    matched = [course for course in selected if matches_requirement(requirement, course)]
+    earned = sum(course["credits"] for course in matched)
+    met = earned >= requirement.get("min_credits", 0)
+    result.update(earned=earned, required=requirement.get("min_credits", 0))
+    if "groups" in requirement:
+        codes = {course["code"] for course in matched}
+        result["groups_met"] = all(any(code in codes for code in group) for group in requirement["groups"])
+        met = met and result["groups_met"]
+    if requirement.get("same_language"):
+        prefixes = Counter(course["code"][:2] for course in matched)
+        result["same_language"] = any(count >= 2 for count in prefixes.values())
+        met = met and result["same_language"]
+    result["met"] = met
+    return result
+
+
+def evaluate_pathway(snapshot, plan, pathway=None):
+    """Checks a plan against one pathway's rules.
+
+    This is the rules engine behind the API, exports and schools with their own pathway
+    rules. The WHS legacy sidebar tracker is a separate implementation (see shadow.py for
+    how the two are compared), so its answers can differ.
+    """
+    pathway = pathway or plan["pathway"]
+    if pathway not in snapshot["rules"]:
+        raise ValueError(f"Unknown graduation pathway: {pathway}")
+    catalog = snapshot["catalog"]
+    selected = [catalog[code] for code in plan_codes(plan) if code in catalog]
+    requirements = [
+        evaluate_requirement(requirement, selected, snapshot["cluster_index"])
+        for requirement in snapshot["rules"][pathway]
+    ]
+    return {
+        "pathway": pathway,
+        "total_credits": sum(course["credits"] for course in selected),
+        "requirements": requirements,
+        "all_met": all(requirement["met"] for requirement in requirements),
+    }
+
+
+def validate_plan(snapshot, plan):
+    """Flags every slot the planner would not have offered, plus duplicate selections."""
+    catalog = snapshot["catalog"]
+    issues = []
+    for i, code in enumerate(plan["ms_credits"]):
+        if code and (code not in catalog or 8 not in catalog[code]["grades"]):
+            issues.append({"year": "Middle School", "slot": i, "code": code, "problem": "not a middle school credit"})
+
+    for year in years:
+        for slot, code in enumerate(plan["courses"][year]):
+            if not code:
+                continue
+            course = catalog.get(code)
+            if course is None:
+                problem = "unknown course code"
+            elif grade_number(year) not in course["grades"]:
+                problem = f"not offered in {year}"
+            elif slot < len(core_departments) and course["department"] != core_departments[slot]:
+                problem = f"not a {core_departments[slot]} course"
+            elif slot == 0 and code not in snapshot["english_course_codes_by_grade"].get(year, []):
+                problem = f"not a {year} English course"
+            elif not prereq_met(course["prereq_groups"], taken_before(plan, year, slot)):
+                problem = "prerequisites not met"
+            else:
+                continue
+            issues.append({"year": year, "slot": slot, "code": code, "problem": problem})
+
+    duplicates = find_duplicate_codes(
+        plan_codes(plan), snapshot["unlimited_repeatable_codes"], snapshot["limited_repeatable_counts"]
+    )
+    return {"valid": not issues and not duplicates, "issues": issues, "duplicates": duplicates}
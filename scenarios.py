@@ -0,0 +1,125 @@
+from array import array
+
+# A student can keep several named plans ("Plan A: University", "Plan B: CTE") side by side.
+# The first one is the base plan; every other scenario stores only the slots where it
+# differs from the base, as {slot: course id}, so scenarios follow base edits in every
+# slot they never changed. Slots use the session plan layout: 4 middle school slots,
+# then 8 per year.
+
+default_scenario = "Plan A"
+
+
+class PlanScenarios:
+    """Named plans for one session, as copy-on-write deltas from a base plan.
+
+    Each scenario has a version that changes whenever its plan or pathway does, and
+    values computed from a scenario are cached per (scenario, version), so switching
+    back to an unchanged scenario reuses its results.
+    """
+
+    def __init__(self, base, pathway, name=default_scenario):
+        self.base_name = name
+        self.base = array("H", base)
+        self._scenarios = {name: {"delta": {}, "pathway": pathway, "version": 0}}
+        self._results = {}  # name -> (version, {key: value})
+
+    def names(self):
+        return list(self._scenarios)
+
+    def __contains__(self, name):
+        return name in self._scenarios
+
+    def version(self, name):
+        return self._scenarios[name]["version"]
+
+    def pathway(self, name):
+        return self._scenarios[name]["pathway"]
+
+    def delta(self, name):
+        return dict(self._scenarios[name]["delta"])
+
+    def plan(self, name):
+        """The scenario's full plan: the base with its own slots written over it."""
+        plan = array("H", self.base)
+        for slot, course_id in self._scenarios[name]["delta"].items():
+            plan[slot] = course_id
+        return plan
+
+    def update(self, name, plan, pathway):
+        """Records the scenario's current plan; returns True if anything changed."""
+        scenario = self._scenarios[name]
+        changed = pathway != scenario["pathway"]
+        scenario["pathway"] = pathway
+
+        if name == self.base_name:
+            slots = [slot for slot, course_id in enumerate(plan) if course_id != self.base[slot]]
+            for slot in slots:
+                self.base[slot] = plan[slot]
+            # Base edits reach every scenario that has not written over those slots
+            for other_name, other in self._scenarios.items():
+                if other_name != name and any(slot not in other["delta"] for slot in slots):
+                    other["version"] += 1
+            changed = changed or bool(slots)
+        else:
+            current = self.plan(name)
+            delta = scenario["delta"]
+            for slot, course_id in enumerate(plan):
+                if course_id == current[slot]:
+                    continue
+                if course_id == self.base[slot]:
+                    delta.pop(slot, None)
+                else:
+                    delta[slot] = course_id
+                changed = True
+
+        if changed:
+            scenario["version"] += 1
+        return changed
+
+    def add(self, name, source):
+        """A new scenario starting as a copy of `source`."""
+        if name in self._scenarios:
+            raise ValueError(f"A scenario named '{name}' already exists")
+        origin = self._scenarios[source]
+        self._scenarios[name] = {"delta": dict(origin["delta"]), "pathway": origin["pathway"], "version": 0}
+
+    def remove(self, name):
+        if name == self.base_name:
+            raise ValueError("The base plan cannot be removed")
+        del self._scenarios[name]
+        self._results.pop(name, None)
+
+    def cached(self, name, key, compute):
+        """compute(), remembered until the scenario's version changes."""
+        version = self._scenarios[name]["version"]
+        cached_version, values = self._results.get(name, (None, None))
+        if cached_version != version:
+            values = {}
+            self._results[name] = (version, values)
+        if key not in values:
+            values[key] = compute()
+        return values[key]
+
+    def to_rows(self, course_codes):
+        """[{name, pathway, delta: {slot: code}}] in display order, for plan_store.save_scenarios."""
+        return [
+            {
+                "name": name,
+                "pathway": scenario["pathway"],
+                "delta": {slot: course_codes[course_id] for slot, course_id in sorted(scenario["delta"].items())},
+            }
+            for name, scenario in self._scenarios.items()
+        ]
+
+    @classmethod
+    def from_rows(cls, base, rows, course_ids):
+        """Rebuilds saved scenarios on top of a base plan; the first row names the base."""
+        scenarios = cls(base, rows[0]["pathway"], rows[0]["name"])
+        for row in rows[1:]:
+            delta = {int(slot): course_ids.get(code, 0) for slot, code in row["delta"].items()}
+            scenarios._scenarios[row["name"]] = {
+                "delta": {slot: course_id for slot, course_id in delta.items() if course_id != base[slot]},
+                "pathway": row["pathway"],
+                "version": 0,
+            }
+        return scenarios
@@ -0,0 +1,234 @@
+import functools
+import os
+import threading
+import time
+from contextlib import closing
+
+import streamlit as st
+
+import capacity
+import catalog_image
+import metrics
+import plan_store
+import sequences
+from client_bundle import write_bundle
+from planner_core import years, grade_number, load_snapshot
+from schools import load_registry, SchoolCache
+
+# Everything the planner shares between sessions. These live outside the app script so
+# warmup.py can build them before the server takes its first request.
+
+# Eligible-course lists kept per school, keyed by slot and the courses planned before it
+option_cache_size = int(os.environ.get("WHS_OPTION_CACHE_SIZE", "20000"))
+# How often a process looks for a newly published catalog image or next-course index
+image_check_seconds = float(os.environ.get("WHS_CATALOG_CHECK_SECONDS", "5"))
+
+
+@st.cache_resource
+def school_registry():
+    return load_registry()
+
+
+def _open_current_image(config):
+    """The school's published catalog image; compiled from the CSV only if none is published yet.
+
+    Updates are published by `python catalog_image.py`, never by a starting process, so a
+    process with a stale CSV cannot switch every other process to its catalog.
+    """
+    for _ in range(3):
+        name = catalog_image.published(config["id"])
+        if name is None:
+            name = catalog_image.write_image(load_snapshot(school=config), config)
+            catalog_image.publish(config["id"], name)
+        try:
+            return catalog_image.open_image(name)
+        except FileNotFoundError:
+            continue  # replaced by a newer image between reading the pointer and opening it
+    raise FileNotFoundError(f"No catalog image could be opened for school '{config['id']}'")
+
+
+def load_school(school_id):
+    """Catalog, rules, indexes and encoded images for one school; sessions only ever read them.
+
+    The catalog itself lives in a memory-mapped catalog image (see catalog_image.py), so
+    every server process on the machine shares one copy of it.
+    """
+    config = school_registry()["schools"][school_id]
+    image = _open_current_image(config)
+    # Rules, indexes and the in-browser bundle are built from the image, so they always match it
+    snapshot = load_snapshot(school=config, catalog=image.by_code(image.course))
+    bundle = write_bundle(snapshot)
+
+    @functools.lru_cache(maxsize=option_cache_size)
+    def eligible_ids(year, departments, taken):
+        """Course ids offered in one slot, in catalog order.
+
+        `taken` is the frozenset of codes planned before the slot; None means the English
+        slot, which offers the grade's English courses instead of checking prerequisites.
+        """
+        wanted = {image.departments.index(department) for department in departments if department in image.departments}
+        ids = [course_id for course_id in image.ids_in_grade(grade_number(year))
+               if image.department_codes[course_id] in wanted]
+        if taken is None:
+            english = 1 << years.index(year)
+            return tuple(course_id for course_id in ids if image.english_masks[course_id] & english)
+        taken_bits = 0
+        for code in taken:
+            taken_bits |= 1 << image.course_id(code)
+        return tuple(
+            course_id for course_id in ids
+            if all(group & taken_bits for group in image.prereq_bitsets(course_id))
+        )
+
+    @functools.lru_cache(maxsize=option_cache_size)
+    def ranked_ids(index, year, pathway, options, previous, earlier):
+        """`options` with the courses most often chosen after the student's earlier ones first.
+
+        `index` is the school's sequence_index(); `previous` and `earlier` are the course ids
+        planned one and two years before the slot. Ties keep catalog order.
+        """
+        if not index:
+            return options
+        scores = index.scores(
+            grade_number(year), pathway, [image.codes[i] for i in previous], [image.codes[i] for i in earlier]
+        )
+        if not scores:
+            return options
+        return tuple(sorted(options, key=lambda course_id: scores.get(image.codes[course_id], (0, 0)), reverse=True))
+
+    return {
+        "config": config,
+        "image": image,
+        "snapshot": snapshot,
+        "eligible_ids": eligible_ids,
+        "ranked_ids": ranked_ids,
+        # Course code -> credits, name and department
+        "credits_by_code": image.by_code(image.credits.__getitem__),
+        "course_names_by_code": image.by_code(image.names.__getitem__),
+        "course_departments_by_code": image.by_code(image.department),
+        # Course prerequisites as groups of codes
+        "prereq_dict": image.by_code(image.prereq_groups),
+        # Small-integer course ids: 0 is an empty slot and id n is row n - 1 of the catalog
+        "course_codes": image.codes,
+        "course_names": image.names,
+        "course_notes": image.notes,
+        "course_ids": image.by_code(int),
+        "ms_options": [0] + image.ids_in_grade(8),
+        # Base64 PNGs, as read-only views of the image
+        "banner": image.banner,
+        "logo": image.logo,
+        "bundle": bundle,
+    }
+
+
+_school_caches = []
+
+
+@st.cache_resource
+def school_cache():
+    cache = SchoolCache(load_school, on_drop=_retire)
+    _school_caches[:] = [cache]  # read by the metrics endpoint, which runs outside any session
+    return cache
+
+
+_image_checked = {}
+
+
+def current_school(school_id):
+    """The loaded school, reloaded once `catalog_image.py` has published a newer image for it.
+
+    Sessions still holding the old school keep its mapping alive until they move on.
+    """
+    cache = school_cache()
+    school = cache.get(school_id)
+    now = time.monotonic()
+    if now - _image_checked.get(school_id, 0.0) >= image_check_seconds:
+        _image_checked[school_id] = now
+        name = catalog_image.published(school_id)
+        if name and name != school["image"].name:
+            cache.discard(school_id)
+            school = cache.get(school_id)
+    return school
+
+
+_sequence_indexes = {}  # school id -> (checked at, file mtime, index)
+
+
+def sequence_index(school_id):
+    """The school's next-course index (see sequences.py), reloaded after the batch job rewrites it."""
+    now = time.monotonic()
+    checked, mtime, index = _sequence_indexes.get(school_id, (None, None, None))
+    if checked is None or now - checked >= image_check_seconds:
+        try:
+            current = os.path.getmtime(sequences.index_path(school_id))
+        except OSError:
+            current = None
+        if index is None or current != mtime:
+            index = sequences.NextCourseIndex.load(sequences.index_path(school_id)) if current else \
+                sequences.NextCourseIndex()
+        _sequence_indexes[school_id] = (now, current, index)
+    return index
+
+
+# Per-school lookup caches, and the hits and misses of schools that have left the school cache,
+# so the process totals keep counting up when a school is evicted or reloaded
+_lookup_caches = {"options": "eligible_ids", "rankings": "ranked_ids"}
+_retired = {name: [0, 0] for name in _lookup_caches}
+_reported = {}
+_stats_lock = threading.Lock()
+
+
+def _retire(school_id, school):
+    with _stats_lock:
+        for name, key in _lookup_caches.items():
+            info = school[key].cache_info()
+            _retired[name][0] += info.hits
+            _retired[name][1] += info.misses
+
+
+def _cache_stats():
+    """(hits, misses, entries) per cache: loaded schools, and eligible-course lists across them.
+
+    Hits and misses are totals since the process started and never go down.
+    """
+    if not _school_caches:
+        return {}
+    cache = _school_caches[0]
+    with _stats_lock:
+        retired = {name: list(totals) for name, totals in _retired.items()}
+    schools = cache.items()
+    stats = {"catalog": (cache.hits, cache.misses, len(schools))}
+    for name, key in _lookup_caches.items():
+        infos = [school[key].cache_info() for _, school in schools]
+        stats[name] = (retired[name][0] + sum(i.hits for i in infos), retired[name][1] + sum(i.misses for i in infos),
+                       sum(i.currsize for i in infos))
+    with _stats_lock:
+        # A school dropped between the two reads above is briefly in neither; never report less than before
+        for name, (hits, misses, entries) in stats.items():
+            last_hits, last_misses = _reported.get(name, (0, 0))
+            stats[name] = (max(hits, last_hits), max(misses, last_misses), entries)
+            _reported[name] = stats[name][:2]
+    return stats
+
+
+def _stat(index):
+    return lambda: {(name,): stats[index] for name, stats in _cache_stats().items()}
+
+
+def _hit_ratio():
+    return {(name,): hits / (hits + misses) for name, (hits, misses, _) in _cache_stats().items() if hits + misses}
+
+
+metrics.Gauge("planner_cache_hits_total", "Cache lookups answered from memory.", ["cache"], _stat(0), type="counter")
+metrics.Gauge("planner_cache_misses_total", "Cache lookups that had to build the value.", ["cache"], _stat(1), type="counter")
+metrics.Gauge("planner_cache_entries", "Values currently held.", ["cache"], _stat(2))
+metrics.Gauge("planner_cache_hit_ratio", "hits / (hits + misses) since the process started.", ["cache"], _hit_ratio)
+
+
+@st.cache_resource
+def seat_cache(school_id):
+    # One counter cache per school and server process, shared by every session
+    path = school_registry()["schools"][school_id].get("capacity")
+    with closing(plan_store.connect()) as conn:
+        capacity.init_store(conn, capacity.load_capacities(path) if path else {}, school_id)
+    return capacity.SeatCache(plan_store.connect, school=school_id)
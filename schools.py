@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Each school has its own catalog, department codes and pathway rules, listed in schools.json:
+#
+#   {"default": "whs",
+#    "schools": {"whs": {"name": "Watertown High School", "catalog": "WHS_course_catalog.csv", ...}}}
+#
+# Paths are relative to the registry file. Optional keys (dept_code_to_name,
+# english_course_codes_by_grade, grade_requirements, pathway_rules, cte_clusters, ...)
+# fall back to the WHS defaults in planner_core.py.
+registry_path = os.environ.get("WHS_SCHOOLS", "schools.json")
+default_cache_size = int(os.environ.get("WHS_SCHOOL_CACHE_SIZE", "4"))
+
+path_keys = ("catalog", "capacity", "banner", "logo", "pathway_rules", "cte_clusters")
+
+default_school = {
+    "name": "Watertown High School",
+    "catalog": "WHS_course_catalog.csv",
+    "capacity": "WHS_course_capacity.csv",
+    "banner": "Banner.png",
+    "logo": "WHS_logo2.webp",
+    "url": "https://www.watertown.k12.sd.us/o/high-school",
+}
+
+
+def load_registry(path=None):
+    """School id -> config (with an "id" key and absolute paths), plus the default school id."""
+    path = path or registry_path
+    if not os.path.exists(path):
+        registry = {"default": "whs", "schools": {"whs": dict(default_school)}}
+        base = os.getcwd()
+    else:
+        with open(path, encoding="utf-8") as f:
+            registry = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+
+    schools = {}
+    for school_id, config in registry["schools"].items():
+        config = dict(config, id=school_id)
+        for key in path_keys:
+            if config.get(key):
+                config[key] = os.path.join(base, config[key])
+        schools[school_id] = config
+    default = registry.get("default") or next(iter(schools))
+    if default not in schools:
+        raise ValueError(f"Default school '{default}' is not in {path}")
+    return {"default": default, "schools": schools}
+
+
+class SchoolCache:
+    """Bounded LRU of loaded schools, shared by every session in the process.
+
+    A school is loaded on first use; concurrent requests for the same school wait for
+    one load instead of each parsing the catalog. The least recently used school is
+    dropped once more than `maxsize` are loaded. `on_drop(school_id, value)` is called
+    for every school that leaves the cache, evicted or discarded.
+    """
+
+    def __init__(self, loader, maxsize=default_cache_size, on_drop=None):
+        self._loader = loader
+        self._on_drop = on_drop
+        self._maxsize = max(1, maxsize)
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, school_id):
+        while True:
+            with self._lock:
+                if school_id in self._entries:
+                    self._entries.move_to_end(school_id)
+                    self.hits += 1
+                    return self._entries[school_id]
+                pending = self._loading.get(school_id)
+                if pending is None:
+                    pending = self._loading[school_id] = threading.Event()
+                    self.misses += 1
+                    break
+            pending.wait()  # another session is loading it; pick it up from the cache
+
+        try:
+            value = self._loader(school_id)
+        except BaseException:
+            with self._lock:
+                del self._loading[school_id]
+            pending.set()
+            raise
+
+        with self._lock:
+            self._entries[school_id] = value
+            while len(self._entries) > self._maxsize:
+                dropped = self._entries.popitem(last=False)
+                self.evictions += 1
+                if self._on_drop:
+                    self._on_drop(*dropped)
+            del self._loading[school_id]
+        pending.set()
+        return value
+
+    def discard(self, school_id):
+        """Drops a loaded school so the next get() loads it again."""
+        with self._lock:
+            value = self._entries.pop(school_id, None)
+            if value is not None and self._on_drop:
+                self._on_drop(school_id, value)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._entries)
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
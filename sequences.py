@@ -0,0 +1,224 @@
+"""Course sequences mined from saved plans, and the next-course index the planner ranks options with.
+
+    python sequences.py [--db plans.db] [--rebuild] [--min-support 3]
+
+For every saved plan, each course in a grade is paired with each course the student planned
+the year before (middle school credits count as grade 8). Three-year chains, such as
+Intro to Computer Science -> CS Principles -> Cybersecurity, are counted as well when all
+three courses are in one department. Both are counted per pathway and across all pathways
+("*"), once per student. The counts live in the plan store with the courses each plan
+had when it was counted, so a refresh only reads plans saved since the last run: it takes
+away what a changed plan contributed before and adds what it contributes now.
+
+After a refresh, each school's sequences seen in at least --min-support plans are written to
+course_sequences/<school>.json. The planner reloads that file when it changes and lists
+the courses students with the same earlier courses chose most often first.
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from itertools import product
+
+import plan_store
+from planner_core import years, grade_number, load_catalog
+from schools import load_registry
+
+index_dir = os.environ.get(
+    "WHS_SEQUENCE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "course_sequences")
+)
+default_min_support = 3
+all_pathways = "*"
+ms_grade = 8
+
+# `previous` is a code for a one-year step, or "earlier>previous" for a two-year chain
+schema = """
+CREATE TABLE IF NOT EXISTS course_sequences (
+    school   TEXT NOT NULL,
+    pathway  TEXT NOT NULL,
+    grade    INTEGER NOT NULL,
+    previous TEXT NOT NULL,
+    next     TEXT NOT NULL,
+    plans    INTEGER NOT NULL,
+    PRIMARY KEY (school, pathway, grade, previous, next)
+);
+CREATE TABLE IF NOT EXISTS course_sequence_sources (
+    student_id TEXT PRIMARY KEY,
+    school     TEXT NOT NULL,
+    pathway    TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    courses    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS course_sequence_state (
+    key   TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+def init_store(conn):
+    conn.executescript(schema)
+
+
+def codes_by_grade(plan):
+    """{grade: sorted codes}, middle school credits as grade 8."""
+    grades = {ms_grade: sorted({code for code in plan["ms_credits"] if code})}
+    for year in years:
+        grades[grade_number(year)] = sorted({code for code in plan["courses"][year] if code})
+    return grades
+
+
+def plan_sequences(pathway, grades, departments):
+    """The (pathway, grade, previous, next) items one plan contributes, each once.
+
+    `grades` is codes_by_grade(plan) (with string keys once read back from the store) and
+    `departments` maps course codes to departments, for the three-year chains.
+    """
+    grades = {int(grade): codes for grade, codes in grades.items()}
+    items = set()
+    for year in years:
+        grade = grade_number(year)
+        previous = grades.get(grade - 1, [])
+        earlier = grades.get(grade - 2, [])
+        for code in grades.get(grade, []):
+            department = departments.get(code)
+            keys = previous + [
+                f"{e}>{p}" for e, p in product(earlier, previous)
+                if department and departments.get(e) == departments.get(p) == department
+            ]
+            for name in (pathway, all_pathways):
+                items.update((name, grade, key, code) for key in keys)
+    return items
+
+
+def refresh(conn, rebuild=False):
+    """Brings the counts up to date with the plan store; returns (plans counted, schools changed)."""
+    init_store(conn)
+    if rebuild:
+        conn.executescript("DELETE FROM course_sequences; DELETE FROM course_sequence_sources; "
+                           "DELETE FROM course_sequence_state;")
+    # The last change_seq counted; save times are taken before commit and cannot order saves
+    row = conn.execute("SELECT value FROM course_sequence_state WHERE key = 'change_seq'").fetchone()
+    watermark = int(row[0]) if row else None
+
+    registry = load_registry()
+    departments = {}  # school -> code -> department
+
+    def school_departments(school):
+        if school not in departments:
+            config = registry["schools"].get(school)
+            catalog = load_catalog(config["catalog"]) if config else {}
+            departments[school] = {code: course["department"] for code, course in catalog.items()}
+        return departments[school]
+
+    changes = Counter()
+    sources = []
+    latest = watermark or 0
+    for plan in plan_store.iter_plans(conn, changed_after=watermark):
+        old = conn.execute(
+            "SELECT school, pathway, updated_at, courses FROM course_sequence_sources WHERE student_id = ?",
+            (plan["student_id"],)
+        ).fetchone()
+        if old:
+            for item in plan_sequences(old[1], json.loads(old[3]), school_departments(old[0])):
+                changes[(old[0], *item)] -= 1
+        grades = codes_by_grade(plan)
+        for item in plan_sequences(plan["pathway"], grades, school_departments(plan["school"])):
+            changes[(plan["school"], *item)] += 1
+        sources.append((plan["student_id"], plan["school"], plan["pathway"], plan["updated_at"],
+                        json.dumps(grades, separators=(",", ":"))))
+        latest = max(latest, plan["change_seq"])
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "INSERT INTO course_sequences (school, pathway, grade, previous, next, plans) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (school, pathway, grade, previous, next) DO UPDATE SET plans = plans + excluded.plans",
+            ((*key, delta) for key, delta in changes.items() if delta)
+        )
+        conn.execute("DELETE FROM course_sequences WHERE plans <= 0")
+        conn.executemany(
+            "INSERT OR REPLACE INTO course_sequence_sources (student_id, school, pathway, updated_at, courses) "
+            "VALUES (?, ?, ?, ?, ?)", sources
+        )
+        conn.execute("INSERT OR REPLACE INTO course_sequence_state (key, value) VALUES ('change_seq', ?)", (latest,))
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return len(sources), sorted({key[0] for key, delta in changes.items() if delta})
+
+
+def write_index(conn, school, min_support=default_min_support, directory=None):
+    """Writes course_sequences/<school>.json from the counts and returns its path."""
+    sequences = defaultdict(lambda: defaultdict(dict))
+    rows = conn.execute(
+        "SELECT pathway, grade, previous, next, plans FROM course_sequences WHERE school = ? AND plans >= ?",
+        (school, min_support)
+    )
+    count = 0
+    for pathway, grade, previous, next_code, plans in rows:
+        sequences[pathway][str(grade)].setdefault(previous, {})[next_code] = plans
+        count += 1
+    path = index_path(school, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"school": school, "min_support": min_support, "sequences": sequences}, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path, count
+
+
+def index_path(school, directory=None):
+    return os.path.join(directory or index_dir, f"{school}.json")
+
+
+class NextCourseIndex:
+    """How many plans followed a student's earlier courses with each course, per grade and pathway."""
+
+    def __init__(self, sequences=None):
+        self.sequences = sequences or {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["sequences"])
+
+    def __bool__(self):
+        return bool(self.sequences)
+
+    def scores(self, grade, pathway, previous, earlier):
+        """{next code: (plans on this pathway, plans on any pathway)} that share the student's
+        courses from the year before (`previous`) or chains from the two years before."""
+        keys = list(previous) + [f"{e}>{p}" for e, p in product(earlier, previous)]
+        scores = defaultdict(lambda: [0, 0])
+        for position, name in enumerate((pathway, all_pathways)):
+            by_previous = self.sequences.get(name, {}).get(str(grade), {})
+            for key in keys:
+                for code, plans in by_previous.get(key, {}).items():
+                    scores[code][position] += plans
+        return {code: tuple(score) for code, score in scores.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="plan store (default: plans.db or $WHS_PLAN_DB)")
+    parser.add_argument("--rebuild", action="store_true", help="forget the counts and mine every plan again")
+    parser.add_argument("--min-support", type=int, default=default_min_support,
+                        help="plans a sequence needs before the planner uses it (default: 3)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    conn = plan_store.connect(args.db)
+    plans, changed = refresh(conn, args.rebuild)
+    print(f"plans mined: {plans}")
+    for (school,) in conn.execute("SELECT DISTINCT school FROM course_sequences").fetchall():
+        if args.rebuild or school in changed or not os.path.exists(index_path(school)):
+            path, count = write_index(conn, school, args.min_support)
+            print(f"  {school}: {count} sequences -> {path}")
+    print(f"seconds: {round(time.perf_counter() - started, 2)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Shadow evaluation of the legacy sidebar tracker against a candidate requirement engine.
+
+    WHS_SHADOW_SAMPLE=0.05 streamlit run WHS_course_plan.py
+
+On a sampled fraction of reruns, the legacy tracker renders as usual while a
+TrackerRecorder notes which requirement lines it showed as met. The candidate engine
+(WHS_SHADOW_ENGINE, "module:function" with the evaluate_pathway signature; planner_core's
+by default) then checks the same plan on a background thread, so the rerun never waits
+for it. Every comparison is appended to WHS_SHADOW_LOG as one JSON line with both
+timings and any per-requirement disagreement, and counted on /metrics. The legacy time
+includes drawing its lines, since the two cannot be separated in that code.
+"""
+import importlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import metrics
+
+sample_rate = float(os.environ.get("WHS_SHADOW_SAMPLE", "0"))
+engine_name = os.environ.get("WHS_SHADOW_ENGINE", "planner_core:evaluate_pathway")
+log_path = os.environ.get("WHS_SHADOW_LOG", "shadow.jsonl")
+max_pending = 100
+
+# Legacy status lines are "<label>: ..." or a bare sentence; the engine reports the same checks under these keys
+legacy_labels = {
+    "English": ["english"],
+    "Speech/Debate": ["speech"],
+    "Mathematics": ["math"],
+    "Science": ["science"],
+    "Social Studies": ["social_studies"],
+    "Econ/Finance": ["finance"],
+    "Native American Studies": ["native_american_studies"],
+    "PE/Health": ["pe_health"],
+    "Fine Arts": ["fine_arts"],
+    "World Language": ["world_language"],
+    "Languages": ["language_or_cte"],
+    "World Language or CTE cluster requirement not met": ["language_or_cte"],
+    "✅ Completed CTE cluster": ["cte_cluster"],
+    "CTE cluster requirement not met": ["cte_cluster"],
+}
+# Legacy lines that cover several engine requirements at once: met only when all of them are
+combined_requirements = {"pe_health": ("pe", "health")}
+# The Honors branch shows a finished cluster as its language alternative
+honors_labels = {"✅ Completed CTE cluster": ["language_or_cte"]}
+final_lines = ("✅ All graduation requirements", "🎓 All Advanced/Honors", "Some graduation requirements")
+
+comparisons_total = metrics.Counter(
+    "planner_shadow_comparisons_total", "Reruns checked by both the legacy tracker and the candidate engine."
+)
+disagreements_total = metrics.Counter(
+    "planner_shadow_disagreements_total", "Requirements the two trackers judged differently.", ["requirement"]
+)
+dropped_total = metrics.Counter("planner_shadow_dropped_total", "Sampled reruns skipped because the queue was full.")
+shadow_seconds = metrics.Histogram(
+    "planner_shadow_seconds", "Tracker evaluation time on sampled reruns.", ["engine"]
+)
+
+
+class TrackerRecorder:
+    """Stands in for the streamlit module inside the legacy tracker and notes each status line.
+
+    Everything is forwarded to streamlit unchanged, so the sidebar looks exactly the same.
+    """
+
+    def __init__(self, st, lines=None):
+        self._st = st
+        self.lines = [] if lines is None else lines  # (met, message)
+
+    def __getattr__(self, name):
+        return getattr(self._st, name)
+
+    @property
+    def sidebar(self):
+        return TrackerRecorder(self._st.sidebar, self.lines)
+
+    def success(self, body, *args, **kwargs):
+        self.lines.append((True, str(body)))
+        return self._st.success(body, *args, **kwargs)
+
+    def warning(self, body, *args, **kwargs):
+        self.lines.append((False, str(body)))
+        return self._st.warning(body, *args, **kwargs)
+
+    def error(self, body, *args, **kwargs):
+        self.lines.append((False, str(body)))
+        return self._st.error(body, *args, **kwargs)
+
+
+def legacy_outcomes(lines, pathway):
+    """{requirement key: met} from the recorded lines, plus "all_met" from the closing line."""
+    labels = dict(legacy_labels, **(honors_labels if pathway == "Honors/Scholarship Opportunity" else {}))
+    outcomes = {}
+    for met, message in lines:
+        if message.startswith(final_lines):
+            outcomes["all_met"] = met
+            continue
+        for key in labels.get(message.split(":", 1)[0], ()):
+            outcomes[key] = met
+    return outcomes
+
+
+def sampled():
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def _load_engine(name):
+    module, _, function = name.partition(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def compare(engine, snapshot, plan, pathway, legacy, legacy_seconds, legacy_total):
+    """Runs the candidate engine and returns the log entry for one sampled rerun."""
+    started = time.perf_counter()
+    result = engine(snapshot, plan, pathway)
+    candidate_seconds = time.perf_counter() - started
+
+    candidate = {requirement["key"]: requirement["met"] for requirement in result["requirements"]}
+    candidate["all_met"] = result["all_met"]
+    for key, parts in combined_requirements.items():
+        if all(part in candidate for part in parts):
+            candidate[key] = all(candidate[part] for part in parts)
+    disagreements = [
+        {"requirement": key, "legacy": met, "candidate": candidate[key]}
+        for key, met in sorted(legacy.items()) if key in candidate and candidate[key] != met
+    ]
+    if legacy_total is not None and abs(float(legacy_total) - result["total_credits"]) > 1e-9:
+        disagreements.append({"requirement": "total_credits_value", "legacy": float(legacy_total),
+                              "candidate": result["total_credits"]})
+    return {
+        "time": time.time(),
+        "school": snapshot["school_id"],
+        "pathway": pathway,
+        "legacy_seconds": round(legacy_seconds, 6),
+        "candidate_seconds": round(candidate_seconds, 6),
+        "seconds_saved": round(legacy_seconds - candidate_seconds, 6),
+        "compared": sorted(key for key in legacy if key in candidate),
+        "disagreements": disagreements,
+        "plan": plan,
+    }
+
+
+class ShadowWorker:
+    """One background thread that runs the candidate engine and writes the log."""
+
+    def __init__(self, engine=None, path=log_path):
+        self.engine = engine or _load_engine(engine_name)
+        self.path = path
+        self._queue = queue.Queue(maxsize=max_pending)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, snapshot, plan, pathway, lines, legacy_seconds, legacy_total):
+        try:
+            self._queue.put_nowait((snapshot, plan, pathway, lines, legacy_seconds, legacy_total))
+        except queue.Full:
+            dropped_total.inc()
+
+    def _run(self):
+        while True:
+            snapshot, plan, pathway, lines, legacy_seconds, legacy_total = self._queue.get()
+            try:
+                entry = compare(self.engine, snapshot, plan, pathway, legacy_outcomes(lines, pathway),
+                                legacy_seconds, legacy_total)
+                comparisons_total.inc()
+                shadow_seconds.observe(entry["legacy_seconds"], engine="legacy")
+                shadow_seconds.observe(entry["candidate_seconds"], engine="candidate")
+                for disagreement in entry["disagreements"]:
+                    disagreements_total.inc(requirement=disagreement["requirement"])
+                if not entry["disagreements"]:
+                    entry.pop("plan")  # plans are only kept when there is something to investigate
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            except Exception as e:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"time": time.time(), "pathway": pathway, "error": f"{type(e).__name__}: {e}"}) + "\n")
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def worker():
+    """The process-wide shadow worker, started on first use."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = ShadowWorker()
+    return _worker
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from analysis_pool import AnalysisPool
+
+
+def slow(value, started=None, release=None, *, cancelled):
+    if started is not None:
+        started.set()
+    if release is not None:
+        release.wait(2)
+    return None if cancelled.is_set() else value * 2
+
+
+def test_same_version_reuses_job_and_result():
+    pool = AnalysisPool(workers=1)
+    job = pool.submit("s1", "cte", 1, slow, 3)
+    assert pool.submit("s1", "cte", 1, slow, 3) is job
+    job.future.result(timeout=2)
+    assert job.state == "done" and job.result() == 6
+    assert pool.submit("s1", "cte", 1, slow, 3) is job
+
+
+def test_newer_version_cancels_running_and_queued_jobs():
+    pool = AnalysisPool(workers=1)
+    started, release = threading.Event(), threading.Event()
+    running = pool.submit("s1", "cte", 1, slow, 1, started, release)
+    started.wait(2)
+    queued = pool.submit("s2", "cte", 1, slow, 2)
+    newer_queued = pool.submit("s2", "cte", 2, slow, 3)
+    newer = pool.submit("s1", "cte", 2, slow, 4)
+    assert running.state == "cancelled" and running.result() is None
+    assert queued.state == "cancelled" and queued.future.cancelled()
+    release.set()
+    assert newer.future.result(timeout=2) == 8
+    assert newer_queued.future.result(timeout=2) == 6
+    deadline = time.monotonic() + 2
+    while pool.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.pending() == 0
+
+
+def test_full_pool_rejects_and_retries_later():
+    pool = AnalysisPool(workers=1, max_pending=1)
+    release = threading.Event()
+    busy = pool.submit("s1", "cte", 1, slow, 1, None, release)
+    rejected = pool.submit("s2", "cte", 1, slow, 2)
+    assert rejected.state == "rejected" and rejected.done()
+    release.set()
+    busy.future.result(timeout=2)
+    deadline = time.monotonic() + 2
+    while pool.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    retried = pool.submit("s2", "cte", 1, slow, 2)
+    assert retried is not rejected
+    assert retried.future.result(timeout=2) == 4
+
+
+def test_concurrent_submits_always_see_a_future():
+    pool = AnalysisPool(workers=2, max_pending=1000)
+    errors = []
+
+    def hammer(version):
+        try:
+            for _ in range(200):
+                pool.submit("s1", "cte", version, slow, version).state
+        except Exception as e:  # a job handed out before its future was set
+            errors.append(e)
+
+    threads = [threading.Thread(target=hammer, args=(n % 2,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
@@ -0,0 +1,85 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from api_server import make_handler, sample_plan
+from planner_core import load_snapshot
+from schools import SchoolCache, load_registry
+
+
+@pytest.fixture(scope="module")
+def server():
+    registry = load_registry()
+    school_cache = SchoolCache(lambda school_id: load_snapshot(school=registry["schools"][school_id]))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(registry, school_cache))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(port, path, body=None, headers=None, raw=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    data = raw if raw is not None else json.dumps(body).encode()
+    connection.putrequest("POST", path)
+    for name, value in (headers if headers is not None else {"Content-Length": str(len(data))}).items():
+        connection.putheader(name, value)
+    connection.endheaders()
+    connection.send(data)
+    response = connection.getresponse()
+    payload = json.loads(response.read() or b"null")
+    connection.close()
+    return response.status, payload
+
+
+def test_valid_plan(server):
+    status, result = post(server, "/pathway", {"plan": sample_plan})
+    assert status == 200
+    assert result["pathway"] == "University"
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/validate", {"plan": {"courses": [1]}}),
+    ("/validate", {"plan": {"courses": {"9th Grade": "2401"}}}),
+    ("/validate", {"plan": {"ms_credits": {"a": 1}}}),
+    ("/validate", {"plan": {"pathway": 3}}),
+    ("/validate", {"plan": {}, "school": [1]}),
+    ("/pathway", {"plan": {}, "pathway": ["University"]}),
+    ("/options", {"plan": {}, "year": "9th Grade", "slot": 4, "department_code": 5}),
+])
+def test_wrong_types_are_bad_requests(server, path, body):
+    status, result = post(server, path, body)
+    assert status == 400
+    assert "must be" in result["error"]
+
+
+def test_bad_batch_entry_does_not_drop_the_batch(server):
+    status, results = post(server, "/validate", [{"plan": sample_plan}, {"plan": {"courses": [1]}}])
+    assert status == 200
+    assert "valid" in results[0]
+    assert "must be" in results[1]["error"]
+
+
+def test_content_length_is_checked(server):
+    assert post(server, "/validate", raw=b"{}", headers={})[0] == 411
+    assert post(server, "/validate", raw=b"{}", headers={"Content-Length": "abc"})[0] == 400
+    assert post(server, "/validate", raw=b"{}", headers={"Content-Length": "-1"})[0] == 400
+
+
+def test_unexpected_errors_answer_500(server, monkeypatch):
+    import api_server
+
+    def broken(snapshot, body):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(api_server.routes, "/broken", broken)
+    status, result = post(server, "/broken", {"plan": {}})
+    assert status == 500
+    assert result == {"error": "internal error"}
+    status, results = post(server, "/broken", [{"plan": {}}])
+    assert status == 200
+    assert results == [{"error": "internal error"}]
@@ -0,0 +1,69 @@
+import pytest
+
+import bulk_edit
+import plan_store
+from bulk_edit import BulkEditRejected, CourseEdit, run_edit
+from planner_core import load_snapshot
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = plan_store.connect(str(tmp_path / "plans.db"))
+    for student_id in ("S1", "S2"):
+        plan_store.save_plan(conn, {"student_id": student_id, "pathway": "Career & Technical", "ms_credits": [],
+                                    "courses": {"9th Grade": ["2401"], "10th Grade": ["2501"]}})
+        # Scenario B also takes English 9 in slot 12 (the first 10th grade slot), so an edit rewrites its delta
+        plan_store.save_scenarios(conn, student_id, [
+            {"name": "Base", "pathway": "Career & Technical", "delta": {}},
+            {"name": "B", "pathway": "Career & Technical", "delta": {"12": "2401"}},
+        ])
+    return conn
+
+
+def dump(conn):
+    return (conn.execute("SELECT * FROM plans ORDER BY student_id").fetchall(),
+            conn.execute("SELECT * FROM plan_scenarios ORDER BY student_id, position").fetchall())
+
+
+def test_failure_while_writing_rolls_back_every_plan(conn, monkeypatch):
+    before = dump(conn)
+    write_scenarios = plan_store.write_scenarios
+    calls = []
+
+    def fail_on_second(conn, student_id, rows):
+        calls.append(student_id)
+        write_scenarios(conn, student_id, rows)
+        if len(calls) == 2:
+            raise OSError("disk full")
+
+    monkeypatch.setattr(bulk_edit.plan_store, "write_scenarios", fail_on_second)
+    snapshot = load_snapshot()
+    with pytest.raises(OSError):
+        run_edit(conn, snapshot, CourseEdit(snapshot, "2401", "2404"), allow_new_issues=True)
+    assert calls == ["S1", "S2"]
+    assert dump(conn) == before
+    assert not conn.in_transaction
+
+
+def test_new_issues_reject_the_edit_and_write_nothing(conn):
+    before = dump(conn)
+    snapshot = load_snapshot()
+    with pytest.raises(BulkEditRejected) as rejected:
+        run_edit(conn, snapshot, CourseEdit(snapshot, "2401", "4301"))
+    assert all(impact["new_issues"] for impact in rejected.value.impacts)
+    assert dump(conn) == before
+
+
+def test_dry_run_reports_without_writing(conn):
+    before = dump(conn)
+    snapshot = load_snapshot()
+    edit = CourseEdit(snapshot, "2401", "2404")
+    impacts = run_edit(conn, snapshot, edit, dry_run=True, allow_new_issues=True)
+    assert {(impact["student_id"], impact["scenario"]) for impact in impacts} == {
+        ("S1", "Base"), ("S1", "B"), ("S2", "Base"), ("S2", "B")
+    }
+    assert dump(conn) == before
+
+    run_edit(conn, snapshot, edit, allow_new_issues=True)
+    assert plan_store.load_plan(conn, "S1")["courses"]["9th Grade"][0] == "2404"
+    assert plan_store.load_scenarios(conn, "S1")[1]["delta"] == {"12": "2404"}
@@ -0,0 +1,33 @@
+import functools
+
+import school_context
+from schools import SchoolCache
+
+
+def fake_school(school_id):
+    @functools.lru_cache(maxsize=None)
+    def lookup(value):
+        return value
+
+    return {"eligible_ids": lookup, "ranked_ids": lookup}
+
+
+def test_cache_totals_survive_eviction(monkeypatch):
+    monkeypatch.setattr(school_context, "_retired", {name: [0, 0] for name in school_context._lookup_caches})
+    monkeypatch.setattr(school_context, "_reported", {})
+    cache = SchoolCache(fake_school, maxsize=1, on_drop=school_context._retire)
+    monkeypatch.setattr(school_context, "_school_caches", [cache])
+
+    first = cache.get("a")["eligible_ids"]
+    first(1), first(1), first(2)  # 1 hit, 2 misses
+    before = school_context._cache_stats()["options"]
+    assert before[:2] == (1, 2)
+
+    cache.get("b")  # evicts "a"
+    after = school_context._cache_stats()["options"]
+    assert after[:2] == (1, 2)
+    assert after[2] == 0
+
+    cache.discard("b")
+    cache.get("a")["eligible_ids"](3)
+    assert school_context._cache_stats()["options"][:2] == (1, 3)
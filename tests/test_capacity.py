@@ -0,0 +1,57 @@
+import threading
+
+import capacity
+import plan_store
+
+
+def store(path, capacities):
+    conn = plan_store.connect(str(path))
+    capacity.init_store(conn, capacities)
+    return conn
+
+
+def test_concurrent_finalizes_never_oversell(tmp_path):
+    path = tmp_path / "plans.db"
+    store(path, {"8601": 5}).close()
+    results = {}
+
+    def finalize(student_id):
+        conn = plan_store.connect(str(path))
+        try:
+            results[student_id] = capacity.finalize_registration(conn, student_id, ["8601"])[0]["8601"]
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=finalize, args=(f"S{n}",)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    statuses = [result["status"] for result in results.values()]
+    assert statuses.count("seated") == 5
+    assert statuses.count("waitlisted") == 15
+    positions = sorted(result["waitlist_position"] for result in results.values() if result["waitlist_position"])
+    assert positions == list(range(1, 16))
+    conn = plan_store.connect(str(path))
+    assert conn.execute("SELECT seated FROM seat_counts WHERE course_code = '8601'").fetchone()[0] == 5
+
+
+def test_lowered_capacity_keeps_seats_and_shows_none_left(tmp_path):
+    conn = store(tmp_path / "plans.db", {"8601": 4})
+    for n in range(4):
+        capacity.finalize_registration(conn, f"S{n}", ["8601"])
+    capacity.init_store(conn, {"8601": 1})
+
+    results, counts = capacity.finalize_registration(conn, "S9", ["8601"])
+    assert results["8601"]["status"] == "waitlisted"
+    assert counts["8601"] == 0
+    cache = capacity.SeatCache(lambda: plan_store.connect(str(tmp_path / "plans.db")), ttl=0)
+    assert cache.remaining("8601") == 0
+
+    # Drops only reopen a seat once the seated count is under the new capacity
+    for n in range(3):
+        capacity.finalize_registration(conn, f"S{n}", [])
+    assert capacity.finalize_registration(conn, "S9", ["8601"])[0]["8601"]["status"] == "waitlisted"
+    capacity.finalize_registration(conn, "S3", [])
+    assert capacity.finalize_registration(conn, "S9", ["8601"])[0]["8601"]["status"] == "seated"
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import catalog_image
+from planner_core import evaluate_pathway, load_snapshot, normalize_plan
+from schools import load_registry
+
+
+@pytest.fixture
+def image_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_image, "image_dir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture(scope="module")
+def config():
+    registry = load_registry()
+    return registry["schools"][registry["default"]]
+
+
+def test_publish_removes_only_its_own_old_images(image_dir, config):
+    snapshot = load_snapshot(school=config)
+    old = catalog_image.write_image(dict(snapshot, catalog=dict(list(snapshot["catalog"].items())[:-1])), config)
+    other_school = f"{snapshot['school_id']}.north.0123456789ab.img"
+    (image_dir / other_school).write_bytes(b"")
+    catalog_image.publish(snapshot["school_id"], old)
+
+    new = catalog_image.write_image(snapshot, config)
+    catalog_image.publish(snapshot["school_id"], new)
+    assert sorted(os.listdir(image_dir)) == sorted([new, other_school, f"{snapshot['school_id']}.current"])
+    assert catalog_image.published(snapshot["school_id"]) == new
+
+
+def test_processes_open_the_published_image_instead_of_republishing(image_dir, config):
+    from school_context import _open_current_image
+
+    snapshot = load_snapshot(school=config)
+    # A published catalog that differs from the CSV on disk, as after the CSV is edited but not yet published
+    published = catalog_image.write_image(dict(snapshot, catalog=dict(list(snapshot["catalog"].items())[:-1])), config)
+    catalog_image.publish(snapshot["school_id"], published)
+
+    image = _open_current_image(config)
+    assert image.name == published
+    assert catalog_image.published(snapshot["school_id"]) == published
+    assert os.listdir(image_dir).count(published) == 1 and len(os.listdir(image_dir)) == 2
+
+
+def test_first_process_compiles_and_publishes_when_there_is_no_image(image_dir, config):
+    from school_context import _open_current_image
+
+    image = _open_current_image(config)
+    assert catalog_image.published(config["id"]) == image.name
+
+
+def test_image_catalog_matches_the_csv_and_reuses_course_views(image_dir, config):
+    snapshot = load_snapshot(school=config)
+    image = catalog_image.open_image(catalog_image.write_image(snapshot, config))
+    catalog = image.by_code(image.course)
+    code = next(iter(snapshot["catalog"]))
+    assert catalog[code] is catalog[code]
+
+    plan = normalize_plan({"courses": {"9th Grade": ["2401", "4301", "7201", "8101", "2201", "6105"]}})
+    image_snapshot = load_snapshot(school=config, catalog=catalog)
+    assert evaluate_pathway(image_snapshot, plan) == evaluate_pathway(snapshot, plan)
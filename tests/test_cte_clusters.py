@@ -0,0 +1,12 @@
+from cte_clusters import build_cluster_index, cluster_progress, completed_clusters
+
+
+def test_clusters_without_credit_in_the_catalog_are_left_out():
+    cluster_map = {"Welding": {"W1", "W2"}, "Seminar": {"S1"}, "Retired": {"R1", "R2"}}
+    index = build_cluster_index(cluster_map, {"W1": 1.0, "W2": 1.0, "S1": 0.0})
+
+    assert sorted(index["clusters"]) == ["Welding"]
+    assert sorted(index["unavailable"]) == ["Retired", "Seminar"]
+    assert "S1" not in index["code_to_clusters"]
+    assert completed_clusters(cluster_progress(index, [])) == {}
+    assert completed_clusters(cluster_progress(index, [("S1", 0.0), ("W1", 1.0), ("W2", 1.0)])) == {"Welding": 2.0}
@@ -0,0 +1,63 @@
+import os
+
+import openpyxl
+import pytest
+import pyarrow.parquet as pq
+
+import export
+import plan_store
+from schools import load_registry
+
+
+def test_export_writes_a_row_group_per_batch_and_a_row_per_student(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "batch_size", 2)
+    conn = plan_store.connect(str(tmp_path / "plans.db"))
+    for n in range(5):
+        courses = {"9th Grade": ["2401", "4301"]} if n else {}  # S0 has an empty plan
+        plan_store.save_plan(conn, {"student_id": f"S{n}", "grade": 9, "pathway": "Career & Technical",
+                                    "ms_credits": [], "courses": courses})
+
+    schools = {"whs": load_registry()["schools"]["whs"]}
+    students, (parquet, workbook) = export.export_plans(
+        conn, schools, str(tmp_path / "parquet"), str(tmp_path / "plans.xlsx")
+    )
+    assert students == 5
+
+    data = pq.ParquetFile(parquet.paths["whs"])
+    assert data.metadata.num_row_groups == 3  # batches of 2, 2 and 1 students, never the whole store at once
+    table = data.read()
+    assert table.num_rows == parquet.rows == 4 * 2 + 1
+    assert table.column("course_code").to_pylist().count(None) == 1
+
+    rows = list(openpyxl.load_workbook(workbook.path, read_only=True)["Plans"].values)
+    assert len(rows) == 1 + 5
+    assert sorted(row[0] for row in rows[1:]) == [f"S{n}" for n in range(5)]
+
+
+def test_failed_export_keeps_the_previous_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "batch_size", 2)
+    conn = plan_store.connect(str(tmp_path / "plans.db"))
+    plan_store.save_plans(conn, [{"student_id": f"S{n}", "pathway": "Career & Technical", "ms_credits": [],
+                                  "courses": {"9th Grade": ["2401"]}} for n in range(5)])
+    schools = {"whs": load_registry()["schools"]["whs"]}
+    parquet_dir, xlsx_path = str(tmp_path / "parquet"), str(tmp_path / "plans.xlsx")
+    _, (parquet, _) = export.export_plans(conn, schools, parquet_dir, xlsx_path)
+    before = pq.read_table(parquet.paths["whs"])
+
+    plan_status = export.plan_status
+    seen = []
+
+    def fail_on_fourth(snapshot, plan):
+        seen.append(plan["student_id"])
+        if len(seen) == 4:  # after the first row group is already written
+            raise RuntimeError("catalog went away")
+        return plan_status(snapshot, plan)
+
+    monkeypatch.setattr(export, "plan_status", fail_on_fourth)
+    with pytest.raises(RuntimeError):
+        export.export_plans(conn, schools, parquet_dir, xlsx_path)
+
+    assert pq.read_table(parquet.paths["whs"]).equals(before)
+    assert len(list(openpyxl.load_workbook(xlsx_path, read_only=True)["Plans"].values)) == 1 + 5
+    assert sorted(os.listdir(os.path.dirname(parquet.paths["whs"]))) == ["part-0.parquet"]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,19 @@
+from collections import Counter
+
+import plan_store
+from feasibility import forecast_school
+from planner_core import load_snapshot
+
+
+def test_plans_that_cannot_be_checked_are_counted_as_skipped(tmp_path):
+    conn = plan_store.connect(str(tmp_path / "plans.db"))
+    for student_id, grade, pathway in (("S1", 10, "Career & Technical"), ("S2", None, "Career & Technical"),
+                                       ("S3", 12, "Career & Technical"), ("S4", None, "University"),
+                                       ("S5", 11, "Retired Pathway"), ("S6", 12, "Retired Pathway")):
+        plan_store.save_plan(conn, {"student_id": student_id, "grade": grade, "pathway": pathway,
+                                    "ms_credits": [], "courses": {}})
+
+    skipped = Counter()
+    checked = [plan["student_id"] for plan, _ in forecast_school(conn, load_snapshot(), {10, 11}, skipped)]
+    assert checked == ["S1"]
+    assert skipped == {"no_grade": 2, "unknown_pathway": 1}  # S6 is outside the grades asked for
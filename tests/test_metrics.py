@@ -0,0 +1,21 @@
+from types import SimpleNamespace
+
+import metrics
+
+
+def test_idle_sessions_are_forgotten_without_a_scrape(monkeypatch):
+    monkeypatch.setattr(metrics, "_last_seen", type(metrics._last_seen)())
+    monkeypatch.setattr(metrics, "session_idle_seconds", 10)
+    now = [1000.0]
+    monkeypatch.setattr(metrics, "time", SimpleNamespace(monotonic=lambda: now[0]))
+
+    for n in range(100):
+        metrics.touch_session(f"old-{n}")
+    metrics.touch_session("returning")
+    now[0] += 8
+    metrics.touch_session("returning")  # seen again, so it outlives the sessions touched with it
+    now[0] += 5
+    metrics.touch_session("new")
+
+    assert list(metrics._last_seen) == ["returning", "new"]
+    assert metrics._active_sessions() == {(): 2}
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import plan_store
+from planner_core import load_snapshot
+
+app_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "WHS_course_plan.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("WHS_REGISTRATION_OPEN", "1")
+    monkeypatch.setattr(plan_store, "default_db_path", str(tmp_path / "plans.db"))
+    st.cache_resource.clear()  # seat counts are cached per process and must use this store
+    yield AppTest.from_file(app_path, default_timeout=60).run()
+    st.cache_resource.clear()
+
+
+def finalize(at):
+    next(button for button in at.button if "Finalize Registration" in button.label).click().run()
+    return at.session_state["registration_result"]
+
+
+def test_finalize_reserves_seats_for_the_saved_base_plan(app, tmp_path):
+    at = app
+    at.text_input(key="student_id").set_value("S1").run()
+    at.text_input(key="9th Grade_4_code").set_value("CSC").run()
+    at.selectbox(key="9th Grade_4").set_value(list(load_snapshot()["catalog"]).index("5105") + 1).run()
+    base = at.selectbox(key="active_scenario").value
+
+    # Plan B drops the seat-limited course; finalizing from it would reserve seats the saved plan does not match
+    at.text_input(key="new_scenario_name").set_value("Plan B").run()
+    next(button for button in at.button if "Copy as New Scenario" in button.label).click().run()
+    at.selectbox(key="9th Grade_4").set_value(0).run()
+    level, message = finalize(at)
+    assert level == "warning" and base in message
+    conn = plan_store.connect(str(tmp_path / "plans.db"))
+    assert plan_store.load_plan(conn, "S1") is None
+    assert conn.execute("SELECT COUNT(*) FROM reservations").fetchone()[0] == 0
+
+    at.selectbox(key="active_scenario").set_value(base).run()
+    level, message = finalize(at)
+    assert level == "info" and "seat reserved" in message
+    assert "5105" in plan_store.load_plan(conn, "S1")["courses"]["9th Grade"]
+    assert conn.execute("SELECT course_code, status FROM reservations WHERE student_id = 'S1'").fetchall() == [
+        ("5105", "seated")
+    ]
@@ -0,0 +1,24 @@
+import plan_store
+import sequences
+
+
+def save(conn, student_id, now):
+    conn.execute("BEGIN")
+    plan_store.write_plans(conn, [{"student_id": student_id, "pathway": "Career & Technical", "ms_credits": [],
+                                   "courses": {"9th Grade": ["5105"], "10th Grade": ["5606"]}}], now=now)
+    conn.execute("COMMIT")
+
+
+def test_refresh_counts_a_save_stamped_before_the_last_refresh(tmp_path):
+    conn = plan_store.connect(str(tmp_path / "plans.db"))
+    save(conn, "S1", now=2000.0)
+    assert sequences.refresh(conn)[0] == 1
+
+    # Stamped before S1 but committed after the refresh, as a save waiting behind a bulk edit would be
+    save(conn, "S2", now=1000.0)
+    assert sequences.refresh(conn)[0] == 1
+    assert sequences.refresh(conn)[0] == 0
+    plans = conn.execute(
+        "SELECT plans FROM course_sequences WHERE pathway = '*' AND previous = '5105' AND next = '5606'"
+    ).fetchone()[0]
+    assert plans == 2
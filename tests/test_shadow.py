@@ -0,0 +1,27 @@
+import shadow
+from planner_core import evaluate_pathway, load_snapshot, normalize_plan
+
+
+def test_partial_pe_health_is_not_a_disagreement():
+    snapshot = load_snapshot()
+    # Health (6105) but no PE: the legacy combined line is not met, and neither is the engine's pe
+    plan = normalize_plan({"pathway": "University", "courses": {"9th Grade": ["", "", "", "", "6105"]}})
+    lines = [(False, "PE/Health: PE 0.0, Health 0.5 (1.0 total)")]
+    legacy = shadow.legacy_outcomes(lines, "University")
+    assert legacy == {"pe_health": False}
+
+    entry = shadow.compare(evaluate_pathway, snapshot, plan, "University", legacy, 0.0, None)
+    assert entry["compared"] == ["pe_health"]
+    assert entry["disagreements"] == []
+
+
+def test_combined_line_disagrees_when_the_engine_meets_both():
+    snapshot = load_snapshot()
+    plan = normalize_plan({"pathway": "University", "courses": {"9th Grade": ["", "", "", "", "6105", "6101"]}})
+    result = evaluate_pathway(snapshot, plan)
+    met = {requirement["key"]: requirement["met"] for requirement in result["requirements"]}
+    assert met["pe"] and met["health"]
+
+    legacy = shadow.legacy_outcomes([(False, "PE/Health: PE 0.5, Health 0.5 (1.0 total)")], "University")
+    entry = shadow.compare(evaluate_pathway, snapshot, plan, "University", legacy, 0.0, None)
+    assert entry["disagreements"] == [{"requirement": "pe_health", "legacy": False, "candidate": True}]
@@ -0,0 +1,37 @@
+import os
+from concurrent.futures import Future
+
+from streamlit.testing.v1 import AppTest
+
+import analysis_pool
+
+app_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "WHS_course_plan.py")
+
+
+class HeldPool:
+    """Hands out jobs whose results the test sets by hand."""
+
+    def __init__(self):
+        self.futures = {}
+
+    def submit(self, owner, name, version, function, *args):
+        job = analysis_pool.Job(name, version)
+        job.future = self.futures.setdefault((name, version), Future())
+        return job
+
+
+def test_unfinished_analysis_polls_and_finished_one_is_drawn(monkeypatch):
+    pool = HeldPool()
+    monkeypatch.setattr(analysis_pool, "pool", lambda: pool)
+    at = AppTest.from_file(app_path, default_timeout=60).run()
+    at.radio(key="grad_pathway").set_value("Career & Technical").run()
+    assert not at.exception
+    assert [caption.value for caption in at.sidebar.caption if caption.value.startswith("⏳")] == [
+        "⏳ Looking for courses that would finish a CTE cluster…"
+    ]
+
+    future = [future for (name, _), future in pool.futures.items() if name == "cte_suggestions"][-1]
+    future.set_result([("Health Science", {"credits": 1.0, "target": 3.0}, ["Medical Terminology"])])
+    at.run()
+    assert not any(caption.value.startswith("⏳") for caption in at.sidebar.caption)
+    assert "Health Science: 1.0/3.0 credits — add Medical Terminology" in [info.value for info in at.sidebar.info]
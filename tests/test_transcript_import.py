@@ -0,0 +1,63 @@
+import csv
+
+import plan_store
+from planner_core import load_snapshot
+from transcript_import import import_transcripts
+
+
+def write_export(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Student ID", "Student Name", "Course Code", "Grade"])
+        writer.writerows(rows)
+    return str(path)
+
+
+def saved_plan(conn, **fields):
+    plan = {
+        "student_id": "S1", "student_name": "Alex", "school": "whs", "pathway": "Career & Technical",
+        "ms_credits": ["4301", "", "", ""],
+        "courses": {"9th Grade": ["2401", "", "", "", "", "", "", ""],
+                    "11th Grade": ["2601", "", "", "", "", "", "", ""]},
+    }
+    plan.update(fields)
+    plan_store.save_plan(conn, plan)
+
+
+def test_merge_keeps_uncovered_grades_and_middle_school(tmp_path):
+    conn = plan_store.connect(str(tmp_path / "plans.db"))
+    saved_plan(conn)
+    export = write_export(tmp_path / "export.csv", [("S1", "Alex", "2501", "10"), ("S1", "Alex", "4401", "10")])
+
+    report = import_transcripts(export, conn, load_snapshot())
+    plan = plan_store.load_plan(conn, "S1")
+    assert report["placed"] == 2
+    assert plan["ms_credits"] == ["4301", "", "", ""]  # no grade 8 rows on record
+    assert plan["courses"]["9th Grade"][0] == ""  # grade 9 is covered by the transcript, and it had none
+    assert plan["courses"]["10th Grade"][:2] == ["2501", "4401"]
+    assert plan["courses"]["11th Grade"][0] == "2601"  # later grades are the student's own choices
+    assert plan["pathway"] == "Career & Technical"
+    assert plan["student_name"] == "Alex"
+
+
+def test_middle_school_rows_replace_middle_school_credits(tmp_path):
+    conn = plan_store.connect(str(tmp_path / "plans.db"))
+    saved_plan(conn)
+    export = write_export(tmp_path / "export.csv", [("S1", "Alex", "4304", "8")])
+
+    import_transcripts(export, conn, load_snapshot())
+    plan = plan_store.load_plan(conn, "S1")
+    assert plan["ms_credits"] == ["4304", "", "", ""]
+    assert plan["courses"]["9th Grade"][0] == "2401"
+
+
+def test_plan_at_another_school_is_left_alone(tmp_path):
+    conn = plan_store.connect(str(tmp_path / "plans.db"))
+    saved_plan(conn, school="north")
+    export = write_export(tmp_path / "export.csv", [("S1", "Alex", "2501", "10")])
+
+    report = import_transcripts(export, conn, load_snapshot())
+    plan = plan_store.load_plan(conn, "S1")
+    assert report["other_school"] == 1
+    assert plan["school"] == "north"
+    assert plan["courses"]["10th Grade"][0] == ""
@@ -0,0 +1,250 @@
+"""Pre-fill saved plans from a district transcript export.
+
+    python transcript_import.py district_export.csv --crosswalk codes.csv --unmapped-report unmapped.csv
+
+The export has one row per student-course (CSV with a header row, or JSONL). Rows are
+streamed and grouped by student id. Runs of rows for one student are placed and written
+in batches, so memory stays flat for exports sorted by student. Courses already on record
+replace those grades in any saved plan. Later grades in the saved plan are kept, and so are
+its middle school credits unless the export has grade 8 (or earlier) rows for the student.
+"""
+import argparse
+import csv
+import json
+import time
+from collections import Counter
+from itertools import groupby
+
+import plan_store
+from planner_core import years, core_departments, load_snapshot, ms_slots, slots_per_year
+from schools import load_registry
+
+# Accepted spellings for each column, after lower-casing and replacing spaces with underscores
+column_aliases = {
+    "student_id": ("student_id", "studentid", "student_number", "student_no", "id"),
+    "student_name": ("student_name", "name", "student"),
+    "course_code": ("course_code", "code", "course", "course_number"),
+    "grade": ("grade", "grade_level", "grade_taken", "grade_completed"),
+}
+
+write_batch_size = 1000
+
+
+def _normalize_key(key):
+    return str(key).strip().lstrip("﻿").lower().replace(" ", "_")
+
+
+def _resolve_columns(keys):
+    keys = {_normalize_key(k): k for k in keys}
+    columns = {}
+    for field, aliases in column_aliases.items():
+        columns[field] = next((keys[a] for a in aliases if a in keys), None)
+    missing = [f for f in ("student_id", "course_code", "grade") if columns[f] is None]
+    if missing:
+        raise ValueError(f"Transcript is missing required column(s): {', '.join(missing)}")
+    return columns
+
+
+def read_rows(path):
+    """Yields (student_id, student_name, course_code, grade) tuples from a CSV or JSONL export."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            columns = None
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                columns = columns or _resolve_columns(record.keys())
+                yield (str(record[columns["student_id"]]).strip(),
+                       str(record.get(columns["student_name"]) or "").strip() if columns["student_name"] else "",
+                       str(record[columns["course_code"]]).strip(),
+                       record[columns["grade"]])
+        else:
+            reader = csv.reader(f)
+            header = next(reader)
+            columns = _resolve_columns(header)
+            index = {field: header.index(name) for field, name in columns.items() if name is not None}
+            sid, code, grade = index["student_id"], index["course_code"], index["grade"]
+            name = index.get("student_name")
+            for row in reader:
+                if row:
+                    yield row[sid].strip(), row[name].strip() if name is not None else "", row[code].strip(), row[grade]
+
+
+def load_crosswalk(path):
+    """District code -> catalog code, from a two-column CSV (header row required)."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return {row[0].strip(): row[1].strip() for row in reader if len(row) >= 2}
+
+
+def empty_plan():
+    return {"ms_credits": [""] * ms_slots, "courses": {year: [""] * slots_per_year for year in years}}
+
+
+def place_course(plan, course, grade, english_codes_by_grade):
+    """Puts a completed course in the slot the planner would have used; False if none is free."""
+    if grade <= 8:
+        row = plan["ms_credits"]
+        free = [i for i in range(ms_slots) if not row[i]]
+    else:
+        year = years[min(grade, 12) - 9]
+        row = plan["courses"][year]
+        free = []
+        if course["department"] in core_departments:
+            core_slot = core_departments.index(course["department"])
+            if core_slot != 0 or course["code"] in english_codes_by_grade.get(year, []):
+                free.append(core_slot)
+        free = [i for i in free if not row[i]] + [i for i in range(len(core_departments), slots_per_year) if not row[i]]
+    if not free:
+        return False
+    row[free[0]] = course["code"]
+    return True
+
+
+def _parse_grade(value):
+    try:
+        grade = int(float(str(value).strip()))
+    except ValueError:
+        return None
+    return grade if 6 <= grade <= 12 else None
+
+
+def import_transcripts(path, conn, snapshot, crosswalk=None):
+    """Streams the export into the plan store and returns a summary report."""
+    catalog = snapshot["catalog"]
+    english_codes = snapshot["english_course_codes_by_grade"]
+    crosswalk = crosswalk or {}
+    report = {"rows": 0, "students": 0, "placed": 0, "overflow": 0, "bad_grade": 0, "late_rows": 0, "other_school": 0}
+    unmapped = Counter()
+    written = set()
+    skipped = set()
+    late = {}
+    batch = []
+
+    def build(student_id, rows):
+        plan = empty_plan()
+        name = ""
+        highest = 0
+        middle_school = False
+        for _, student_name, raw_code, raw_grade in rows:
+            report["rows"] += 1
+            name = name or student_name
+            grade = _parse_grade(raw_grade)
+            if grade is None:
+                report["bad_grade"] += 1
+                continue
+            course = catalog.get(crosswalk.get(raw_code, raw_code))
+            if course is None:
+                unmapped[raw_code] += 1
+                continue
+            if place_course(plan, course, grade, english_codes):
+                report["placed"] += 1
+                highest = max(highest, grade)
+                middle_school = middle_school or grade <= 8
+            else:
+                report["overflow"] += 1
+        plan.update(student_id=student_id, school=snapshot["school_id"], student_name=name, pathway=snapshot["pathways"][0],
+                    grade=min(highest + 1, 12) if highest else None)
+        # Grade 8 stands for the middle school credits; high school grades up to the latest on record count as covered
+        return plan, {g for g in range(9, 13) if g <= highest} | ({8} if middle_school else set())
+
+    def flush():
+        existing = plan_store.load_plans(conn, [plan["student_id"] for plan, _ in batch])
+        records = []
+        for plan, imported_grades in batch:
+            saved = existing.get(plan["student_id"])
+            if saved and saved["school"] != plan["school"]:
+                report["other_school"] += 1  # left alone: the saved plan belongs to another school's catalog
+                skipped.add(plan["student_id"])
+                continue
+            if saved:
+                # The transcript is authoritative for grades it covers; keep the student's own later choices
+                if 8 not in imported_grades:
+                    plan["ms_credits"] = saved["ms_credits"]
+                for year in years:
+                    if years.index(year) + 9 not in imported_grades:
+                        plan["courses"][year] = saved["courses"][year]
+                plan["pathway"] = saved["pathway"]
+                plan["student_name"] = plan["student_name"] or saved["student_name"]
+            records.append(plan)
+        plan_store.save_plans(conn, records)
+        batch.clear()
+
+    for student_id, rows in groupby(read_rows(path), key=lambda row: row[0]):
+        if not student_id:
+            continue
+        if student_id in written:
+            # Unsorted export: this student's earlier rows are already written, merge these at the end
+            late.setdefault(student_id, []).extend(rows)
+            continue
+        written.add(student_id)
+        batch.append(build(student_id, rows))
+        if len(batch) >= write_batch_size:
+            flush()
+    if batch:
+        flush()
+
+    for start in range(0, len(late), write_batch_size):
+        ids = list(late)[start:start + write_batch_size]
+        saved = plan_store.load_plans(conn, ids)
+        records = []
+        for student_id in ids:
+            if student_id in skipped:
+                continue
+            plan = saved[student_id]
+            for _, _, raw_code, raw_grade in late[student_id]:
+                report["rows"] += 1
+                report["late_rows"] += 1
+                grade = _parse_grade(raw_grade)
+                course = catalog.get(crosswalk.get(raw_code, raw_code))
+                if grade is None:
+                    report["bad_grade"] += 1
+                elif course is None:
+                    unmapped[raw_code] += 1
+                elif place_course(plan, course, grade, english_codes):
+                    report["placed"] += 1
+                else:
+                    report["overflow"] += 1
+            records.append(plan)
+        plan_store.save_plans(conn, records)
+
+    report["students"] = len(written)
+    report["unmapped_rows"] = sum(unmapped.values())
+    report["unmapped_codes"] = unmapped
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("transcript", help="CSV or JSONL export, one row per student-course")
+    parser.add_argument("--db", default=None, help="plan store (default: plans.db or $WHS_PLAN_DB)")
+    parser.add_argument("--school", default=None, help="school id from schools.json (default: the registry default)")
+    parser.add_argument("--crosswalk", help="CSV mapping district course codes to catalog codes")
+    parser.add_argument("--unmapped-report", help="write unmapped codes and their row counts to this CSV")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    registry = load_registry()
+    snapshot = load_snapshot(school=registry["schools"][args.school or registry["default"]])
+    crosswalk = load_crosswalk(args.crosswalk) if args.crosswalk else {}
+    conn = plan_store.connect(args.db)
+    report = import_transcripts(args.transcript, conn, snapshot, crosswalk)
+    unmapped = report.pop("unmapped_codes")
+
+    if args.unmapped_report:
+        with open(args.unmapped_report, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["district_code", "rows"])
+            writer.writerows(unmapped.most_common())
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    for code, count in unmapped.most_common(20):
+        print(f"  unmapped {code}: {count} row(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Starts the planner with its caches already built.
+
+    python warmup.py [streamlit options]    # e.g. --server.port 8501
+
+Before Streamlit opens its port this imports the heavy modules, loads every school's
+catalog, indexes, compiled rules, encoded images and browser bundle (up to the school
+cache size) and, in registration mode, the seat counts. The first visitor then gets the
+same response time as everyone after them.
+
+While it runs, GET /ready on WHS_READY_PORT (default 8502) answers 503 with progress, and
+200 once warm-up is done and Streamlit accepts connections on its port, with the time each
+step took. If the ready port is already taken (a second launcher on this box), the planner
+still starts, without the endpoint.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ready_port = int(os.environ.get("WHS_READY_PORT", "8502"))
+app_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "WHS_course_plan.py")
+
+status = {"ready": False, "warmed": False, "serving": False, "steps": {}, "seconds": None, "error": None}
+
+
+def _step(name, func):
+    started = time.perf_counter()
+    result = func()
+    status["steps"][name] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def warm_up():
+    """Builds every shared cache the app would otherwise build on its first request."""
+    started = time.perf_counter()
+    try:
+        _step("imports", lambda: [__import__(name) for name in ("school_context", "layout")])
+        from school_context import school_registry, school_cache, seat_cache
+        from schools import default_cache_size
+
+        registry = _step("registry", school_registry)
+        # Default school first; never load more schools than the cache keeps
+        school_ids = [registry["default"]] + [s for s in registry["schools"] if s != registry["default"]]
+        for school_id in school_ids[:default_cache_size]:
+            _step(f"school:{school_id}", lambda: school_cache().get(school_id))
+            if os.environ.get("WHS_REGISTRATION_OPEN") == "1":
+                _step(f"seats:{school_id}", lambda: seat_cache(school_id))
+    except Exception as e:
+        status["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        status["seconds"] = round(time.perf_counter() - started, 4)
+    status["warmed"] = True
+    return status
+
+
+def streamlit_address(args):
+    """(host, port) that `streamlit run` will listen on, from its options or environment."""
+    options = {"--server.port": os.environ.get("STREAMLIT_SERVER_PORT", "8501"),
+               "--server.address": os.environ.get("STREAMLIT_SERVER_ADDRESS", "")}
+    for index, arg in enumerate(args):
+        name, _, value = arg.partition("=")
+        if name in options:
+            options[name] = value if value else (args[index + 1] if index + 1 < len(args) else options[name])
+    host = options["--server.address"]
+    return ("127.0.0.1" if host in ("", "0.0.0.0", "::") else host), int(options["--server.port"])
+
+
+def wait_until_serving(address, interval=0.2):
+    """Marks the launcher ready once Streamlit accepts connections; runs in a background thread."""
+    while True:
+        try:
+            socket.create_connection(address, timeout=1).close()
+        except OSError:
+            time.sleep(interval)
+            continue
+        status["serving"] = True
+        status["ready"] = True  # started after warm-up finished
+        return
+
+
+class ReadinessHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/ready":
+            self._send(404, {"error": "not found"})
+        else:
+            self._send(200 if status["ready"] else 503, status)
+
+    def _send(self, code, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_readiness(host="127.0.0.1", port=ready_port):
+    try:
+        server = ThreadingHTTPServer((host, port), ReadinessHandler)
+    except OSError as e:
+        # Port taken (another launcher on this box): start the planner anyway, without /ready
+        print(f"Readiness endpoint disabled, port {port} unavailable: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    serve_readiness()
+    warm_up()
+    print(f"Warm-up finished in {status['seconds']}s: {status['steps']}")
+
+    from streamlit.web import cli
+    # Same process, so the Streamlit server starts with the caches filled above
+    options = sys.argv[1:]
+    threading.Thread(target=wait_until_serving, args=(streamlit_address(options),), daemon=True).start()
+    sys.argv = ["streamlit", "run", app_script, *options]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()